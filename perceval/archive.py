@@ -27,6 +27,7 @@ import logging
 import os
 import pickle
 import sqlite3
+import threading
 import uuid
 
 from grimoirelab.toolkit.datetime import (datetime_utcnow,
@@ -56,6 +57,9 @@ class Archive:
     initialized calling to `init_metadata` method after creating
     a new archive.
 
+    An instance can be shared among the threads of a backend
+    that fetches data concurrently.
+
     :param archive_path: path where this archive is stored
 
     :raises ArchiveError: when the archive does not exist or is invalid
@@ -93,7 +97,8 @@ class Archive:
         self.backend_params = None
         self.created_on = None
 
-        self._db = sqlite3.connect(self.archive_path)
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(self.archive_path, check_same_thread=False)
 
         self._verify_archive()
         self._load_metadata()
@@ -173,14 +178,15 @@ class Archive:
                      hashcode, uri, payload, headers, self.archive_path)
 
         try:
-            cursor = self._db.cursor()
-            insert_stmt = "INSERT INTO " + self.ARCHIVE_TABLE + " (" \
-                          "id, hashcode, uri, payload, headers, data) " \
-                          "VALUES(?,?,?,?,?,?)"
-            cursor.execute(insert_stmt, (None, hashcode, uri,
-                                         payload_dump, headers_dump, data_dump))
-            self._db.commit()
-            cursor.close()
+            with self._lock:
+                cursor = self._db.cursor()
+                insert_stmt = "INSERT INTO " + self.ARCHIVE_TABLE + " (" \
+                              "id, hashcode, uri, payload, headers, data) " \
+                              "VALUES(?,?,?,?,?,?)"
+                cursor.execute(insert_stmt, (None, hashcode, uri,
+                                             payload_dump, headers_dump, data_dump))
+                self._db.commit()
+                cursor.close()
         except sqlite3.IntegrityError as e:
             msg = "data storage error; cause: duplicated entry %s" % hashcode
             raise ArchiveError(cause=msg)
@@ -209,16 +215,16 @@ class Archive:
         logger.debug("Retrieving entry %s with %s %s %s in %s",
                      hashcode, uri, payload, headers, self.archive_path)
 
-        self._db.row_factory = sqlite3.Row
-
         try:
-            cursor = self._db.cursor()
-            select_stmt = "SELECT data " \
-                          "FROM " + self.ARCHIVE_TABLE + " " \
-                          "WHERE hashcode = ?"
-            cursor.execute(select_stmt, (hashcode,))
-            row = cursor.fetchone()
-            cursor.close()
+            with self._lock:
+                self._db.row_factory = sqlite3.Row
+                cursor = self._db.cursor()
+                select_stmt = "SELECT data " \
+                              "FROM " + self.ARCHIVE_TABLE + " " \
+                              "WHERE hashcode = ?"
+                cursor.execute(select_stmt, (hashcode,))
+                row = cursor.fetchone()
+                cursor.close()
         except sqlite3.DatabaseError as e:
             msg = "data retrieval error; cause: %s" % str(e)
             raise ArchiveError(cause=msg)
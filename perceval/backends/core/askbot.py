@@ -24,6 +24,7 @@
 import json
 import logging
 import re
+import threading
 
 import bs4
 import requests
@@ -35,9 +36,13 @@ from ...backend import (Backend,
                         BackendCommand,
                         BackendCommandArgumentParser)
 from ...client import HttpClient
-from ...utils import DEFAULT_DATETIME
+from ...utils import DEFAULT_DATETIME, concurrent_map
 
 CATEGORY_QUESTION = 'question'
+DEFAULT_MAX_WORKERS = 1  # Number of concurrent requests of a question
+
+# lxml builds the trees faster than Python's HTML parser
+HTML_PARSER = 'lxml' if bs4.builder.builder_registry.lookup('lxml') else 'html.parser'
 
 logger = logging.getLogger(__name__)
 
@@ -50,18 +55,21 @@ class Askbot(Backend):
     will be set as the origin of the data.
 
     :param url: Askbot site URL
+    :param max_workers: maximum number of requests (HTML pages and
+        comments) of a question running concurrently
     :param tag: label used to mark the data
     :param archive: archive to store/retrieve items
     """
-    version = '0.6.3'
+    version = '0.8.0'
 
     CATEGORIES = [CATEGORY_QUESTION]
 
-    def __init__(self, url, tag=None, archive=None):
+    def __init__(self, url, max_workers=DEFAULT_MAX_WORKERS, tag=None, archive=None):
         origin = url
 
         super().__init__(origin, tag=tag, archive=archive)
         self.url = url
+        self.max_workers = max(1, max_workers)
         self.client = None
         self.ab_parser = AskbotParser()
 
@@ -165,33 +173,43 @@ class Askbot(Backend):
         """Fetch an Askbot HTML question body.
 
         The method fetchs the HTML question retrieving the
-        question body of the item question received
+        question body of the item question received. Each page
+        is parsed only once; the trees are reused by the parser
+        methods when the question is built.
 
         :param question: item with the question itself
 
-        :returns: a list of HTML page/s for the question
+        :returns: a list of parsed HTML page/s for the question
         """
-        html_question_items = []
+        # The number of pages is only known after the first one
+        # is fetched; the rest of them can be requested at once
+        html_question = self.__fetch_html_question_page(question['id'], 1)
 
-        npages = 1
-        next_request = True
+        if html_question is None:
+            return []
 
-        while next_request:
-            try:
-                html_question = self.client.get_html_question(question['id'], npages)
-                html_question_items.append(html_question)
-                tpages = self.ab_parser.parse_number_of_html_pages(html_question)
+        html_question_items = [html_question]
+        tpages = self.ab_parser.parse_number_of_html_pages(html_question)
 
-                if npages == tpages:
-                    next_request = False
+        pages = concurrent_map(lambda npage: self.__fetch_html_question_page(question['id'], npage),
+                               range(2, tpages + 1), max_workers=self.max_workers)
 
-                npages = npages + 1
-            except requests.exceptions.TooManyRedirects as e:
-                logger.warning("%s, data not retrieved for question %s", e, question['id'])
-                next_request = False
+        for html_question in pages:
+            if html_question is None:
+                break
+            html_question_items.append(html_question)
 
         return html_question_items
 
+    def __fetch_html_question_page(self, question_id, npage):
+        try:
+            html_question = self.client.get_html_question(question_id, npage)
+        except requests.exceptions.TooManyRedirects as e:
+            logger.warning("%s, data not retrieved for question %s", e, question_id)
+            return None
+
+        return self.ab_parser.parse_html(html_question)
+
     def __fetch_comments(self, question):
         """Fetch all the comments of an Askbot question and answers.
 
@@ -202,10 +220,14 @@ class Askbot(Backend):
 
         :returns: a list of comments with the ids as hashes
         """
+        object_ids = [question['id']] + question['answer_ids']
+
+        raw_comments = concurrent_map(self.client.get_comments, object_ids,
+                                      max_workers=self.max_workers)
+
         comments = {}
-        comments[question['id']] = json.loads(self.client.get_comments(question['id']))
-        for object_id in question['answer_ids']:
-            comments[object_id] = json.loads(self.client.get_comments(object_id))
+        for object_id, raw_comment in zip(object_ids, raw_comments):
+            comments[object_id] = json.loads(raw_comment)
         return comments
 
     @staticmethod
@@ -214,7 +236,7 @@ class Askbot(Backend):
 
         The method puts together all the information regarding a question
 
-        :param html_question: array of HTML raw pages
+        :param html_question: array of parsed HTML pages
         :param question: question object from the API
         :param comments: list of comments to add
 
@@ -266,6 +288,8 @@ class AskbotClient(HttpClient):
     def __init__(self, base_url, archive=None, from_archive=False):
         super().__init__(base_url, archive=archive, from_archive=from_archive)
         self._use_new_urls = True
+        self._urls_checked = False
+        self._urls_lock = threading.Lock()
 
     def get_api_questions(self, path):
         """Retrieve a question page using the API.
@@ -322,9 +346,13 @@ class AskbotClient(HttpClient):
     def get_comments(self, post_id):
         """Retrieve a list of comments by a given id.
 
+        The URL schema of the site is checked on the first call.
+        Comments can be requested from several threads, so the
+        rest of the calls wait until it is known and do not check
+        it again.
+
         :param object_id: object identifiere
         """
-        path = urijoin(self.base_url, self.COMMENTS if self._use_new_urls else self.COMMENTS_OLD)
         params = {
             'post_id': post_id,
             'post_type': 'answer',
@@ -332,6 +360,21 @@ class AskbotClient(HttpClient):
         }
         headers = {'X-Requested-With': 'XMLHttpRequest'}
 
+        if not self._urls_checked:
+            with self._urls_lock:
+                if not self._urls_checked:
+                    response = self.__fetch_comments_checking_urls(params, headers)
+                    self._urls_checked = True
+                    return response.text
+
+        path = urijoin(self.base_url, self.COMMENTS if self._use_new_urls else self.COMMENTS_OLD)
+        response = self.fetch(path, payload=params, headers=headers)
+
+        return response.text
+
+    def __fetch_comments_checking_urls(self, params, headers):
+        path = urijoin(self.base_url, self.COMMENTS)
+
         try:
             response = self.fetch(path, payload=params, headers=headers)
         except requests.exceptions.HTTPError as ex:
@@ -343,7 +386,7 @@ class AskbotClient(HttpClient):
             else:
                 raise ex
 
-        return response.text
+        return response
 
 
 class AskbotParser:
@@ -351,8 +394,25 @@ class AskbotParser:
 
     This class parses a plain HTML document, converting questions, answers,
     comments and user information into dict items.
+
+    The methods accept raw HTML documents or the trees returned
+    by `parse_html`. Using a tree avoids parsing the same document
+    several times.
     """
 
+    @staticmethod
+    def parse_html(html_question):
+        """Parse a raw HTML question page.
+
+        The tree is built with lxml when it is available. Otherwise,
+        Python's HTML parser is used.
+
+        :param html_question: raw HTML question element
+
+        :returns: the parsed tree
+        """
+        return bs4.BeautifulSoup(html_question, HTML_PARSER)
+
     @staticmethod
     def parse_question_container(html_question):
         """Parse the question info container of a given HTML question.
@@ -363,12 +423,12 @@ class AskbotParser:
         and the date (if any). The second one contains the date of the updated,
         and the user who updated it (if not the same who generated the question).
 
-        :param html_question: raw HTML question element
+        :param html_question: raw or parsed HTML question element
 
         :returns: an object with the parsed information
         """
         container_info = {}
-        bs_question = bs4.BeautifulSoup(html_question, "html.parser")
+        bs_question = AskbotParser._get_tree(html_question)
         question = AskbotParser._find_question_container(bs_question)
         container = question.select("div.post-update-info")
         created = container[0]
@@ -391,7 +451,11 @@ class AskbotParser:
         The method parses the answers related with a given HTML question,
         as well as all the comments related to the answer.
 
-        :param html_question: raw HTML question element
+        Take into account that, when a parsed tree is given as a
+        parameter, the update information of each answer is removed
+        from its body in that tree.
+
+        :param html_question: raw or parsed HTML question element
 
         :returns: a list with the answers
         """
@@ -430,7 +494,7 @@ class AskbotParser:
 
         answer_list = []
         # Select all the answers
-        bs_question = bs4.BeautifulSoup(html_question, "html.parser")
+        bs_question = AskbotParser._get_tree(html_question)
         bs_answers = bs_question.select("div.answer")
         for bs_answer in bs_answers:
             answer_id = bs_answer.attrs["data-post-id"]
@@ -460,17 +524,17 @@ class AskbotParser:
     def parse_number_of_html_pages(html_question):
         """Parse number of answer pages to paginate over them.
 
-        :param html_question: raw HTML question element
+        :param html_question: raw or parsed HTML question element
 
         :returns: an integer with the number of pages
         """
-        bs_question = bs4.BeautifulSoup(html_question, "html.parser")
-        try:
-            bs_question.select('div.paginator')[0]
-        except IndexError:
+        bs_question = AskbotParser._get_tree(html_question)
+        paginator = bs_question.select('div.paginator')
+
+        if not paginator:
             return 1
         else:
-            return int(bs_question.select('div.paginator')[0].attrs['data-num-pages'])
+            return int(paginator[0].attrs['data-num-pages'])
 
     @staticmethod
     def parse_user_info(update_info):
@@ -507,6 +571,12 @@ class AskbotParser:
 
         return user_info
 
+    @staticmethod
+    def _get_tree(html_question):
+        if isinstance(html_question, bs4.BeautifulSoup):
+            return html_question
+        return AskbotParser.parse_html(html_question)
+
     @staticmethod
     def _find_question_container(bs_question):
         questions = bs_question.find_all("div",
@@ -528,6 +598,12 @@ class AskbotCommand(BackendCommand):
         parser = BackendCommandArgumentParser(from_date=True,
                                               archive=True)
 
+        # Askbot options
+        group = parser.parser.add_argument_group('Askbot arguments')
+        group.add_argument('--max-workers', dest='max_workers',
+                           type=int, default=DEFAULT_MAX_WORKERS,
+                           help="Maximum number of requests of a question running concurrently")
+
         # Required arguments
         parser.parser.add_argument('url',
                                    help="URL of the Askbot server")
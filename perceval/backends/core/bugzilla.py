@@ -29,6 +29,12 @@ import re
 import bs4
 import dateutil.tz
 
+try:
+    import lxml.etree
+    import lxml.html
+except ImportError:
+    lxml = None
+
 from grimoirelab.toolkit.datetime import str_to_datetime
 
 from ...backend import (Backend,
@@ -36,11 +42,12 @@ from ...backend import (Backend,
                         BackendCommandArgumentParser)
 from ...client import HttpClient
 from ...errors import BackendError, ParseError
-from ...utils import DEFAULT_DATETIME, xml_to_dict
+from ...utils import DEFAULT_DATETIME, concurrent_map, xml_elements_to_dict
 
 CATEGORY_BUG = "bug"
 MAX_BUGS = 200  # Maximum number of bugs per query
 MAX_BUGS_CSV = 10000  # Maximum number of bugs per CSV query
+DEFAULT_MAX_WORKERS = 1  # Number of concurrent activity requests
 
 logger = logging.getLogger(__name__)
 
@@ -57,15 +64,21 @@ class Bugzilla(Backend):
     :param user: Bugzilla user
     :param password: Bugzilla user password
     :param max_bugs: maximum number of bugs requested on the same query
+    :param max_bugs_csv: maximum number of bugs requested on CSV queries
+    :param max_workers: maximum number of activity pages requested
+        concurrently
     :param tag: label used to mark the data
     :param archive: archive to store/retrieve items
     """
-    version = '0.10.3'
+    version = '0.12.0'
 
     CATEGORIES = [CATEGORY_BUG]
 
+    EMPTY_ACTIVITY_REGEX = re.compile("No changes have been made to this (?:bug|issue) yet.")
+
     def __init__(self, url, user=None, password=None,
                  max_bugs=MAX_BUGS, max_bugs_csv=MAX_BUGS_CSV,
+                 max_workers=DEFAULT_MAX_WORKERS,
                  tag=None, archive=None):
         origin = url
 
@@ -76,6 +89,7 @@ class Bugzilla(Backend):
         self.max_bugs_csv = max_bugs_csv
         self.client = None
         self.max_bugs = max(1, max_bugs)
+        self.max_workers = max(1, max_workers)
 
     def fetch(self, category=CATEGORY_BUG, from_date=DEFAULT_DATETIME):
         """Fetch the bugs from the repository.
@@ -110,26 +124,20 @@ class Bugzilla(Backend):
         logger.info("Looking for bugs: '%s' updated from '%s'",
                     self.url, str(from_date))
 
-        buglist = [bug for bug in self.__fetch_buglist(from_date)]
-
         nbugs = 0
-        tbugs = len(buglist)
 
-        for i in range(0, tbugs, self.max_bugs):
-            chunk = buglist[i:i + self.max_bugs]
-            bugs_ids = [b['bug_id'] for b in chunk]
-
-            logger.info("Fetching bugs: %s/%s", i, tbugs)
+        for bugs_ids in self.__fetch_buglist_chunks(from_date):
+            logger.info("Fetching bugs: %s/%s", nbugs, nbugs + len(bugs_ids))
             bugs = self.__fetch_and_parse_bugs_details(bugs_ids)
 
-            for bug in bugs:
-                bug_id = bug['bug_id'][0]['__text__']
-                bug['activity'] = self.__fetch_and_parse_bug_activity(bug_id)
+            # Activity pages are independent among them so they can
+            # be requested at the same time; bugs keep their order
+            for bug in concurrent_map(self.__fetch_bug_activity, bugs,
+                                      max_workers=self.max_workers):
                 nbugs += 1
                 yield bug
 
-        logger.info("Fetch process completed: %s/%s bugs fetched",
-                    nbugs, tbugs)
+        logger.info("Fetch process completed: %s bugs fetched", nbugs)
 
     @classmethod
     def has_archiving(cls):
@@ -206,7 +214,10 @@ class Bugzilla(Backend):
         the information related to a parsed bug.
 
         If the given XML is invalid or does not contains any bug, the
-        method will raise a ParseError exception.
+        method will raise a ParseError exception. The stream is parsed
+        element by element, but bugs are only returned once the whole
+        stream is valid, so no bug is returned when it is not. Only
+        `bug` elements placed directly under the root element are parsed.
 
         :param raw_xml: XML string to parse
 
@@ -215,13 +226,13 @@ class Bugzilla(Backend):
         :raises ParseError: raised when an error occurs parsing
             the given XML stream
         """
-        bugs = xml_to_dict(raw_xml)
+        bugs = [bug for bug in xml_elements_to_dict(raw_xml, 'bug')]
 
-        if 'bug' not in bugs:
+        if not bugs:
             cause = "No bugs found. XML stream seems to be invalid."
             raise ParseError(cause=cause)
 
-        for bug in bugs['bug']:
+        for bug in bugs:
             yield bug
 
     @staticmethod
@@ -243,8 +254,7 @@ class Bugzilla(Backend):
             the given HTML stream
         """
         def is_activity_empty(bs):
-            EMPTY_ACTIVITY = "No changes have been made to this (?:bug|issue) yet."
-            tag = bs.find(text=re.compile(EMPTY_ACTIVITY))
+            tag = bs.find(text=Bugzilla.EMPTY_ACTIVITY_REGEX)
             return tag is not None
 
         def find_activity_table(bs):
@@ -269,38 +279,98 @@ class Bugzilla(Backend):
             return s
 
         # Parsing starts here
-        bs = bs4.BeautifulSoup(raw_html, 'html.parser')
+        fields = None
 
-        if is_activity_empty(bs):
-            fields = []
-        else:
-            activity_tb = find_activity_table(bs)
-            remove_tags(activity_tb)
-            fields = activity_tb.find_all('td')
+        if lxml:
+            fields = Bugzilla._parse_activity_fields_lxml(raw_html)
+
+        if fields is None:
+            bs = bs4.BeautifulSoup(raw_html, 'html.parser')
+
+            if is_activity_empty(bs):
+                fields = []
+            else:
+                activity_tb = find_activity_table(bs)
+                remove_tags(activity_tb)
+                fields = [(td.get('rowspan'), format_text(td))
+                          for td in activity_tb.find_all('td')]
+
+        fields.reverse()
 
         while fields:
             # First two fields: 'Who' and 'When'.
-            who = fields.pop(0)
-            when = fields.pop(0)
+            rowspan, who = fields.pop()
+            _, when = fields.pop()
 
             # The attribute 'rowspan' of 'who' field tells how many
             # changes were made on the same date.
-            n = int(who.get('rowspan'))
+            n = int(rowspan)
 
             # Next fields are split into chunks of three elements:
             # 'What', 'Removed' and 'Added'. These chunks share
             # 'Who' and 'When' values.
             for _ in range(n):
-                what = fields.pop(0)
-                removed = fields.pop(0)
-                added = fields.pop(0)
-                event = {'Who': format_text(who),
-                         'When': format_text(when),
-                         'What': format_text(what),
-                         'Removed': format_text(removed),
-                         'Added': format_text(added)}
+                _, what = fields.pop()
+                _, removed = fields.pop()
+                _, added = fields.pop()
+                event = {'Who': who,
+                         'When': when,
+                         'What': what,
+                         'Removed': removed,
+                         'Added': added}
                 yield event
 
+    @staticmethod
+    def _parse_activity_fields_lxml(raw_html):
+        """Extract the cells of the activity table using lxml.
+
+        This is the fast path of `parse_bug_activity`. Cells are
+        returned as a list of `(rowspan, text)` tuples, where the text
+        is formatted in the same way the BeautifulSoup parser does.
+        When lxml cannot handle the stream, the method returns `None`
+        so the caller can fall back to the default parser.
+        """
+        HTML_TAGS_TO_FLATTEN = ('a', 'i', 'span')
+
+        def collect_strings(node, strings):
+            if node.text:
+                strings.append(node.text)
+            for child in node:
+                if not isinstance(child.tag, str):
+                    pass
+                elif child.tag in HTML_TAGS_TO_FLATTEN:
+                    strings.append(child.text_content())
+                else:
+                    collect_strings(child, strings)
+                if child.tail:
+                    strings.append(child.tail)
+
+        def format_text(node):
+            strings = []
+            collect_strings(node, strings)
+            return ' '.join([s.strip() for s in strings if s.strip()])
+
+        if Bugzilla.EMPTY_ACTIVITY_REGEX.search(raw_html):
+            return []
+
+        try:
+            doc = lxml.html.fromstring(raw_html)
+        except (ValueError, lxml.etree.ParserError):
+            return None
+
+        for tb in doc.iter('table'):
+            tr = next(tb.iter('tr'), None)
+
+            if tr is None:
+                continue
+
+            nheaders = len([th for th in tr if th.tag == 'th'])
+            if nheaders == 5:
+                return [(td.get('rowspan'), format_text(td))
+                        for td in tb.iter('td')]
+
+        raise ParseError(cause="Table of bug activity not found.")
+
     def _init_client(self, from_archive=False):
         """Init client"""
 
@@ -308,21 +378,37 @@ class Bugzilla(Backend):
                               max_bugs_csv=self.max_bugs_csv,
                               archive=self.archive, from_archive=from_archive)
 
+    def __fetch_buglist_chunks(self, from_date):
+        """Group the ids of the bug list in chunks of `max_bugs`.
+
+        The list is consumed while it is requested, so the details
+        of a chunk are fetched before the next CSV page is needed.
+        """
+        chunk = []
+
+        for bug in self.__fetch_buglist(from_date):
+            chunk.append(bug['bug_id'])
+
+            if len(chunk) == self.max_bugs:
+                yield chunk
+                chunk = []
+
+        if chunk:
+            yield chunk
+
     def __fetch_buglist(self, from_date):
         buglist = self.__fetch_and_parse_buglist_page(from_date)
 
         while buglist:
-            bug = buglist.pop(0)
-            last_date = bug['changeddate']
-            yield bug
+            for bug in buglist:
+                yield bug
 
             # Bugzilla does not support pagination. Due to this,
             # the next list of bugs is requested adding one second
             # to the last date obtained.
-            if not buglist:
-                from_date = str_to_datetime(last_date)
-                from_date += datetime.timedelta(seconds=1)
-                buglist = self.__fetch_and_parse_buglist_page(from_date)
+            from_date = str_to_datetime(buglist[-1]['changeddate'])
+            from_date += datetime.timedelta(seconds=1)
+            buglist = self.__fetch_and_parse_buglist_page(from_date)
 
     def __fetch_and_parse_buglist_page(self, from_date):
         logger.debug("Fetching and parsing buglist page from %s", str(from_date))
@@ -335,6 +421,11 @@ class Bugzilla(Backend):
         raw_bugs = self.client.bugs(*bug_ids)
         return self.parse_bugs_details(raw_bugs)
 
+    def __fetch_bug_activity(self, bug):
+        bug_id = bug['bug_id'][0]['__text__']
+        bug['activity'] = self.__fetch_and_parse_bug_activity(bug_id)
+        return bug
+
     def __fetch_and_parse_bug_activity(self, bug_id):
         logger.debug("Fetching and parsing bug #%s activity", bug_id)
         raw_activity = self.client.bug_activity(bug_id)
@@ -363,6 +454,9 @@ class BugzillaCommand(BackendCommand):
         group.add_argument('--max-bugs-csv', dest='max_bugs_csv',
                            type=int, default=MAX_BUGS_CSV,
                            help="Maximum number of bugs requested on CSV queries")
+        group.add_argument('--max-workers', dest='max_workers',
+                           type=int, default=DEFAULT_MAX_WORKERS,
+                           help="Maximum number of activity pages requested concurrently")
 
         # Required arguments
         parser.parser.add_argument('url',
@@ -34,7 +34,7 @@ from ...backend import (Backend,
                         BackendCommandArgumentParser)
 from ...client import HttpClient
 from ...errors import BaseError, BackendError
-from ...utils import DEFAULT_DATETIME
+from ...utils import DEFAULT_DATETIME, concurrent_map
 
 
 logger = logging.getLogger(__name__)
@@ -42,6 +42,7 @@ logger = logging.getLogger(__name__)
 CATEGORY_BUG = "bug"
 MAX_BUGS = 500  # Maximum number of bugs per query
 MAX_CONTENTS = 25  # Maximum number of bug contents (history, comments) per query
+DEFAULT_MAX_WORKERS = 1  # Number of concurrent requests of bug contents
 
 
 class BugzillaREST(Backend):
@@ -57,15 +58,20 @@ class BugzillaREST(Backend):
     :param password: Bugzilla user password
     :param api_token: Bugzilla token
     :param max_bugs: maximum number of bugs requested on the same query
+    :param max_contents: maximum number of bugs which contents (comments,
+        history and attachments) are requested on the same query
+    :param max_workers: maximum number of contents requests running
+        concurrently
     :param tag: label used to mark the data
     :param archive: archive to store/retrieve items
     """
-    version = '0.8.3'
+    version = '0.9.0'
 
     CATEGORIES = [CATEGORY_BUG]
 
     def __init__(self, url, user=None, password=None, api_token=None,
-                 max_bugs=MAX_BUGS, tag=None, archive=None):
+                 max_bugs=MAX_BUGS, max_contents=MAX_CONTENTS,
+                 max_workers=DEFAULT_MAX_WORKERS, tag=None, archive=None):
         origin = url
 
         super().__init__(origin, tag=tag, archive=archive)
@@ -74,6 +80,8 @@ class BugzillaREST(Backend):
         self.password = password
         self.api_token = api_token
         self.max_bugs = max(1, max_bugs)
+        self.max_contents = max(1, max_contents)
+        self.max_workers = max(1, max_workers)
         self.client = None
 
     def fetch(self, category=CATEGORY_BUG, from_date=DEFAULT_DATETIME):
@@ -171,7 +179,31 @@ class BugzillaREST(Backend):
                                   archive=self.archive, from_archive=from_archive)
 
     def __fetch_and_parse_bugs(self, from_date):
-        max_contents = min(MAX_CONTENTS, self.max_bugs)
+        contents = [self.__fetch_and_parse_comments,
+                    self.__fetch_and_parse_histories,
+                    self.__fetch_and_parse_attachments]
+
+        # Each chunk of bugs needs three requests (comments, history
+        # and attachments) which can run at the same time. Meanwhile,
+        # the next page of bugs is read ahead to keep the workers busy.
+        tasks = ((chunk, fetch) for chunk in self.__fetch_bugs_chunks(from_date)
+                 for fetch in contents)
+        results = concurrent_map(self.__fetch_contents, tasks,
+                                 max_workers=self.max_workers)
+
+        for chunk, comments in results:
+            _, histories = next(results)
+            _, attachments = next(results)
+
+            for bug in chunk:
+                bug_id = str(bug['id'])
+                bug['comments'] = comments[bug_id]
+                bug['history'] = histories[bug_id]
+                bug['attachments'] = attachments[bug_id]
+                yield bug
+
+    def __fetch_bugs_chunks(self, from_date):
+        max_contents = min(self.max_contents, self.max_bugs)
         offset = 0
 
         while True:
@@ -189,22 +221,16 @@ class BugzillaREST(Backend):
                 break
 
             for i in range(0, tbugs, max_contents):
-                chunk = buglist[i:i + max_contents]
-                bug_ids = [b['id'] for b in chunk]
-
-                comments = self.__fetch_and_parse_comments(*bug_ids)
-                histories = self.__fetch_and_parse_histories(*bug_ids)
-                attachments = self.__fetch_and_parse_attachments(*bug_ids)
-
-                for bug in chunk:
-                    bug_id = str(bug['id'])
-                    bug['comments'] = comments[bug_id]
-                    bug['history'] = histories[bug_id]
-                    bug['attachments'] = attachments[bug_id]
-                    yield bug
+                yield buglist[i:i + max_contents]
 
             offset += self.max_bugs
 
+    @staticmethod
+    def __fetch_contents(task):
+        chunk, fetch = task
+        bug_ids = [b['id'] for b in chunk]
+        return chunk, fetch(*bug_ids)
+
     def __fetch_and_parse_comments(self, *bug_ids):
         logger.debug("Fetching and parsing comments")
         raw_comments = self.client.comments(*bug_ids)
@@ -467,6 +493,12 @@ class BugzillaRESTCommand(BackendCommand):
         group.add_argument('--max-bugs', dest='max_bugs',
                            type=int, default=MAX_BUGS,
                            help="Maximum number of bugs requested on the same query")
+        group.add_argument('--max-contents', dest='max_contents',
+                           type=int, default=MAX_CONTENTS,
+                           help="Maximum number of bugs which contents are requested on the same query")
+        group.add_argument('--max-workers', dest='max_workers',
+                           type=int, default=DEFAULT_MAX_WORKERS,
+                           help="Maximum number of contents requests running concurrently")
 
         # Required arguments
         parser.parser.add_argument('url',
@@ -32,10 +32,11 @@ from ...backend import (Backend,
                         BackendCommand,
                         BackendCommandArgumentParser)
 from ...client import HttpClient
-from ...utils import DEFAULT_DATETIME
+from ...utils import DEFAULT_DATETIME, concurrent_map
 
 CATEGORY_HISTORICAL_CONTENT = "historical content"
 MAX_CONTENTS = 200
+DEFAULT_MAX_WORKERS = 1  # Number of historical contents requested concurrently
 
 logger = logging.getLogger(__name__)
 
@@ -48,19 +49,31 @@ class Confluence(Backend):
     passing the URL os this server. The `url` will be set as the
     origin of the data.
 
+    When `versions_from_summary` is set, the latest version of each
+    content is read from the contents summary. Then, the versions
+    created before `from_date` are skipped and the rest of them are
+    requested concurrently, up to `max_workers` at the same time.
+
     :param url: URL of the server
+    :param max_workers: maximum number of historical contents requested
+        concurrently when `versions_from_summary` is set
+    :param versions_from_summary: read the number of versions of each
+        content from the contents summary
     :param tag: label used to mark the data
     :param archive: archive to store/retrieve items
     """
-    version = '0.9.2'
+    version = '0.10.0'
 
     CATEGORIES = [CATEGORY_HISTORICAL_CONTENT]
 
-    def __init__(self, url, tag=None, archive=None):
+    def __init__(self, url, max_workers=DEFAULT_MAX_WORKERS,
+                 versions_from_summary=False, tag=None, archive=None):
         origin = url
 
         super().__init__(origin, tag=tag, archive=archive)
         self.url = url
+        self.max_workers = max(1, max_workers)
+        self.versions_from_summary = versions_from_summary
         self.client = None
 
     def fetch(self, category=CATEGORY_HISTORICAL_CONTENT, from_date=DEFAULT_DATETIME):
@@ -108,13 +121,16 @@ class Confluence(Backend):
         nhcs = 0
 
         contents = self.__fetch_contents_summary(from_date)
-        contents = [content for content in contents]
 
         for content in contents:
             cid = content['id']
             content_url = urijoin(self.origin, content['_links']['webui'])
 
-            hcs = self.__fetch_historical_contents(cid, from_date)
+            if self.versions_from_summary and 'version' in content:
+                hcs = self.__fetch_historical_contents_from_version(cid, content['version'],
+                                                                    from_date)
+            else:
+                hcs = self.__fetch_historical_contents(cid, from_date)
 
             for hc in hcs:
                 hc['content_url'] = content_url
@@ -219,7 +235,8 @@ class Confluence(Backend):
 
     def __fetch_contents_summary(self, from_date):
         logger.debug("Fetching contents summary from %s", str(from_date))
-        for page in self.client.contents(from_date=from_date):
+        for page in self.client.contents(from_date=from_date,
+                                         expand_version=self.versions_from_summary):
             for cs in self.parse_contents_summary(page):
                 yield cs
 
@@ -230,25 +247,11 @@ class Confluence(Backend):
         version = 1
 
         while fetching:
-            logger.debug("Fetching and parsing historical content #%s for %s ",
-                         str(version), cid)
-
-            try:
-                raw_hc = self.client.historical_content(cid, version)
-            except requests.exceptions.HTTPError as e:
-                code = e.response.status_code
-
-                # Common problems found: removed and privated contents
-                if code not in (404, 500):
-                    raise e
+            hc = self.__fetch_historical_content(cid, version)
 
-                logger.warning("Error retrieving content %s v#%s; skipping",
-                               cid, version)
-                logger.warning("Exception: %s", str(e))
+            if not hc:
                 break
 
-            hc = self.parse_historical_content(raw_hc)
-
             # Return those versions that were created after 'from_date'
             when = str_to_datetime(hc['version']['when'])
 
@@ -262,6 +265,85 @@ class Confluence(Backend):
             fetching = not hc['history']['latest']
             version += 1
 
+    def __fetch_historical_contents_from_version(self, cid, latest, from_date):
+        logger.debug("Fetching historical contents of %s content; latest version: %s",
+                     cid, latest['number'])
+
+        if str_to_datetime(latest['when']) < from_date:
+            logger.debug("Content %s updated before %s; skipped", cid, str(from_date))
+            return
+
+        fetched = {}
+        missing = set()
+        first = 1
+        last = latest['number']
+
+        # Versions are sorted by date, so the first version created
+        # after 'from_date' can be found using a binary search
+        if from_date > DEFAULT_DATETIME:
+            lower, upper = 1, last
+
+            while lower < upper:
+                middle = (lower + upper) // 2
+                version = middle
+                hc = self.__fetch_historical_content(cid, version)
+
+                # Missing versions cannot be compared,
+                # so the next ones are checked instead
+                while not hc:
+                    missing.add(version)
+                    version += 1
+
+                    if version == upper:
+                        break
+                    hc = self.__fetch_historical_content(cid, version)
+
+                if not hc:
+                    upper = middle
+                elif str_to_datetime(hc['version']['when']) >= from_date:
+                    fetched[version] = hc
+                    upper = middle
+                else:
+                    lower = version + 1
+
+            first = lower
+
+        def fetch_version(version):
+            if version in fetched:
+                return fetched[version]
+            elif version in missing:
+                return None
+            return self.__fetch_historical_content(cid, version)
+
+        hcs = concurrent_map(fetch_version, range(first, last + 1),
+                             max_workers=self.max_workers)
+
+        # The number of versions is known, so missing
+        # versions are skipped instead of ending the walk
+        for hc in hcs:
+            if hc:
+                yield hc
+
+    def __fetch_historical_content(self, cid, version):
+        logger.debug("Fetching and parsing historical content #%s for %s ",
+                     str(version), cid)
+
+        try:
+            raw_hc = self.client.historical_content(cid, version)
+        except requests.exceptions.HTTPError as e:
+            code = e.response.status_code
+
+            # Common problems found: removed and privated contents
+            if code not in (404, 500):
+                raise e
+
+            logger.warning("Error retrieving content %s v#%s; skipping",
+                           cid, version)
+            logger.warning("Exception: %s", str(e))
+            return None
+
+        return self.parse_historical_content(raw_hc)
+
 
 class ConfluenceCommand(BackendCommand):
     """Class to run Confluence backend from the command line."""
@@ -275,6 +357,16 @@ class ConfluenceCommand(BackendCommand):
         parser = BackendCommandArgumentParser(from_date=True,
                                               archive=True)
 
+        # Confluence options
+        group = parser.parser.add_argument_group('Confluence arguments')
+        group.add_argument('--versions-from-summary', dest='versions_from_summary',
+                           action='store_true',
+                           help="Read the number of versions from the contents summary, "
+                                "skipping those created before from-date")
+        group.add_argument('--max-workers', dest='max_workers',
+                           type=int, default=DEFAULT_MAX_WORKERS,
+                           help="Maximum number of historical contents requested concurrently")
+
         # Required arguments
         parser.parser.add_argument('url',
                                    help="URL of the Confluence server")
@@ -319,7 +411,8 @@ class ConfluenceClient(HttpClient):
         super().__init__(base_url.rstrip('/'), archive=archive, from_archive=from_archive)
 
     def contents(self, from_date=DEFAULT_DATETIME,
-                 offset=None, max_contents=MAX_CONTENTS):
+                 offset=None, max_contents=MAX_CONTENTS,
+                 expand_version=False):
         """Get the contents of a repository.
 
         This method returns an iterator that manages the pagination
@@ -330,6 +423,7 @@ class ConfluenceClient(HttpClient):
         :param from_date: fetch the contents updated since this date
         :param offset: fetch the contents starting from this offset
         :param limit: maximum number of contents to fetch per request
+        :param expand_version: include the latest version of each content
         """
         resource = self.RCONTENTS + '/' + self.MSEARCH
 
@@ -346,6 +440,9 @@ class ConfluenceClient(HttpClient):
         if offset:
             params[self.PSTART] = offset
 
+        if expand_version:
+            params[self.PEXPAND] = self.PVERSION
+
         for response in self._call(resource, params):
             yield response
 
@@ -32,10 +32,11 @@ from ...backend import (Backend,
                         BackendCommand,
                         BackendCommandArgumentParser)
 from ...client import HttpClient
-from ...utils import DEFAULT_DATETIME
+from ...utils import DEFAULT_DATETIME, concurrent_map
 
 
 CATEGORY_TOPIC = "topic"
+DEFAULT_MAX_WORKERS = 1  # Number of topics fetched concurrently
 
 logger = logging.getLogger(__name__)
 
@@ -49,19 +50,22 @@ class Discourse(Backend):
 
     :param url: Discourse URL
     :param api_token: Discourse API access token
+    :param max_workers: maximum number of topics fetched concurrently
     :param tag: label used to mark the data
     :param archive: archive to store/retrieve items
     """
-    version = '0.9.3'
+    version = '0.10.0'
 
     CATEGORIES = [CATEGORY_TOPIC]
 
-    def __init__(self, url, api_token=None, tag=None, archive=None):
+    def __init__(self, url, api_token=None, max_workers=DEFAULT_MAX_WORKERS,
+                 tag=None, archive=None):
         origin = url
 
         super().__init__(origin, tag=tag, archive=archive)
         self.url = url
         self.api_token = api_token
+        self.max_workers = max(1, max_workers)
         self.client = None
 
     def fetch(self, category=CATEGORY_TOPIC, from_date=DEFAULT_DATETIME):
@@ -102,9 +106,10 @@ class Discourse(Backend):
         ntopics = 0
 
         topics_ids = self.__fetch_and_parse_topics_ids(from_date)
+        topics = concurrent_map(self.__fetch_and_parse_topic, topics_ids,
+                                max_workers=self.max_workers)
 
-        for topic_id in topics_ids:
-            topic = self.__fetch_and_parse_topic(topic_id)
+        for topic in topics:
             ntopics += 1
             yield topic
 
@@ -211,7 +216,7 @@ class Discourse(Backend):
 
         # There are posts that could not included in the topic.
         # When post_count is greater than chunk_size, we have
-        # to fetch the remaining posts
+        # to fetch the remaining posts, in groups of chunk_size
         posts_sz = topic['posts_count']
         chunk_sz = topic['chunk_size']
 
@@ -219,18 +224,18 @@ class Discourse(Backend):
             posts_ids = topic['post_stream']['stream']
             posts_ids = posts_ids[chunk_sz:]
 
-            for post_id in posts_ids:
-                logger.debug("Fetching and parsing post %s", post_id)
-                post = self.__fetch_and_parse_post(post_id)
-                topic['post_stream']['posts'].append(post)
+            for i in range(0, len(posts_ids), chunk_sz):
+                posts = self.__fetch_and_parse_posts(topic_id, posts_ids[i:i + chunk_sz])
+                topic['post_stream']['posts'].extend(posts)
 
         return topic
 
-    def __fetch_and_parse_post(self, post_id):
-        logger.debug("Fetching and parsing post %s", post_id)
-        raw_post = self.client.post(post_id)
-        post = json.loads(raw_post)
-        return post
+    def __fetch_and_parse_posts(self, topic_id, posts_ids):
+        logger.debug("Fetching and parsing %s posts of topic %s",
+                     len(posts_ids), topic_id)
+        raw_posts = self.client.topic_posts(topic_id, posts_ids)
+        posts = json.loads(raw_posts)
+        return posts['post_stream']['posts']
 
     def __parse_topics_page(self, raw_json):
         """Parse a topics page stream.
@@ -281,6 +286,7 @@ class DiscourseClient(HttpClient):
     # Params
     PKEY = 'api_key'
     PPAGE = 'page'
+    PPOSTS_IDS = 'post_ids[]'
 
     # Data type
     TJSON = '.json'
@@ -320,6 +326,23 @@ class DiscourseClient(HttpClient):
 
         return response
 
+    def topic_posts(self, topic_id, posts_ids):
+        """Retrieve a set of posts of the topic with `topic_id` identifier.
+
+        :param topic_id: identifier of the topic
+        :param posts_ids: list of identifiers of the posts to retrieve
+        """
+        params = {
+            self.PKEY: self.api_key,
+            self.PPOSTS_IDS: posts_ids
+        }
+
+        # http://example.com/t/8/posts.json
+        response = self._call(self.TOPIC, urijoin(topic_id, self.POSTS),
+                              params=params)
+
+        return response
+
     def post(self, post_id):
         """Retrieve the post whit `post_id` identifier.
 
@@ -386,6 +409,12 @@ class DiscourseCommand(BackendCommand):
                                               token_auth=True,
                                               archive=True)
 
+        # Discourse options
+        group = parser.parser.add_argument_group('Discourse arguments')
+        group.add_argument('--max-workers', dest='max_workers',
+                           type=int, default=DEFAULT_MAX_WORKERS,
+                           help="Maximum number of topics fetched concurrently")
+
         # Required arguments
         parser.parser.add_argument('url',
                                    help="URL of the Discourse server")
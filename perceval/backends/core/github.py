@@ -35,7 +35,7 @@ from ...backend import (Backend,
                         BackendCommand,
                         BackendCommandArgumentParser)
 from ...client import HttpClient, RateLimitHandler
-
+from ...state import StateStore
 from ...utils import DEFAULT_DATETIME
 
 CATEGORY_ISSUE = "issue"
@@ -79,8 +79,12 @@ class GitHub(Backend):
         before raising a RetryError exception
     :param sleep_time: time to sleep in case
         of connection problems
+    :param state_path: path to the state store used to fetch issues
+        incrementally; when it is set, the issues emitted on previous
+        runs are kept and only their changed comments and reactions
+        are requested again; it is not used when items are archived
     """
-    version = '0.17.1'
+    version = '0.18.0'
 
     CATEGORIES = [CATEGORY_ISSUE, CATEGORY_PULL_REQUEST]
 
@@ -88,7 +92,8 @@ class GitHub(Backend):
                  api_token=None, base_url=None,
                  tag=None, archive=None,
                  sleep_for_rate=False, min_rate_to_sleep=MIN_RATE_LIMIT,
-                 max_retries=MAX_RETRIES, sleep_time=DEFAULT_SLEEP_TIME):
+                 max_retries=MAX_RETRIES, sleep_time=DEFAULT_SLEEP_TIME,
+                 state_path=None):
         origin = base_url if base_url else GITHUB_URL
         origin = urijoin(origin, owner, repository)
 
@@ -103,9 +108,11 @@ class GitHub(Backend):
         self.min_rate_to_sleep = min_rate_to_sleep
         self.max_retries = max_retries
         self.sleep_time = sleep_time
+        self.state_path = state_path
 
         self.client = None
         self._users = {}  # internal users cache
+        self._state = None
 
     def fetch(self, category=CATEGORY_ISSUE, from_date=DEFAULT_DATETIME):
         """Fetch the issues from the repository.
@@ -138,6 +145,14 @@ class GitHub(Backend):
         """
         from_date = kwargs['from_date']
 
+        # Archives must keep every request needed to replay
+        # the fetch, so the state store is ignored when data
+        # is archived or fetched from an archive
+        if self.state_path and not self.archive:
+            self._state = self._state or StateStore(self.state_path)
+        else:
+            self._state = None
+
         if category == CATEGORY_ISSUE:
             items = self.__fetch_issues(from_date)
         else:
@@ -210,11 +225,22 @@ class GitHub(Backend):
     def __fetch_issues(self, from_date):
         """Fetch the issues"""
 
+        namespace = CATEGORY_ISSUE + ':' + self.origin
         issues_groups = self.client.issues(from_date=from_date)
 
         for raw_issues in issues_groups:
             issues = json.loads(raw_issues)
+
+            if self._state:
+                ids = [issue['id'] for issue in issues]
+                prev_issues = self._state.get_many(namespace, ids)
+            else:
+                prev_issues = {}
+
+            fetched_issues = {}
+
             for issue in issues:
+                prev_issue = prev_issues.get(str(issue['id']), None)
                 self.__init_extra_issue_fields(issue)
                 for field in TARGET_ISSUE_FIELDS:
 
@@ -228,13 +254,22 @@ class GitHub(Backend):
                     elif field == 'assignees':
                         issue[field + '_data'] = self.__get_issue_assignees(issue[field])
                     elif field == 'comments':
-                        issue[field + '_data'] = self.__get_issue_comments(issue['number'])
+                        prev_comments = prev_issue['comments_data'] if prev_issue else None
+                        issue[field + '_data'] = self.__get_issue_comments(issue['number'], prev_comments)
                     elif field == 'reactions':
-                        issue[field + '_data'] = \
-                            self.__get_issue_reactions(issue['number'], issue['reactions']['total_count'])
+                        if prev_issue and prev_issue['reactions'] == issue['reactions']:
+                            issue[field + '_data'] = prev_issue['reactions_data']
+                        else:
+                            issue[field + '_data'] = \
+                                self.__get_issue_reactions(issue['number'], issue['reactions']['total_count'])
+
+                fetched_issues[issue['id']] = issue
 
                 yield issue
 
+            if self._state:
+                self._state.set_many(namespace, fetched_issues)
+
     def __fetch_pull_requests(self, from_date):
         """Fetch the pull requests"""
 
@@ -278,19 +313,32 @@ class GitHub(Backend):
 
         return reactions
 
-    def __get_issue_comments(self, issue_number):
-        """Get issue comments"""
+    def __get_issue_comments(self, issue_number, prev_comments=None):
+        """Get issue comments.
 
+        Comments emitted on a previous run (`prev_comments`) are reused
+        when neither their contents nor their reactions changed. Reactions
+        do not modify the update date of a comment, so the list of comments
+        is always requested to compare their reactions summary.
+        """
         comments = []
+        prev_comments = {c['id']: c for c in prev_comments} if prev_comments else {}
         group_comments = self.client.issue_comments(issue_number)
 
         for raw_comments in group_comments:
 
             for comment in json.loads(raw_comments):
                 comment_id = comment.get('id')
-                comment['user_data'] = self.__get_user(comment['user']['login'])
-                comment['reactions_data'] = \
-                    self.__get_issue_comment_reactions(comment_id, comment['reactions']['total_count'])
+                prev_comment = prev_comments.get(comment_id, None)
+
+                if prev_comment and prev_comment['updated_at'] == comment['updated_at'] \
+                        and prev_comment['reactions'] == comment['reactions']:
+                    comment['user_data'] = prev_comment['user_data']
+                    comment['reactions_data'] = prev_comment['reactions_data']
+                else:
+                    comment['user_data'] = self.__get_user(comment['user']['login'])
+                    comment['reactions_data'] = \
+                        self.__get_issue_comment_reactions(comment_id, comment['reactions']['total_count'])
                 comments.append(comment)
 
         return comments
@@ -733,6 +781,9 @@ class GitHubCommand(BackendCommand):
         group.add_argument('--min-rate-to-sleep', dest='min_rate_to_sleep',
                            default=MIN_RATE_LIMIT, type=int,
                            help="sleep until reset when the rate limit reaches this value")
+        group.add_argument('--state-path', dest='state_path',
+                           help="path to the state store used to fetch issues incrementally; "
+                                "ignored when items are archived")
 
         # Generic client options
         group.add_argument('--max-retries', dest='max_retries',
@@ -36,9 +36,10 @@ from ...backend import (Backend,
                         BackendCommand,
                         BackendCommandArgumentParser)
 from ...client import HttpClient, RateLimitHandler
-from ...utils import DEFAULT_DATETIME
+from ...utils import DEFAULT_DATETIME, concurrent_map
 
 CATEGORY_ISSUE = "issue"
+CATEGORY_MERGE_REQUEST = "merge_request"
 
 GITLAB_URL = "https://gitlab.com/"
 GITLAB_API_URL = "https://gitlab.com/api/v4"
@@ -51,6 +52,10 @@ MAX_RATE_LIMIT = 500
 DEFAULT_SLEEP_TIME = 1
 MAX_RETRIES = 5
 
+# Number of issues fetched concurrently and page size on keyset pagination
+DEFAULT_MAX_WORKERS = 1
+KEYSET_PER_PAGE = 100
+
 TARGET_ISSUE_FIELDS = ['user_notes_count', 'award_emoji']
 
 logger = logging.getLogger(__name__)
@@ -59,8 +64,8 @@ logger = logging.getLogger(__name__)
 class GitLab(Backend):
     """GitLab backend for Perceval.
 
-    This class allows the fetch the issues stored in GitLab
-    repository.
+    This class allows the fetch the issues and merge requests
+    stored in GitLab repository.
 
     :param owner: GitLab owner
     :param repository: GitLab repository from the owner
@@ -73,14 +78,19 @@ class GitLab(Backend):
     :param sleep_for_rate: sleep until rate limit is reset
     :param min_rate_to_sleep: minimun rate needed to sleep until
          it will be reset
+    :param max_workers: number of issues or merge requests whose
+        notes, versions and award emojis are fetched concurrently
+    :param keyset_pagination: page issues and merge requests using
+        their update date as cursor instead of page offsets
     """
-    version = '0.3.4'
+    version = '0.5.0'
 
-    CATEGORIES = [CATEGORY_ISSUE]
+    CATEGORIES = [CATEGORY_ISSUE, CATEGORY_MERGE_REQUEST]
 
     def __init__(self, owner=None, repository=None,
                  api_token=None, base_url=None, tag=None, archive=None,
-                 sleep_for_rate=False, min_rate_to_sleep=MIN_RATE_LIMIT):
+                 sleep_for_rate=False, min_rate_to_sleep=MIN_RATE_LIMIT,
+                 max_workers=DEFAULT_MAX_WORKERS, keyset_pagination=False):
 
         origin = base_url if base_url else GITLAB_URL
         origin = urijoin(origin, owner, repository)
@@ -92,19 +102,21 @@ class GitLab(Backend):
         self.api_token = api_token
         self.sleep_for_rate = sleep_for_rate
         self.min_rate_to_sleep = min_rate_to_sleep
+        self.max_workers = max_workers
+        self.keyset_pagination = keyset_pagination
         self.client = None
         self._users = {}  # internal users cache
 
     def fetch(self, category=CATEGORY_ISSUE, from_date=DEFAULT_DATETIME):
-        """Fetch the issues from the repository.
+        """Fetch the issues or merge requests from the repository.
 
         The method retrieves, from a GitLab repository, the issues
-        updated since the given date.
+        or merge requests updated since the given date.
 
         :param category: the category of items to fetch
-        :param from_date: obtain issues updated since this date
+        :param from_date: obtain items updated since this date
 
-        :returns: a generator of issues
+        :returns: a generator of items
         """
         if not from_date:
             from_date = DEFAULT_DATETIME
@@ -117,7 +129,11 @@ class GitLab(Backend):
         return items
 
     def fetch_items(self, category, **kwargs):
-        """Fetch the issues
+        """Fetch the items (issues or merge_requests)
+
+        Notes, versions and award emojis of `max_workers` items
+        are fetched at the same time. Items are returned in the
+        same order they were listed.
 
         :param category: the category of items to fetch
         :param kwargs: backend arguments
@@ -126,19 +142,18 @@ class GitLab(Backend):
         """
         from_date = kwargs['from_date']
 
-        issues_groups = self.client.issues(from_date=from_date)
-
-        for raw_issues in issues_groups:
-            issues = json.loads(raw_issues)
-            for issue in issues:
-                self.__init_extra_issue_fields(issue)
+        if category == CATEGORY_ISSUE:
+            groups = self.client.issues(from_date=from_date)
+            fetch_data = self.__fetch_issue_data
+        else:
+            groups = self.client.merges(from_date=from_date)
+            fetch_data = self.__fetch_merge_data
 
-                issue['notes_data'] = \
-                    self.__get_issue_notes(issue['iid'])
-                issue['award_emoji_data'] = \
-                    self.__get_issue_award_emoji(issue['iid'])
+        items = (item for raw_items in groups for item in json.loads(raw_items))
 
-                yield issue
+        for item in concurrent_map(fetch_data, items,
+                                   max_workers=self.max_workers):
+            yield item
 
     @classmethod
     def has_archiving(cls):
@@ -183,41 +198,72 @@ class GitLab(Backend):
     def metadata_category(item):
         """Extracts the category from a GitLab item.
 
-        This backend only generates one type of item which is
-        'issue'.
+        This backend generates two types of item which are
+        'issue' and 'merge_request'.
         """
-        return CATEGORY_ISSUE
+        if "merge_status" in item:
+            category = CATEGORY_MERGE_REQUEST
+        else:
+            category = CATEGORY_ISSUE
+
+        return category
 
     def _init_client(self, from_archive=False):
         """Init client"""
 
         return GitLabClient(self.owner, self.repository, self.api_token, self.base_url,
                             self.sleep_for_rate, self.min_rate_to_sleep,
-                            self.archive, from_archive)
+                            archive=self.archive, from_archive=from_archive,
+                            keyset_pagination=self.keyset_pagination)
+
+    def __fetch_issue_data(self, issue):
+        """Get notes and award emojis of an issue"""
+
+        self.__init_extra_issue_fields(issue)
+
+        issue['notes_data'] = \
+            self.__get_notes(issue['iid'], self.client.issue_notes, self.client.note_emojis)
+        issue['award_emoji_data'] = \
+            self.__get_award_emoji(self.client.issue_emojis(issue['iid']))
 
-    def __get_issue_notes(self, issue_id):
-        """Get issue notes"""
+        return issue
+
+    def __fetch_merge_data(self, merge):
+        """Get notes, versions and award emojis of a merge request"""
+
+        self.__init_extra_merge_fields(merge)
+
+        merge['notes_data'] = \
+            self.__get_notes(merge['iid'], self.client.merge_notes, self.client.merge_note_emojis)
+        merge['award_emoji_data'] = \
+            self.__get_award_emoji(self.client.merge_emojis(merge['iid']))
+        merge['versions_data'] = \
+            self.__get_merge_versions(merge['iid'])
+
+        return merge
+
+    def __get_notes(self, item_id, fetch_notes, fetch_note_emojis):
+        """Get the notes of an issue or merge request"""
 
         notes = []
 
-        group_notes = self.client.issue_notes(issue_id)
+        group_notes = fetch_notes(item_id)
 
         for raw_notes in group_notes:
 
             for note in json.loads(raw_notes):
                 note_id = note['id']
                 note['award_emoji_data'] = \
-                    self.__get_note_award_emoji(issue_id, note_id)
+                    self.__get_award_emoji(fetch_note_emojis(item_id, note_id))
                 notes.append(note)
 
         return notes
 
-    def __get_issue_award_emoji(self, issue_id):
-        """Get award emojis for issue"""
+    def __get_award_emoji(self, group_emojis):
+        """Get award emojis of an issue, merge request or note"""
 
         emojis = []
 
-        group_emojis = self.client.issue_emojis(issue_id)
         for raw_emojis in group_emojis:
 
             for emoji in json.loads(raw_emojis):
@@ -225,18 +271,18 @@ class GitLab(Backend):
 
         return emojis
 
-    def __get_note_award_emoji(self, issue_id, note_id):
-        """Fetch emojis for note"""
+    def __get_merge_versions(self, merge_id):
+        """Get merge request versions"""
 
-        emojis = []
+        versions = []
 
-        group_emojis = self.client.note_emojis(issue_id, note_id)
-        for raw_emojis in group_emojis:
+        group_versions = self.client.merge_versions(merge_id)
+        for raw_versions in group_versions:
 
-            for emoji in json.loads(raw_emojis):
-                emojis.append(emoji)
+            for version in json.loads(raw_versions):
+                versions.append(version)
 
-        return emojis
+        return versions
 
     def __init_extra_issue_fields(self, issue):
         """Add fields to an issue"""
@@ -244,6 +290,13 @@ class GitLab(Backend):
         issue['notes_data'] = []
         issue['award_emoji_data'] = []
 
+    def __init_extra_merge_fields(self, merge):
+        """Add fields to a merge request"""
+
+        merge['notes_data'] = []
+        merge['award_emoji_data'] = []
+        merge['versions_data'] = []
+
 
 class GitLabClient(HttpClient, RateLimitHandler):
     """Client for retieving information from GitLab API
@@ -263,6 +316,8 @@ class GitLabClient(HttpClient, RateLimitHandler):
          before raising a RetryError exception
     :param archive: an archive to store/read fetched data
     :param from_archive: it tells whether to write/read the archive
+    :param keyset_pagination: page issues and merge requests using
+        their update date as cursor instead of page offsets
     """
 
     RATE_LIMIT_HEADER = "RateLimit-Remaining"
@@ -273,12 +328,13 @@ class GitLabClient(HttpClient, RateLimitHandler):
     def __init__(self, owner, repository, token, base_url=None,
                  sleep_for_rate=False, min_rate_to_sleep=MIN_RATE_LIMIT,
                  sleep_time=DEFAULT_SLEEP_TIME, max_retries=MAX_RETRIES,
-                 archive=None, from_archive=False):
+                 archive=None, from_archive=False, keyset_pagination=False):
         self.owner = owner
         self.repository = repository
         self.token = token
         self.rate_limit = None
         self.sleep_for_rate = sleep_for_rate
+        self.keyset_pagination = keyset_pagination
 
         if base_url:
             parts = urllib.parse.urlparse(base_url)
@@ -343,7 +399,83 @@ class GitLabClient(HttpClient, RateLimitHandler):
 
         path = urijoin("issues")
 
-        return self.fetch_items(path, payload, from_date=from_date)
+        if self.keyset_pagination:
+            return self.fetch_items_keyset(path, payload, from_date=from_date)
+        else:
+            return self.fetch_items(path, payload, from_date=from_date)
+
+    def merges(self, from_date=None):
+        """Get the merge requests from pagination.
+
+        Merge requests updated before `from_date` are filtered
+        by the server.
+        """
+        payload = {
+            'state': 'all',
+            'order_by': 'updated_at',
+            'sort': 'asc'
+        }
+
+        if from_date:
+            from_date = from_date.isoformat()
+
+        path = urijoin("merge_requests")
+
+        if self.keyset_pagination:
+            return self.fetch_items_keyset(path, payload, from_date=from_date)
+
+        if from_date:
+            payload['updated_after'] = from_date
+
+        return self.fetch_items(path, payload)
+
+    def merge_notes(self, merge_id):
+        """Get the merge request notes from pagination"""
+
+        payload = {
+            'order_by': 'updated_at',
+            'sort': 'asc'
+        }
+
+        path = urijoin("merge_requests", str(merge_id), "notes")
+
+        return self.fetch_items(path, payload)
+
+    def merge_versions(self, merge_id):
+        """Get the merge request versions from pagination"""
+
+        payload = {
+            'order_by': 'updated_at',
+            'sort': 'asc'
+        }
+
+        path = urijoin("merge_requests", str(merge_id), "versions")
+
+        return self.fetch_items(path, payload)
+
+    def merge_emojis(self, merge_id):
+        """Get emojis of a merge request"""
+
+        payload = {
+            'order_by': 'updated_at',
+            'sort': 'asc'
+        }
+
+        path = urijoin("merge_requests", str(merge_id), "award_emoji")
+
+        return self.fetch_items(path, payload)
+
+    def merge_note_emojis(self, merge_id, note_id):
+        """Get emojis of a merge request note"""
+
+        payload = {
+            'order_by': 'updated_at',
+            'sort': 'asc'
+        }
+
+        path = urijoin("merge_requests", str(merge_id), "notes", str(note_id), "award_emoji")
+
+        return self.fetch_items(path, payload)
 
     def issue_emojis(self, issue_id):
         """Get emojis of an issue"""
@@ -463,6 +595,59 @@ class GitLabClient(HttpClient, RateLimitHandler):
                 else:
                     logger.debug("Page: %i/%i" % (page, last_page))
 
+    def fetch_items_keyset(self, path, payload, from_date=None):
+        """Return the items from gitlab API using the update date as cursor.
+
+        Items must be sorted by update date in ascending order. Instead
+        of asking for page offsets, which are expensive to compute on
+        deep pages, each request asks for the items updated after the
+        last item received (`updated_after`). As this filter includes
+        the given date, items sharing it with the cursor are discarded
+        when they were already returned. In the rare case a whole page
+        shares the same update date, the next offset page for that date
+        is requested.
+        """
+        url = urijoin(self.base_url, 'projects', self.owner + '%2F' + self.repository, path)
+
+        logger.debug("Get GitLab keyset paginated items from " + url)
+
+        cursor = from_date
+        page = 1
+        seen = set()
+
+        while True:
+            params = dict(payload)
+            params['per_page'] = KEYSET_PER_PAGE
+
+            if cursor:
+                params['updated_after'] = cursor
+            if page > 1:
+                params['page'] = page
+
+            response = self.fetch(url, payload=params)
+            items = json.loads(response.text) if response.text else []
+
+            new_items = [item for item in items if item['id'] not in seen]
+
+            logger.debug("Items updated after %s: %i (%i new)", cursor, len(items), len(new_items))
+
+            if new_items:
+                yield json.dumps(new_items)
+
+            if len(items) < KEYSET_PER_PAGE:
+                break
+
+            last_date = items[-1]['updated_at']
+
+            if last_date == cursor:
+                page += 1
+            else:
+                cursor = last_date
+                page = 1
+                seen = set()
+
+            seen.update([item['id'] for item in items if item['updated_at'] == cursor])
+
 
 class GitLabCommand(BackendCommand):
     """Class to run GitLab backend from the command line."""
@@ -488,6 +673,12 @@ class GitLabCommand(BackendCommand):
                            default=MIN_RATE_LIMIT, type=int,
                            help="sleep until reset when the rate limit \
                                reaches this value")
+        group.add_argument('--max-workers', dest='max_workers',
+                           default=DEFAULT_MAX_WORKERS, type=int,
+                           help="number of issues or merge requests fetched concurrently")
+        group.add_argument('--keyset-pagination', dest='keyset_pagination',
+                           action='store_true',
+                           help="page items using their update date as cursor")
 
         # Positional arguments
         parser.parser.add_argument('owner',
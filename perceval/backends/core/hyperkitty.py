@@ -21,6 +21,7 @@
 #
 
 import datetime
+import hashlib
 import logging
 import os
 
@@ -31,13 +32,20 @@ import dateutil.tz
 from grimoirelab.toolkit.datetime import datetime_to_utc, datetime_utcnow
 from grimoirelab.toolkit.uris import urijoin
 
-from .mbox import MBox, MailingList, CATEGORY_MESSAGE
+from .mbox import (MBox,
+                   MailingList,
+                   CATEGORY_MESSAGE,
+                   DEFAULT_MAX_WORKERS)
 from ...backend import (BackendCommand,
                         BackendCommandArgumentParser)
 from ...client import HttpClient
+from ...state import StateStore
 from ...utils import (DEFAULT_DATETIME,
+                      concurrent_map,
                       months_range)
 
+DEFAULT_DOWNLOAD_WORKERS = 1  # Number of archives downloaded concurrently
+
 logger = logging.getLogger(__name__)
 
 
@@ -53,14 +61,23 @@ class HyperKitty(MBox):
     :param dirpath: directory path where the mboxes are stored
     :param tag: label used to mark the data
     :param archive: archive to store/retrieve items
+    :param state_path: path to the state store used to keep an index
+        of each mbox between runs
+    :param max_workers: maximum number of processes parsing mboxes
+        in parallel
+    :param download_workers: maximum number of archives downloaded
+        concurrently
     """
-    version = '0.4.2'
+    version = '0.7.0'
 
     CATEGORIES = [CATEGORY_MESSAGE]
 
-    def __init__(self, url, dirpath, tag=None, archive=None):
-        super().__init__(url, dirpath, tag=tag, archive=archive)
+    def __init__(self, url, dirpath, tag=None, archive=None, state_path=None,
+                 max_workers=DEFAULT_MAX_WORKERS, download_workers=DEFAULT_DOWNLOAD_WORKERS):
+        super().__init__(url, dirpath, tag=tag, archive=archive, state_path=state_path,
+                         max_workers=max_workers)
         self.url = url
+        self.download_workers = max(1, download_workers)
 
     def fetch(self, category=CATEGORY_MESSAGE, from_date=DEFAULT_DATETIME):
         """Fetch the messages from the HyperKitty mailing list archiver.
@@ -96,7 +113,13 @@ class HyperKitty(MBox):
         logger.info("Looking for messages from '%s' since %s",
                     self.url, str(from_date))
 
-        mailing_list = HyperKittyList(self.url, self.dirpath)
+        if self.state_path:
+            self._state = self._state or StateStore(self.state_path)
+        else:
+            self._state = None
+
+        mailing_list = HyperKittyList(self.url, self.dirpath, state=self._state,
+                                      download_workers=self.download_workers)
         mailing_list.fetch(from_date=from_date)
 
         messages = self._fetch_and_parse_messages(mailing_list, from_date)
@@ -134,12 +157,29 @@ class HyperKittyList(MailingList):
     or greater. Previous versions do not export messages in MBox
     format.
 
+    When a state store is given, it keeps a manifest with the hash
+    of the archives of completed months. Those archives do not change,
+    so they are not downloaded again while the stored files match
+    their hashes. Files are only hashed again when their modification
+    time changes.
+
     :param url: URL to the HyperKitty archiver for this list
     :param dirpath: path to the local mboxes archives
+    :param state: state store where the manifest is kept
+    :param download_workers: maximum number of archives downloaded
+        concurrently
     """
-    def __init__(self, url, dirpath):
+    CHUNK_SIZE = 1024 * 1024
+
+    # Messages can reach the archiver some time after they
+    # were sent, so months are completed after this delay
+    MONTH_CLOSING_DELAY = datetime.timedelta(days=7)
+
+    def __init__(self, url, dirpath, state=None, download_workers=DEFAULT_DOWNLOAD_WORKERS):
         super().__init__(url, dirpath)
         self.client = HttpClient(url)
+        self.state = state
+        self.download_workers = max(1, download_workers)
 
     def fetch(self, from_date=DEFAULT_DATETIME):
         """Fetch the mbox files from the remote archiver.
@@ -165,20 +205,17 @@ class HyperKittyList(MailingList):
         self.client.fetch(self.client.base_url)
 
         from_date = datetime_to_utc(from_date)
-        to_end = datetime_utcnow()
-        to_end += dateutil.relativedelta.relativedelta(months=1)
+        now = datetime_utcnow()
+        to_end = now + dateutil.relativedelta.relativedelta(months=1)
 
         months = months_range(from_date, to_end)
 
-        fetched = []
-
         if not os.path.exists(self.dirpath):
             os.makedirs(self.dirpath)
 
-        tmbox = 0
+        archives = []
 
         for dts in months:
-            tmbox += 1
             start, end = dts[0], dts[1]
             filename = start.strftime("%Y-%m.mbox.gz")
             filepath = os.path.join(self.dirpath, filename)
@@ -190,12 +227,15 @@ class HyperKittyList(MailingList):
                 'end': end.strftime("%Y-%m-%d")
             }
 
-            success = self._download_archive(url, params, filepath)
+            completed = datetime_to_utc(end) + self.MONTH_CLOSING_DELAY <= now
+            archives.append((url, params, filepath, completed))
+
+        results = concurrent_map(lambda archive: self._fetch_archive(*archive),
+                                 archives, max_workers=self.download_workers)
 
-            if success:
-                fetched.append((url, filepath))
+        fetched = [(archive[0], archive[2]) for archive, success in zip(archives, results) if success]
 
-        logger.info("%s/%s MBoxes downloaded", len(fetched), tmbox)
+        logger.info("%s/%s MBoxes downloaded", len(fetched), len(archives))
 
         return fetched
 
@@ -233,20 +273,107 @@ class HyperKittyList(MailingList):
 
         return dt
 
+    def _fetch_archive(self, url, params, filepath, completed):
+        """Download an archive unless it is completed and already stored"""
+
+        filename = os.path.basename(filepath)
+
+        if completed and self.__is_stored(filename, filepath):
+            logger.debug("%s archive already stored in %s; skipped", url, filepath)
+            return True
+
+        digest = self._download_archive(url, params, filepath)
+
+        if not digest:
+            return False
+
+        if completed and self.state:
+            stat = os.stat(filepath)
+            entry = {
+                'sha1': digest,
+                'size': stat.st_size,
+                'mtime': stat.st_mtime_ns
+            }
+            self.state.set(self.__manifest_namespace(), filename, entry)
+
+        return True
+
     def _download_archive(self, url, params, filepath):
+        """Download an archive, writing it in chunks.
+
+        Data is written to a temporary file first, so archives
+        are not left half written when the download fails.
+
+        :returns: the SHA1 hash of the archive or `None` when
+            it could not be stored
+        """
         r = self.client.fetch(url, payload=params, stream=True)
 
+        dirpath, filename = os.path.split(filepath)
+        part_path = os.path.join(dirpath, '.' + filename + '.part')
+        sha1 = hashlib.sha1()
+
         try:
-            with open(filepath, 'wb') as fd:
-                fd.write(r.raw.read())
+            with open(part_path, 'wb') as fd:
+                for chunk in r.raw.stream(self.CHUNK_SIZE, decode_content=False):
+                    sha1.update(chunk)
+                    fd.write(chunk)
+
+            os.replace(part_path, filepath)
         except OSError as e:
             logger.warning("Ignoring %s archive due to: %s", url, str(e))
-            return False
+
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            return None
 
         logger.debug("%s archive downloaded and stored in %s", url, filepath)
 
+        return sha1.hexdigest()
+
+    def __is_stored(self, filename, filepath):
+        """Check whether a stored archive matches its manifest entry.
+
+        Archives with the size and the modification time of the
+        entry are not read. The hash of the archive is only checked
+        when the modification time changed; when it matches, the
+        entry is updated with the new time.
+        """
+        if not self.state:
+            return False
+
+        entry = self.state.get(self.__manifest_namespace(), filename)
+
+        if not entry:
+            return False
+
+        try:
+            stat = os.stat(filepath)
+
+            if stat.st_size != entry['size']:
+                return False
+            if stat.st_mtime_ns == entry['mtime']:
+                return True
+
+            sha1 = hashlib.sha1()
+
+            with open(filepath, 'rb') as fd:
+                for chunk in iter(lambda: fd.read(self.CHUNK_SIZE), b''):
+                    sha1.update(chunk)
+        except OSError:
+            return False
+
+        if sha1.hexdigest() != entry['sha1']:
+            return False
+
+        entry['mtime'] = stat.st_mtime_ns
+        self.state.set(self.__manifest_namespace(), filename, entry)
+
         return True
 
+    def __manifest_namespace(self):
+        return 'hyperkitty:' + self.client.base_url
+
 
 class HyperKittyCommand(BackendCommand):
     """Class to run HyperKitty backend from the command line."""
@@ -274,6 +401,14 @@ class HyperKittyCommand(BackendCommand):
         group = parser.parser.add_argument_group('HyperKitty arguments')
         group.add_argument('--mboxes-path', dest='mboxes_path',
                            help="Path where mbox files will be stored")
+        group.add_argument('--state-path', dest='state_path',
+                           help="Path to the state store used to keep an index of the mboxes between runs")
+        group.add_argument('--max-workers', dest='max_workers',
+                           type=int, default=DEFAULT_MAX_WORKERS,
+                           help="Maximum number of processes parsing mboxes in parallel")
+        group.add_argument('--download-workers', dest='download_workers',
+                           type=int, default=DEFAULT_DOWNLOAD_WORKERS,
+                           help="Maximum number of archives downloaded concurrently")
 
         # Required arguments
         parser.parser.add_argument('url',
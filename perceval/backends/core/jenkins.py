@@ -31,10 +31,14 @@ from ...backend import (Backend,
                         BackendCommand,
                         BackendCommandArgumentParser)
 from ...client import HttpClient
+from ...state import StateStore
+from ...utils import concurrent_map
 
 CATEGORY_BUILD = "build"
 SLEEP_TIME = 10
 DETAIL_DEPTH = 1
+MAX_BUILDS = 100  # Maximum number of builds per request on incremental fetches
+DEFAULT_MAX_WORKERS = 1  # Number of jobs fetched concurrently
 
 logger = logging.getLogger(__name__)
 
@@ -53,13 +57,20 @@ class Jenkins(Backend):
     :param detail_depth: control the detail level of the data returned by the API
     :param sleep_time: minimun waiting time due to a timeout connection exception
     :param archive: collect builds already retrieved from an archive
+    :param max_workers: maximum number of jobs fetched concurrently
+    :param state_path: path to the state store used to fetch builds
+        incrementally; when it is set, the number of the last build
+        seen on each job is kept and only newer builds are requested
+        on the next runs. Builds still running are requested again
+        until they finish
     """
-    version = '0.11.0'
+    version = '0.12.0'
 
     CATEGORIES = [CATEGORY_BUILD]
 
     def __init__(self, url, tag=None, archive=None,
-                 blacklist_jobs=None, detail_depth=DETAIL_DEPTH, sleep_time=SLEEP_TIME):
+                 blacklist_jobs=None, detail_depth=DETAIL_DEPTH, sleep_time=SLEEP_TIME,
+                 max_workers=DEFAULT_MAX_WORKERS, state_path=None):
         origin = url
 
         super().__init__(origin, tag=tag, archive=archive)
@@ -67,8 +78,11 @@ class Jenkins(Backend):
         self.sleep_time = sleep_time
         self.blacklist_jobs = blacklist_jobs
         self.detail_depth = detail_depth
+        self.max_workers = max(1, max_workers)
+        self.state_path = state_path
 
         self.client = None
+        self._state = None
 
     def fetch(self, category=CATEGORY_BUILD):
         """Fetch the builds from the url.
@@ -81,7 +95,11 @@ class Jenkins(Backend):
         :returns: a generator of builds
         """
 
-        kwargs = {}
+        # The numbers of the last builds are stored with the rest
+        # of parameters, so archives can replay the same requests
+        kwargs = {
+            'last_builds': self.__load_last_builds()
+        }
         items = super().fetch(category, **kwargs)
 
         return items
@@ -94,49 +112,152 @@ class Jenkins(Backend):
 
         :returns: a generator of items
         """
+        last_builds = kwargs.get('last_builds', None) or {}
+
         logger.info("Looking for projects at url '%s'", self.url)
 
+        # Builds fetched from an archive do not update the state
+        if self.state_path and not self.client.from_archive:
+            self._state = self._state or StateStore(self.state_path)
+        else:
+            self._state = None
+
         nbuilds = 0  # number of builds processed
         njobs = 0  # number of jobs processed
 
         projects = json.loads(self.client.get_jobs())
         jobs = projects['jobs']
 
-        for job in jobs:
-            logger.debug("Adding builds from %s (%i/%i)",
-                         job['url'], njobs, len(jobs))
+        namespace = self.__state_namespace()
 
-            try:
-                raw_builds = self.client.get_builds(job['name'])
-            except requests.exceptions.HTTPError as e:
-                if e.response.status_code == 500:
-                    logger.warning(e)
-                    logger.warning("Unable to fetch builds from job %s; skipping",
-                                   job['url'])
-                    continue
-                else:
-                    raise e
+        def fetch_job_builds(job):
+            return self.__fetch_job_builds(job, last_builds.get(job['name'], None))
 
-            if not raw_builds:
-                continue
+        jobs_builds = concurrent_map(fetch_job_builds, jobs,
+                                     max_workers=self.max_workers)
 
-            try:
-                builds = json.loads(raw_builds)
-            except ValueError:
-                logger.warning("Unable to parse builds from job %s; skipping",
-                               job['url'])
+        for job, builds in zip(jobs, jobs_builds):
+            logger.debug("Adding builds from %s (%i/%i)",
+                         job['url'], njobs, len(jobs))
+
+            if builds is None:
                 continue
 
-            builds = builds['builds']
             for build in builds:
                 yield build
                 nbuilds += 1
 
+            if self._state and builds:
+                self._state.set(namespace, job['name'], self.__last_finished_number(builds))
+
             njobs += 1
 
         logger.info("Total number of jobs: %i/%i", njobs, len(jobs))
         logger.info("Total number of builds: %i", nbuilds)
 
+    def __load_last_builds(self):
+        """Get the number of the last build seen on each job"""
+
+        if not self.state_path:
+            return {}
+
+        self._state = self._state or StateStore(self.state_path)
+        namespace = self.__state_namespace()
+
+        return self._state.get_many(namespace, self._state.keys(namespace))
+
+    def __state_namespace(self):
+        return CATEGORY_BUILD + ':' + self.origin
+
+    def __fetch_job_builds(self, job, last_number=None):
+        """Fetch the builds of a job.
+
+        When `last_number` is given, only the builds newer than
+        that one are requested.
+
+        :returns: a list of builds or `None` when the builds
+            could not be retrieved
+        """
+        try:
+            if last_number is None:
+                raw_builds = self.client.get_builds(job['name'])
+                raw_builds = [raw_builds] if raw_builds else []
+            else:
+                raw_builds = self.__fetch_new_builds(job['name'], last_number)
+        except requests.exceptions.HTTPError as e:
+            if e.response.status_code == 500:
+                logger.warning(e)
+                logger.warning("Unable to fetch builds from job %s; skipping",
+                               job['url'])
+                return None
+            else:
+                raise e
+        except ValueError:
+            logger.warning("Unable to parse builds from job %s; skipping",
+                           job['url'])
+            return None
+
+        if not raw_builds:
+            return None
+
+        builds = []
+
+        for raw in raw_builds:
+            try:
+                builds.extend(json.loads(raw)['builds'])
+            except ValueError:
+                logger.warning("Unable to parse builds from job %s; skipping",
+                               job['url'])
+                return None
+
+        if last_number is not None:
+            builds = [build for build in builds if build['number'] > last_number]
+
+        return builds
+
+    @staticmethod
+    def __last_finished_number(builds):
+        """Get the number of the last build that will not change.
+
+        Builds that are still running will have a different result
+        once they finish, so the number returned is the one below
+        the oldest running build. When all the builds are finished,
+        the highest number is returned.
+        """
+        running = [build['number'] for build in builds if build.get('building', False)]
+
+        if running:
+            return min(running) - 1
+        else:
+            return max(build['number'] for build in builds)
+
+    def __fetch_new_builds(self, job_name, last_number):
+        """Fetch the raw pages of builds newer than `last_number`.
+
+        Builds are listed from the newest to the oldest, so pages
+        are requested until one includes the last build seen.
+        """
+        raw_pages = []
+        offset = 0
+
+        while True:
+            raw_builds = self.client.get_builds(job_name, offset=offset,
+                                                max_builds=MAX_BUILDS)
+            if not raw_builds:
+                break
+
+            raw_pages.append(raw_builds)
+
+            builds = json.loads(raw_builds)['builds']
+
+            if len(builds) < MAX_BUILDS or \
+                    any(build['number'] <= last_number for build in builds):
+                break
+
+            offset += MAX_BUILDS
+
+        return raw_pages
+
     @classmethod
     def has_archiving(cls):
         """Returns whether it supports archiving items on the fetch process.
@@ -224,14 +345,24 @@ class JenkinsClient(HttpClient):
         response = self.fetch(url_jenkins)
         return response.text
 
-    def get_builds(self, job_name):
-        """ Retrieve all builds from a job"""
+    def get_builds(self, job_name, offset=None, max_builds=None):
+        """ Retrieve all builds from a job.
 
+        When `offset` and `max_builds` are given, only the builds
+        in that range are retrieved, from the newest to the oldest.
+        The properties of the builds are expanded up to the level
+        set by `detail_depth`.
+        """
         if self.blacklist_jobs and job_name in self.blacklist_jobs:
             logging.info("Not getting blacklisted job: %s", job_name)
             return
 
-        payload = {'depth': self.detail_depth}
+        if offset is None:
+            payload = {'depth': self.detail_depth}
+        else:
+            fields = '*' + '[*' * self.detail_depth + ']' * self.detail_depth
+            payload = {'tree': 'builds[%s]{%s,%s}' % (fields, offset, offset + max_builds)}
+
         url_build = urijoin(self.base_url, "job", job_name, "api", "json")
 
         response = self.fetch(url_build, payload=payload)
@@ -263,6 +394,13 @@ class JenkinsCommand(BackendCommand):
                            type=int, default=SLEEP_TIME,
                            help="Minimun time to wait after a Timeout connection error.")
 
+        group.add_argument('--max-workers', dest='max_workers',
+                           type=int, default=DEFAULT_MAX_WORKERS,
+                           help="Maximum number of jobs fetched concurrently.")
+
+        group.add_argument('--state-path', dest='state_path',
+                           help="Path to the state store used to fetch builds incrementally.")
+
         # Required arguments
         parser.parser.add_argument('url',
                                    help="URL of the Jenkins server")
@@ -35,11 +35,12 @@ from ...backend import (Backend,
                         BackendCommand,
                         BackendCommandArgumentParser)
 from ...client import HttpClient
-from ...utils import DEFAULT_DATETIME
+from ...utils import DEFAULT_DATETIME, concurrent_map
 
 CATEGORY_ISSUE = "issue"
 
 MAX_ISSUES = 100  # Maximum number of issues per query
+DEFAULT_MAX_WORKERS = 1  # Number of pages of issues fetched concurrently
 
 logger = logging.getLogger(__name__)
 
@@ -56,9 +57,8 @@ def map_custom_field(custom_fields, fields):
         return {'id': cf['id'], 'name': cf['name'], 'value': v}
 
     return {
-        k: build_cf(custom_fields[k], v)
-        for k, v in fields.items()
-        if k in custom_fields
+        k: build_cf(custom_fields[k], fields[k])
+        for k in custom_fields.keys() & fields.keys()
     }
 
 
@@ -96,8 +96,15 @@ class Jira(Backend):
     :param max_issues: max number of issues per query
     :param tag: label used to mark the data
     :param archive: archive to store/retrieve items
+    :param max_workers: maximum number of pages of issues fetched
+        concurrently
+    :param fields: list of fields of the issues to retrieve; when it
+        is not set, all of them are retrieved. The field 'updated'
+        is always included
+    :param expand: list of entities expanded on the issues; when
+        it is not set, the default ones are expanded
     """
-    version = '0.11.4'
+    version = '0.12.0'
 
     CATEGORIES = [CATEGORY_ISSUE]
 
@@ -105,7 +112,8 @@ class Jira(Backend):
                  user=None, password=None,
                  verify=True, cert=None,
                  max_issues=MAX_ISSUES, tag=None,
-                 archive=None):
+                 archive=None, max_workers=DEFAULT_MAX_WORKERS,
+                 fields=None, expand=None):
         origin = url
 
         super().__init__(origin, tag=tag, archive=archive)
@@ -116,8 +124,15 @@ class Jira(Backend):
         self.verify = verify
         self.cert = cert
         self.max_issues = max_issues
+        self.max_workers = max(1, max_workers)
+        self.fields = fields
+        self.expand = expand
         self.client = None
 
+        # 'updated' field is needed to set the metadata of the items
+        if self.fields is not None and 'updated' not in self.fields:
+            self.fields = list(self.fields) + ['updated']
+
     def fetch(self, category=CATEGORY_ISSUE, from_date=DEFAULT_DATETIME):
         """Fetch the issues from the site.
 
@@ -161,8 +176,7 @@ class Jira(Backend):
             issues = self.parse_issues(whole_page)
             for issue in issues:
                 mapping = map_custom_field(custom_fields, issue['fields'])
-                for k, v in mapping.items():
-                    issue['fields'][k] = v
+                issue['fields'].update(mapping)
                 yield issue
 
     @classmethod
@@ -234,7 +248,9 @@ class Jira(Backend):
 
         return JiraClient(self.url, self.project, self.user, self.password,
                           self.verify, self.cert, self.max_issues,
-                          self.archive, from_archive)
+                          self.archive, from_archive,
+                          max_workers=self.max_workers,
+                          fields=self.fields, expand=self.expand)
 
 
 class JiraClient(HttpClient):
@@ -252,6 +268,10 @@ class JiraClient(HttpClient):
     :param max_issues: max number of issues per query
     :param archive: an archive to store/read fetched data
     :param from_archive: it tells whether to write/read the archive
+    :param max_workers: maximum number of pages fetched concurrently
+    :param fields: list of fields to retrieve; all when it is not set
+    :param expand: list of entities to expand; when it is not set,
+        the ones defined in `EXPAND` are used
 
     :raises HTTPError: when an error occurs doing the request
     """
@@ -261,7 +281,8 @@ class JiraClient(HttpClient):
     RESOURCE = 'rest/api'
 
     def __init__(self, url, project, user, password, verify, cert, max_issues=MAX_ISSUES,
-                 archive=None, from_archive=False):
+                 archive=None, from_archive=False, max_workers=DEFAULT_MAX_WORKERS,
+                 fields=None, expand=None):
         super().__init__(url, archive=archive, from_archive=from_archive)
         self.project = project
         self.user = user
@@ -269,6 +290,9 @@ class JiraClient(HttpClient):
         self.verify = verify
         self.cert = cert
         self.max_issues = max_issues
+        self.max_workers = max(1, max_workers)
+        self.fields = fields
+        self.expand = expand
 
         if not from_archive:
             self.__init_session()
@@ -276,32 +300,36 @@ class JiraClient(HttpClient):
     def get_issues(self, from_date):
         """Retrieve all the issues from a given date.
 
+        The first page tells the total number of issues and the
+        size of the pages. After that, the rest of the pages are
+        requested concurrently, up to `max_workers` at the same
+        time, and returned in order.
+
         :param from_date: obtain issues updated since this date
         """
-        start_at = 0
-
         url = urijoin(self.base_url, self.RESOURCE, self.VERSION_API, 'search')
-        req = self.fetch(url, payload=self.__build_payload(start_at, from_date))
-        issues = req.text
+        req = self.fetch(url, payload=self.__build_payload(0, from_date))
 
         data = req.json()
         tissues = data['total']
         nissues = data['maxResults']
 
-        start_at += min(nissues, tissues)
-        self.__log_status(start_at, tissues)
+        self.__log_status(min(nissues, tissues), tissues)
+
+        yield req.text
 
-        while issues:
-            yield issues
-            issues = None
+        if not nissues:
+            return
 
-            if data['startAt'] + nissues < tissues:
-                req = self.fetch(url, payload=self.__build_payload(start_at, from_date))
+        def fetch_page(start_at):
+            return self.fetch(url, payload=self.__build_payload(start_at, from_date))
 
-                data = req.json()
-                start_at += nissues
-                issues = req.text
-                self.__log_status(start_at, tissues)
+        offsets = range(data['startAt'] + nissues, tissues, nissues)
+        pages = concurrent_map(fetch_page, offsets, max_workers=self.max_workers)
+
+        for start_at, req in zip(offsets, pages):
+            self.__log_status(start_at + nissues, tissues)
+            yield req.text
 
     def get_fields(self):
         """Retrieve all the fields available."""
@@ -336,9 +364,17 @@ class JiraClient(HttpClient):
         payload = {
             'jql': self.__build_jql_query(from_date),
             'startAt': start_at,
-            'expand': self.EXPAND,
             'maxResults': self.max_issues
         }
+
+        if self.expand is None:
+            payload['expand'] = self.EXPAND
+        elif self.expand:
+            payload['expand'] = ','.join(self.expand)
+
+        if self.fields:
+            payload['fields'] = ','.join(self.fields)
+
         return payload
 
     def __log_status(self, max_issues, total):
@@ -385,6 +421,15 @@ class JiraCommand(BackendCommand):
         group.add_argument('--max-issues', dest='max_issues',
                            type=int, default=MAX_ISSUES,
                            help="Maximum number of issues requested in the same query")
+        group.add_argument('--max-workers', dest='max_workers',
+                           type=int, default=DEFAULT_MAX_WORKERS,
+                           help="Maximum number of pages of issues fetched concurrently")
+        group.add_argument('--fields', dest='fields',
+                           type=lambda s: s.split(',') if s else [], default=None,
+                           help="Comma separated list of fields of the issues to retrieve")
+        group.add_argument('--expand', dest='expand',
+                           type=lambda s: s.split(',') if s else [], default=None,
+                           help="Comma separated list of entities to expand on the issues; none when it is empty")
 
         # Required arguments
         parser.parser.add_argument('url',
@@ -22,6 +22,9 @@
 
 import json
 import logging
+import threading
+import time
+
 import requests
 
 from grimoirelab.toolkit.datetime import (datetime_to_utc,
@@ -32,16 +35,16 @@ from ...backend import (Backend,
                         BackendCommand,
                         BackendCommandArgumentParser)
 from ...client import HttpClient
-from ...utils import DEFAULT_DATETIME
+from ...utils import DEFAULT_DATETIME, concurrent_map
 
 CATEGORY_ISSUE = "issue"
 
 LAUNCHPAD_URL = "https://launchpad.net/"
 LAUNCHPAD_API_URL = 'https://api.launchpad.net/1.0'
 
-TARGET_ISSUE_FIELDS = ['bug_link', 'owner_link', 'assignee_link']
 ITEMS_PER_PAGE = 75
 SLEEP_TIME = 300
+DEFAULT_MAX_WORKERS = 1  # Number of requests run concurrently
 
 logger = logging.getLogger(__name__)
 
@@ -53,18 +56,28 @@ class Launchpad(Backend):
 
     :param distribution: Launchpad distribution
     :param package: Distribution package
-    :param items_per_page: number of items in a retrieved page
+    :param items_per_page: number of items in a retrieved page; the
+        API allows up to 300 items per page
     :param sleep_time: time to sleep in case of connection problems
     :param tag: label used to mark the data
     :param archive: archive to store/retrieve items
+    :param max_workers: maximum number of requests run concurrently to
+        fetch the data, collections and users of the issues
+    :param max_rate: maximum number of requests per second sent to the
+        server; when it is not set, requests are not throttled
     """
-    version = '0.6.2'
+    version = '0.7.0'
 
     CATEGORIES = [CATEGORY_ISSUE]
 
+    # Extra data added to each issue, in the order it is fetched
+    EXTRA_ISSUE_FIELDS = ['bug_data', 'activity_data', 'messages_data',
+                          'attachments_data', 'owner_data', 'assignee_data']
+
     def __init__(self, distribution, package=None,
                  items_per_page=ITEMS_PER_PAGE, sleep_time=SLEEP_TIME,
-                 tag=None, archive=None):
+                 tag=None, archive=None, max_workers=DEFAULT_MAX_WORKERS,
+                 max_rate=None):
 
         origin = urijoin(LAUNCHPAD_URL, distribution)
 
@@ -73,6 +86,8 @@ class Launchpad(Backend):
         self.package = package
         self.items_per_page = items_per_page
         self.sleep_time = sleep_time
+        self.max_workers = max(1, max_workers)
+        self.max_rate = max_rate
 
         self.client = None
         self._users = {}  # internal users cache
@@ -93,7 +108,12 @@ class Launchpad(Backend):
 
         from_date = datetime_to_utc(from_date)
 
-        kwargs = {'from_date': from_date}
+        # The page size is part of every request, so it is
+        # stored with the rest of parameters of the archive
+        kwargs = {
+            'from_date': from_date,
+            'items_per_page': self.items_per_page
+        }
         items = super().fetch(category, **kwargs)
 
         return items
@@ -107,6 +127,7 @@ class Launchpad(Backend):
         :returns: a generator of items
         """
         from_date = kwargs['from_date']
+        self.client.items_per_page = kwargs.get('items_per_page', self.items_per_page)
 
         logger.info("Fetching issues of '%s' distribution from %s",
                     self.distribution, str(from_date))
@@ -172,7 +193,8 @@ class Launchpad(Backend):
         """Init client"""
 
         return LaunchpadClient(self.distribution, self.package, self.items_per_page,
-                               self.sleep_time, self.archive, from_archive)
+                               self.sleep_time, self.archive, from_archive,
+                               max_rate=self.max_rate)
 
     def __init_extra_issue_fields(self, issue):
         """Add fields to an issue"""
@@ -189,34 +211,62 @@ class Launchpad(Backend):
         return bug_link.split('/')[-1]
 
     def _fetch_issues(self, from_date):
-        """Fetch the issues from a project (distribution/package)"""
-
-        issues_groups = self.client.issues(start=from_date)
+        """Fetch the issues from a project (distribution/package).
 
-        for raw_issues in issues_groups:
+        The data, collections and users of each issue are requested
+        as independent tasks, up to `max_workers` at the same time.
+        Issues are returned in order once all their tasks are done.
+        """
+        def fetch_tasks():
+            for raw_issues in self.client.issues(start=from_date):
+                issues = json.loads(raw_issues)['entries']
 
-            issues = json.loads(raw_issues)['entries']
-            for issue in issues:
-                issue = self.__init_extra_issue_fields(issue)
-                issue_id = self.__extract_issue_id(issue['bug_link'])
+                for issue in issues:
+                    issue = self.__init_extra_issue_fields(issue)
 
-                for field in TARGET_ISSUE_FIELDS:
+                    for field in self.EXTRA_ISSUE_FIELDS:
+                        yield issue, field
 
-                    if not issue[field]:
-                        continue
+        last_field = self.EXTRA_ISSUE_FIELDS[-1]
+        results = concurrent_map(self.__fetch_issue_field, fetch_tasks(),
+                                 max_workers=self.max_workers)
 
-                    if field == 'bug_link':
-                        issue['bug_data'] = self.__fetch_issue_data(issue_id)
-                        issue['activity_data'] = [activity for activity in self.__fetch_issue_activities(issue_id)]
-                        issue['messages_data'] = [message for message in self.__fetch_issue_messages(issue_id)]
-                        issue['attachments_data'] = [attachment for attachment in self.__fetch_issue_attachments(issue_id)]
-                    elif field == 'assignee_link':
-                        issue['assignee_data'] = self.__fetch_user_data('{ASSIGNEE}', issue[field])
-                    elif field == 'owner_link':
-                        issue['owner_data'] = self.__fetch_user_data('{OWNER}', issue[field])
+        for issue, field, value in results:
+            if value is not None:
+                issue[field] = value
 
+            if field == last_field:
                 yield issue
 
+    def __fetch_issue_field(self, task):
+        """Fetch the value of an extra field of an issue.
+
+        :returns: a tuple with the issue, the field and the value
+            or `None` when the issue does not link to that data
+        """
+        issue, field = task
+        value = None
+
+        if field == 'owner_data':
+            if issue['owner_link']:
+                value = self.__fetch_user_data('{OWNER}', issue['owner_link'])
+        elif field == 'assignee_data':
+            if issue['assignee_link']:
+                value = self.__fetch_user_data('{ASSIGNEE}', issue['assignee_link'])
+        elif issue['bug_link']:
+            issue_id = self.__extract_issue_id(issue['bug_link'])
+
+            if field == 'bug_data':
+                value = self.__fetch_issue_data(issue_id)
+            elif field == 'activity_data':
+                value = [activity for activity in self.__fetch_issue_activities(issue_id)]
+            elif field == 'messages_data':
+                value = [message for message in self.__fetch_issue_messages(issue_id)]
+            elif field == 'attachments_data':
+                value = [attachment for attachment in self.__fetch_issue_attachments(issue_id)]
+
+        return issue, field, value
+
     def __fetch_issue_data(self, issue_id):
         """Get data associated to an issue"""
 
@@ -279,17 +329,25 @@ class LaunchpadClient(HttpClient):
     :param sleep_time: time to sleep in case of connection problems
     :param archive: an archive to store/read fetched data
     :param from_archive: it tells whether to write/read the archive
+    :param max_rate: maximum number of requests per second; when it
+        is not set, requests are not throttled
     """
 
     _users = {}
 
     def __init__(self, distribution, package=None,
                  items_per_page=ITEMS_PER_PAGE, sleep_time=SLEEP_TIME,
-                 archive=None, from_archive=False):
+                 archive=None, from_archive=False, max_rate=None):
 
         self.distribution = distribution
         self.package = package
         self.items_per_page = items_per_page
+        self.max_rate = max_rate
+
+        self._users_lock = threading.Lock()
+        self._users_locks = {}
+        self._rate_lock = threading.Lock()
+        self._next_request_ts = 0
 
         extra_headers = self.__define_headers()
         super().__init__(LAUNCHPAD_API_URL, sleep_time=sleep_time, extra_headers=extra_headers,
@@ -305,6 +363,15 @@ class LaunchpadClient(HttpClient):
     def user(self, user_name):
         """Get the user data by URL"""
 
+        # Requests for the same user are serialized, so
+        # each user is only fetched once by all the threads
+        with self._users_lock:
+            user_lock = self._users_locks.setdefault(user_name, threading.Lock())
+
+        with user_lock:
+            return self.__fetch_user(user_name)
+
+    def __fetch_user(self, user_name):
         user = None
 
         if user_name in self._users:
@@ -388,9 +455,26 @@ class LaunchpadClient(HttpClient):
     def __send_request(self, url, params=None):
         """Send request"""
 
+        self.__wait_for_rate()
+
         r = self.fetch(url, payload=params)
         return r.text
 
+    def __wait_for_rate(self):
+        """Sleep until a new request can be sent without exceeding `max_rate`"""
+
+        if not self.max_rate or self.from_archive:
+            return
+
+        with self._rate_lock:
+            now = time.time()
+            wait = self._next_request_ts - now
+            self._next_request_ts = max(now, self._next_request_ts) + 1.0 / self.max_rate
+
+        if wait > 0:
+            logger.debug("Waiting %.2f secs to keep the request rate", wait)
+            time.sleep(wait)
+
     def __build_payload(self, size, operation=False, startdate=None):
         """Build payload"""
 
@@ -463,6 +547,11 @@ class LaunchpadCommand(BackendCommand):
                            help="Items per page")
         group.add_argument('--sleep-time', dest='sleep_time',
                            help="Sleep time in case of connection lost")
+        group.add_argument('--max-workers', dest='max_workers',
+                           type=int, default=DEFAULT_MAX_WORKERS,
+                           help="Maximum number of requests run concurrently")
+        group.add_argument('--max-rate', dest='max_rate', type=float,
+                           help="Maximum number of requests per second")
 
         # Required arguments
         parser.parser.add_argument('distribution',
@@ -23,10 +23,12 @@
 # Note: some ot this code was taken from the MailingListStats project
 #
 
+import itertools
 import logging
 import mailbox
+import mmap
 import os
-import tempfile
+import time
 
 import gzip
 import bz2
@@ -38,12 +40,17 @@ from grimoirelab.toolkit.datetime import (InvalidDateError,
 from ...backend import (Backend,
                         BackendCommand,
                         BackendCommandArgumentParser)
+from ...state import StateStore
 from ...utils import (DEFAULT_DATETIME,
                       check_compressed_file_type,
+                      concurrent_map,
+                      message_headers_to_dict,
                       message_to_dict)
 
 CATEGORY_MESSAGE = "message"
 
+DEFAULT_MAX_WORKERS = 1  # Number of processes parsing mboxes in parallel
+
 logger = logging.getLogger(__name__)
 
 
@@ -60,20 +67,35 @@ class MBox(Backend):
     :param dirpath: directory path where the mboxes are stored
     :param tag: label used to mark the data
     :param archive: archive to store/retrieve items
+    :param state_path: path to the state store used to keep an index
+        of each mbox between runs; when it is set, the parts of the
+        mboxes that cannot have messages since the given date are
+        not parsed
+    :param max_workers: maximum number of processes parsing mboxes
+        in parallel
     """
-    version = '0.10.2'
+    version = '0.14.0'
 
     CATEGORIES = [CATEGORY_MESSAGE]
 
     DATE_FIELD = 'Date'
     MESSAGE_ID_FIELD = 'Message-ID'
 
-    def __init__(self, uri, dirpath, tag=None, archive=None):
+    # Plain mboxes bigger than this size are split to be
+    # parsed in parallel
+    PARSING_CHUNK_SIZE = 64 * 1024 * 1024
+
+    def __init__(self, uri, dirpath, tag=None, archive=None, state_path=None,
+                 max_workers=DEFAULT_MAX_WORKERS):
         origin = uri
 
         super().__init__(origin, tag=tag, archive=archive)
         self.uri = uri
         self.dirpath = dirpath
+        self.state_path = state_path
+        self.max_workers = max(1, max_workers)
+
+        self._state = None
 
     def fetch(self, category=CATEGORY_MESSAGE, from_date=DEFAULT_DATETIME):
         """Fetch the messages from a set of mbox files.
@@ -171,12 +193,15 @@ class MBox(Backend):
         This method parses a mbox file and returns an iterator of dictionaries.
         Each one of this contains an email message.
 
+        The file can be plain or compressed (gzip or bz2). Messages
+        are read directly from it, without making any copy.
+
         :param filepath: path of the mbox to parse
 
         :returns : generator of messages; each message is stored in a
             dictionary of type `requests.structures.CaseInsensitiveDict`
         """
-        mbox = _MBox(filepath, create=False)
+        mbox = _MBoxReader(MBoxArchive(filepath))
 
         for msg in mbox:
             message = message_to_dict(msg)
@@ -190,27 +215,30 @@ class MBox(Backend):
 
         from_date = datetime_to_utc(from_date)
 
-        nmsgs, imsgs, tmsgs = (0, 0, 0)
+        if self.state_path:
+            self._state = self._state or StateStore(self.state_path)
+        else:
+            self._state = None
 
-        for mbox in mailing_list.mboxes:
-            tmp_path = None
+        nmsgs, imsgs, tmsgs = (0, 0, 0)
 
+        for mbox, index, messages in self._read_mboxes(mailing_list, from_date):
             try:
-                tmp_path = self._copy_mbox(mbox)
-
-                for message in self.parse_mbox(tmp_path):
+                for msg_offset, headers, message in messages:
                     tmsgs += 1
 
-                    if not self._validate_message(message):
+                    if not self._validate_message(headers):
+                        self.__add_to_index(index, msg_offset, None)
                         imsgs += 1
                         continue
 
                     # Ignore those messages sent before the given date
-                    dt = str_to_datetime(message[MBox.DATE_FIELD])
+                    dt = str_to_datetime(headers[MBox.DATE_FIELD])
+                    self.__add_to_index(index, msg_offset, dt.timestamp())
 
                     if dt < from_date:
                         logger.debug("Message %s sent before %s; skipped",
-                                     message['unixfrom'], str(from_date))
+                                     headers['unixfrom'], str(from_date))
                         tmsgs -= 1
                         continue
 
@@ -221,29 +249,225 @@ class MBox(Backend):
                     logger.debug("Message %s parsed", message['unixfrom'])
 
                     yield message
+
+                if self._state:
+                    self._state.set(self.__index_namespace(), os.path.abspath(mbox.filepath), index)
             except (OSError, EOFError) as e:
                 logger.warning("Ignoring %s mbox due to: %s", mbox.filepath, str(e))
-            except Exception as e:
-                if tmp_path and os.path.exists(tmp_path):
-                    os.remove(tmp_path)
-                raise e
-            finally:
-                if tmp_path and os.path.exists(tmp_path):
-                    os.remove(tmp_path)
 
         logger.info("Done. %s/%s messages fetched; %s ignored",
                     nmsgs, tmsgs, imsgs)
 
-    def _copy_mbox(self, mbox):
-        """Copy the contents of a mbox to a temporary file"""
+    def _read_mboxes(self, mailing_list, from_date):
+        """Read the messages of the mboxes of a mailing list.
+
+        Mboxes that can be skipped according to their index are not
+        read. When `max_workers` is greater than one, mboxes are parsed
+        on a pool of processes. Plain mboxes bigger than
+        `PARSING_CHUNK_SIZE` are split in ranges of bytes, starting on
+        a "From " line, that are parsed in parallel too. Messages are
+        returned in the same order they are stored.
+
+        :returns: a generator of tuples with a mbox, its index and
+            a generator of its messages
+        """
+        mboxes = []
+
+        for mbox in mailing_list.mboxes:
+            try:
+                offset, index = self._load_mbox_index(mbox, from_date)
+            except OSError as e:
+                logger.warning("Ignoring %s mbox due to: %s", mbox.filepath, str(e))
+                continue
+
+            if offset is None:
+                logger.debug("Mbox %s did not change and has no messages since %s; skipped",
+                             mbox.filepath, str(from_date))
+                continue
+
+            mboxes.append((mbox, offset, index))
+
+        if self.max_workers < 2:
+            for mbox, offset, index in mboxes:
+                yield mbox, index, self._read_mbox(mbox, offset, from_date)
+            return
+
+        ranges = [(n, (mbox.filepath, start, end, from_date))
+                  for n, (mbox, offset, _) in enumerate(mboxes)
+                  for start, end in self.__split_mbox(mbox, offset)]
+
+        results = concurrent_map(_parse_mbox_range, [r for _, r in ranges],
+                                 max_workers=self.max_workers, processes=True)
+        results = zip([n for n, _ in ranges], results)
+
+        stats = {}
+
+        for n, group in itertools.groupby(results, key=lambda r: r[0]):
+            mbox, _, index = mboxes[n]
+            yield mbox, index, self.__read_parsed_ranges(group, stats)
+
+        for worker, wstats in sorted(stats.items()):
+            mbytes = wstats['bytes'] / (1024 * 1024)
+            logger.info("Worker %s parsed %s messages (%.2f MB) at %.2f MB/s",
+                        worker, wstats['messages'], mbytes,
+                        mbytes / wstats['time'] if wstats['time'] else 0)
+
+    def _read_mbox(self, mbox, offset=0, from_date=DEFAULT_DATETIME):
+        """Read the messages of a mbox from the given offset.
+
+        Messages are parsed in two phases. See `_parse_raw_message`
+        for more information.
+
+        :returns: a generator of tuples with the offset, the headers
+            and the parsed data of each message
+        """
+        reader = _MBoxReader(mbox)
+
+        for msg_offset, from_line, string in reader.raw_messages(offset=offset):
+            headers, message = _parse_raw_message(from_line, string, from_date)
+            yield msg_offset, headers, message
+
+    def _load_mbox_index(self, mbox, from_date):
+        """Get the offset where to start reading a mbox and its index.
+
+        The index of a mbox stores its size, its modification time,
+        the offset and the date of each of its messages and the dates
+        of the oldest and the newest messages. Invalid messages are
+        stored without date. When the state store is set, the index
+        of the previous run is used to know which part of the mbox
+        has to be parsed. Reading starts at the first message sent
+        since `from_date`; the messages before it are not parsed.
+        When none of them was sent since that date, unchanged mboxes
+        are skipped and only the new bytes of those that were appended
+        are parsed.
+
+        :returns: a tuple with the offset, which is `None` when the
+            mbox can be skipped, and the index to update
+        """
+        stat = os.stat(mbox.filepath)
+
+        index = {
+            'size': stat.st_size,
+            'mtime': stat.st_mtime_ns,
+            'offsets': [],
+            'first_date': None,
+            'last_date': None
+        }
+
+        if not self._state:
+            return 0, index
+
+        stored = self._state.get(self.__index_namespace(), os.path.abspath(mbox.filepath))
+
+        if not stored:
+            return 0, index
+
+        offset = self.__find_offset_since(stored, from_date.timestamp())
+
+        if stored['size'] == index['size'] and stored['mtime'] == index['mtime']:
+            if offset is None:
+                return None, stored
+        elif not mbox.is_compressed() and self.__is_appended(mbox, stored):
+            if offset is None:
+                offset = stored['size']
+        else:
+            return 0, index
+
+        for msg_offset, ts in stored['offsets']:
+            if msg_offset >= offset:
+                break
+            self.__add_to_index(index, msg_offset, ts)
+
+        return offset, index
+
+    def __split_mbox(self, mbox, offset):
+        """Split a plain mbox in ranges of bytes starting on a "From " line"""
+
+        if mbox.is_compressed():
+            return [(offset, None)]
+
+        size = os.path.getsize(mbox.filepath)
+
+        if size <= offset + self.PARSING_CHUNK_SIZE:
+            return [(offset, None)]
+
+        ranges = []
+
+        with open(mbox.filepath, mode='rb') as fd:
+            with mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                start = offset
+
+                while start < size:
+                    pos = data.find(_MBoxReader.SEPARATOR, start + self.PARSING_CHUNK_SIZE - 1)
+                    end = pos + 1 if pos >= 0 else size
+                    ranges.append((start, end))
+                    start = end
+
+        return ranges
+
+    @staticmethod
+    def __read_parsed_ranges(results, stats):
+        for _, result in results:
+            if result['error']:
+                raise result['error']
+
+            wstats = stats.setdefault(result['worker'], {'messages': 0, 'bytes': 0, 'time': 0})
+            wstats['messages'] += len(result['messages'])
+            wstats['bytes'] += result['bytes']
+            wstats['time'] += result['time']
+
+            for msg_offset, headers, message in result['messages']:
+                yield msg_offset, headers, message
+
+    def __index_namespace(self):
+        return 'mbox:' + self.origin
+
+    @staticmethod
+    def __is_appended(mbox, stored):
+        """Check whether new messages were appended to a plain mbox"""
+
+        size = stored['size']
 
-        tmp_path = tempfile.mktemp(prefix='perceval_')
+        if os.path.getsize(mbox.filepath) <= size:
+            return False
+
+        with open(mbox.filepath, mode='rb') as fd:
+            if size > 0:
+                fd.seek(size - 1)
+                if fd.read(1) != b'\n':
+                    return False
+
+            fd.seek(size)
+            if fd.read(len(_MBoxReader.FROM_LINE)) != _MBoxReader.FROM_LINE:
+                return False
+
+            if stored['offsets']:
+                fd.seek(stored['offsets'][-1][0])
+                if fd.read(len(_MBoxReader.FROM_LINE)) != _MBoxReader.FROM_LINE:
+                    return False
+
+        return True
+
+    @staticmethod
+    def __find_offset_since(stored, ts):
+        """Find the offset of the first message sent since the given timestamp"""
+
+        for msg_offset, msg_ts in stored['offsets']:
+            if msg_ts is not None and msg_ts >= ts:
+                return msg_offset
 
-        with mbox.container as f_in:
-            with open(tmp_path, mode='wb') as f_out:
-                for l in f_in:
-                    f_out.write(l)
-        return tmp_path
+        return None
+
+    @staticmethod
+    def __add_to_index(index, offset, ts):
+        index['offsets'].append([offset, ts])
+
+        if ts is None:
+            return
+        if index['first_date'] is None or ts < index['first_date']:
+            index['first_date'] = ts
+        if index['last_date'] is None or ts > index['last_date']:
+            index['last_date'] = ts
 
     def _validate_message(self, message):
         """Check if the given message has the mandatory fields"""
@@ -296,30 +520,221 @@ class MBox(Backend):
         return msg
 
 
-class _MBox(mailbox.mbox):
-    """Wrapper of `mailbox.mbox` to catch unhandled errors"""
+class _MBoxReader:
+    """Streaming reader of mbox archives.
+
+    Messages are read straight from the archive, looking for
+    the "From " lines that separate them. Plain files are memory
+    mapped, so the separators are found without reading the file
+    line by line; compressed files are decompressed on the fly.
+
+    Messages are split the same way `mailbox.mbox` does: the blank
+    line before a "From " line, or before the end of the file, is
+    not part of the message.
+
+    :param mbox: `MBoxArchive` object to read
+    """
+    FROM_LINE = b'From '
+    SEPARATOR = b'\n' + FROM_LINE
+    LAST_EMPTY_LINE = b'\n' + mailbox.linesep
+
+    def __init__(self, mbox):
+        self.mbox = mbox
+
+    def __iter__(self):
+        for _, from_line, string in self.raw_messages():
+            yield self.build_message(from_line, string)
+
+    def raw_messages(self, offset=0, end=None):
+        """Read the raw content of the messages.
+
+        Reading starts at the given offset, that must point to
+        the beginning of a line, and stops at `end`, which must
+        point to a "From " line or to the end of the file. Offsets
+        of compressed archives refer to the uncompressed data.
+
+        :param offset: offset where to start reading
+        :param end: offset where to stop reading; when it is not
+            set, messages are read until the end of the file
+
+        :returns: a generator of tuples with the offset, the "From "
+            line and the content of each message, in bytes
+        """
+        if self.mbox.is_compressed():
+            messages = self._read_stream(offset, end)
+        else:
+            messages = self._read_mmap(offset, end)
+
+        for msg_offset, from_line, string in messages:
+            yield msg_offset, from_line, string
+
+    @classmethod
+    def build_message(cls, from_line, string):
+        """Build a `mailbox.mboxMessage` from its raw content"""
+
+        msg = mailbox.mboxMessage(string.replace(mailbox.linesep, b'\n'))
+        msg.set_from(cls.decode_from_line(from_line))
+
+        return msg
 
-    def get_message(self, key):
-        """Return a Message representation or raise a KeyError."""
+    @staticmethod
+    def decode_from_line(from_line):
+        """Decode a "From " line, removing the leading "From " text"""
 
-        start, stop = self._lookup(key)
-        self._file.seek(start)
-        from_line = self._file.readline().replace(mailbox.linesep, b'')
-        string = self._file.read(stop - self._file.tell())
-        msg = self._message_factory(string.replace(mailbox.linesep, b'\n'))
+        from_line = from_line.replace(mailbox.linesep, b'')[5:]
 
         try:
-            msg.set_from(from_line[5:].decode('ascii'))
-            return msg
+            return from_line.decode('ascii')
         except UnicodeDecodeError:
             pass
 
         try:
-            msg.set_from(from_line[5:].decode('utf-8'))
+            return from_line.decode('utf-8')
         except UnicodeDecodeError:
-            msg.set_from(from_line[5:].decode('iso-8859-1'))
+            return from_line.decode('iso-8859-1')
+
+    def _read_mmap(self, offset, end):
+        with open(self.mbox.filepath, mode='rb') as fd:
+            if os.fstat(fd.fileno()).st_size <= offset:
+                return
+
+            with mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if data[offset:offset + len(self.FROM_LINE)] == self.FROM_LINE:
+                    start = offset
+                else:
+                    start = self.__find_from_line(data, offset)
+
+                end = len(data) if end is None else min(end, len(data))
+
+                while start < end:
+                    next_start = self.__find_from_line(data, start)
+
+                    # Content starts after the "From " line
+                    content = data.find(b'\n', start, next_start) + 1 or next_start
+                    stop = next_start
+
+                    if data[max(content - 1, stop - len(self.LAST_EMPTY_LINE)):stop] == self.LAST_EMPTY_LINE:
+                        stop -= len(mailbox.linesep)
+
+                    yield start, data[start:content], data[content:max(content, stop)]
+
+                    start = next_start
+
+    def _read_stream(self, offset, end):
+        from_line = None
+        start = None
+        lines = []
+        last_was_empty = False
+        pos = 0
+
+        with self.mbox.container as fd:
+            for line in fd:
+                line_pos = pos
+                pos += len(line)
+
+                if line_pos < offset:
+                    continue
+                elif end is not None and line_pos >= end:
+                    break
+                elif line.startswith(self.FROM_LINE):
+                    if from_line is not None:
+                        yield start, from_line, self.__join_lines(lines, last_was_empty)
+                    start = line_pos
+                    from_line = line
+                    lines = []
+                    last_was_empty = False
+                elif from_line is not None:
+                    lines.append(line)
+                    last_was_empty = line == mailbox.linesep
+
+        if from_line is not None:
+            yield start, from_line, self.__join_lines(lines, last_was_empty)
+
+    def __find_from_line(self, data, start):
+        pos = data.find(self.SEPARATOR, start)
+        return pos + 1 if pos >= 0 else len(data)
 
-        return msg
+    @staticmethod
+    def __join_lines(lines, last_was_empty):
+        if last_was_empty:
+            lines = lines[:-1]
+        return b''.join(lines)
+
+
+def _parse_raw_message(from_line, string, from_date):
+    """Parse a raw message in two phases.
+
+    First, only the headers needed to validate and filter the
+    message are parsed. The whole message is parsed only when
+    it is valid and it was sent since `from_date`, so messages
+    that will not be returned are not decoded.
+
+    :param from_line: "From " line of the message, in bytes
+    :param string: content of the message, in bytes
+    :param from_date: date from which messages are fully parsed
+
+    :returns: a tuple with the headers and the parsed data of the
+        message; the latter is `None` when it was not parsed
+    """
+    string = string.replace(mailbox.linesep, b'\n')
+
+    headers = message_headers_to_dict(string, [MBox.MESSAGE_ID_FIELD, MBox.DATE_FIELD])
+    headers['unixfrom'] = _MBoxReader.decode_from_line(from_line)
+
+    if not headers.get(MBox.MESSAGE_ID_FIELD) or not headers.get(MBox.DATE_FIELD):
+        return headers, None
+
+    try:
+        if str_to_datetime(headers[MBox.DATE_FIELD]) < from_date:
+            return headers, None
+    except InvalidDateError:
+        return headers, None
+
+    message = message_to_dict(_MBoxReader.build_message(from_line, string))
+
+    return headers, message
+
+
+def _parse_mbox_range(mbox_range):
+    """Parse the messages stored on a range of bytes of a mbox.
+
+    This function runs on the pool of processes that parses
+    mboxes in parallel, so its results must be picklable.
+    I/O errors are returned to be handled by the backend.
+
+    :param mbox_range: tuple with the path of the mbox, the
+        offsets where the range starts and ends and the date
+        from which messages are fully parsed
+
+    :returns: a dict with the offsets and the parsed data of the
+        messages and some stats about the work done
+    """
+    filepath, start, end, from_date = mbox_range
+
+    messages = []
+    nbytes = 0
+    error = None
+    t0 = time.time()
+
+    try:
+        reader = _MBoxReader(MBoxArchive(filepath))
+
+        for msg_offset, from_line, string in reader.raw_messages(offset=start, end=end):
+            headers, message = _parse_raw_message(from_line, string, from_date)
+            messages.append((msg_offset, headers, message))
+            nbytes += len(from_line) + len(string)
+    except (OSError, EOFError) as e:
+        error = e
+
+    result = {
+        'worker': os.getpid(),
+        'messages': messages,
+        'bytes': nbytes,
+        'time': time.time() - t0,
+        'error': error
+    }
+
+    return result
 
 
 class MBoxCommand(BackendCommand):
@@ -333,6 +748,14 @@ class MBoxCommand(BackendCommand):
 
         parser = BackendCommandArgumentParser(from_date=True)
 
+        # Optional arguments
+        group = parser.parser.add_argument_group('MBox arguments')
+        group.add_argument('--state-path', dest='state_path',
+                           help="Path to the state store used to keep an index of the mboxes between runs")
+        group.add_argument('--max-workers', dest='max_workers',
+                           type=int, default=DEFAULT_MAX_WORKERS,
+                           help="Maximum number of processes parsing mboxes in parallel")
+
         # Required arguments
         parser.parser.add_argument('uri',
                                    help="URI of the mboxes, usually the URL to their mailing list")
@@ -35,13 +35,14 @@ from ...backend import (Backend,
                         BackendCommandArgumentParser)
 from ...client import HttpClient
 from ...errors import BackendError
-from ...utils import DEFAULT_DATETIME
+from ...utils import DEFAULT_DATETIME, concurrent_map
 
 CATEGORY_PAGE = 'page'
 
 logger = logging.getLogger(__name__)
 
 MAX_RECENT_DAYS = 30  # max number of days included in MediaWiki recent changes
+DEFAULT_MAX_WORKERS = 1  # number of pages which revisions are fetched concurrently
 
 
 class MediaWiki(Backend):
@@ -68,18 +69,21 @@ class MediaWiki(Backend):
     Deleted pages are not analyzed.
 
     :param url: MediaWiki url
+    :param max_workers: maximum number of pages which revisions are
+        fetched concurrently
     :param tag: label used to mark the data
     :param archive: archive to store/retrieve items
     """
-    version = '0.9.4'
+    version = '0.10.0'
 
     CATEGORIES = [CATEGORY_PAGE]
 
-    def __init__(self, url, tag=None, archive=None):
+    def __init__(self, url, max_workers=DEFAULT_MAX_WORKERS, tag=None, archive=None):
         origin = url
 
         super().__init__(origin, tag=tag, archive=archive)
         self.url = url
+        self.max_workers = max(1, max_workers)
         self.client = None
 
     def fetch(self, category=CATEGORY_PAGE, from_date=DEFAULT_DATETIME, reviews_api=False):
@@ -211,9 +215,21 @@ class MediaWiki(Backend):
         logger.info("Looking for pages at url '%s'", self.url)
 
         npages = 0  # number of pages processed
-        pages_done = []  # pages already retrieved in reviews API
 
         namespaces_contents = self.__get_namespaces_contents()
+        pages = self.__fetch_pages_from_allrevisions(namespaces_contents, from_date)
+
+        for page_reviews in concurrent_map(self.__get_page_reviews, pages,
+                                           max_workers=self.max_workers):
+            yield page_reviews
+            npages += 1
+
+        logger.info("Total number of pages: %i", npages)
+
+    def __fetch_pages_from_allrevisions(self, namespaces_contents, from_date=None):
+        """Get the pages with revisions, each of them only once"""
+
+        pages_done = set()  # pages already retrieved in reviews API
 
         arvcontinue = ''  # pagination for getting revisions and their pages
         while arvcontinue is not None:
@@ -228,17 +244,41 @@ class MediaWiki(Backend):
                 if page['pageid'] in pages_done:
                     # The page was already returned for previous revisions
                     continue
-                pages_done.append(page['pageid'])
-                yield self.__get_page_reviews(page)
-                npages += 1
-
-        logger.info("Total number of pages: %i", npages)
+                pages_done.add(page['pageid'])
+                yield page
 
     def __get_page_reviews(self, page):
-        revisions_raw = self.client.get_revisions(page['title'])
-        page_reviews = self.__build_page_reviews(page, json.loads(revisions_raw))
+        reviews = None
+        rvcontinue = ''  # pagination for getting the revisions of the page
+
+        while rvcontinue is not None:
+            revisions_raw = self.client.get_revisions(page['title'], rvcontinue=rvcontinue)
+            data_json = json.loads(revisions_raw)
+            if 'query-continue' in data_json:
+                # < 1.26
+                rvcontinue = data_json['query-continue']['revisions']['rvcontinue']
+            elif 'continue' in data_json:
+                # >= 1.26
+                rvcontinue = data_json['continue'].get('rvcontinue', None)
+            else:
+                rvcontinue = None
+
+            if reviews is None:
+                reviews = data_json
+            else:
+                self.__merge_revisions(reviews, data_json)
+
+        page_reviews = self.__build_page_reviews(page, reviews)
         return page_reviews
 
+    @staticmethod
+    def __merge_revisions(reviews, next_reviews):
+        pages = reviews['query']['pages']
+
+        for pageid, page_json in next_reviews['query']['pages'].items():
+            revisions = pages.setdefault(pageid, {}).setdefault('revisions', [])
+            revisions.extend(page_json.get('revisions', []))
+
     def __fetch_pre1_27(self, from_date=None):
         """Fetch the pages from the backend url.
 
@@ -248,9 +288,8 @@ class MediaWiki(Backend):
         :returns: a generator of pages
         """
 
-        def fetch_incremental_changes(namespaces_contents):
+        def fetch_recent_pages(namespaces_contents):
             # Use recent changes API to get the pages from date
-            npages = 0  # number of pages processed
             rccontinue = ''
             hole_created = True  # To detect that incremental is not complete
             while rccontinue is not None:
@@ -273,20 +312,24 @@ class MediaWiki(Backend):
                         rccontinue = None
                         hole_created = False
                         break
-                    page_reviews = self.__get_page_reviews(page)
-                    if not page_reviews:
-                        # Page without reviews are not managed
-                        continue
-                    yield page_reviews
-                    npages += 1
+                    yield page
             if hole_created:
                 logger.error("Incremental update NOT completed. Hole in history created.")
-            logger.info("Total number of pages: %i", npages)
 
-        def fetch_all_pages(namespaces_contents):
-            # Use get all pages API to get pages
+        def fetch_incremental_changes(namespaces_contents):
             npages = 0  # number of pages processed
+            pages = fetch_recent_pages(namespaces_contents)
+            for page_reviews in concurrent_map(self.__get_page_reviews, pages,
+                                               max_workers=self.max_workers):
+                if not page_reviews:
+                    # Page without reviews are not managed
+                    continue
+                yield page_reviews
+                npages += 1
+            logger.info("Total number of pages: %i", npages)
 
+        def fetch_pages(namespaces_contents):
+            # Use get all pages API to get pages
             for ns in namespaces_contents:
                 apcontinue = ''  # pagination for getting pages
                 logger.debug("Getting pages for namespace: %s", ns)
@@ -303,8 +346,15 @@ class MediaWiki(Backend):
                         apcontinue = None
                     pages_json = data_json['query']['allpages']
                     for page in pages_json:
-                        yield self.__get_page_reviews(page)
-                        npages += 1
+                        yield page
+
+        def fetch_all_pages(namespaces_contents):
+            npages = 0  # number of pages processed
+            pages = fetch_pages(namespaces_contents)
+            for page_reviews in concurrent_map(self.__get_page_reviews, pages,
+                                               max_workers=self.max_workers):
+                yield page_reviews
+                npages += 1
             logger.info("Total number of pages: %i", npages)
 
         logger.info("Looking for pages at url '%s'", self.url)
@@ -434,8 +484,8 @@ class MediaWikiClient(HttpClient):
 
         return self.call(params)
 
-    def get_revisions(self, title, last_date=None):
-        # TODO: Iterate if more than self.max reviews (500)
+    def get_revisions(self, title, last_date=None, rvcontinue=None):
+        """Retrieve the revisions of a page starting from rvcontinue."""
 
         if last_date:
             last_date_str = last_date.isoformat()
@@ -450,6 +500,8 @@ class MediaWikiClient(HttpClient):
         }
         if last_date:
             params['rvstart'] = last_date_str
+        if rvcontinue:
+            params['rvcontinue'] = rvcontinue
 
         return self.call(params)
 
@@ -497,6 +549,9 @@ class MediaWikiCommand(BackendCommand):
         group = parser.parser.add_argument_group('MediaWiki arguments')
         group.add_argument('--reviews-api', action='store_true',
                            help="Use the experimental Reviews API in MediaWiki >= 1.27")
+        group.add_argument('--max-workers', dest='max_workers',
+                           type=int, default=DEFAULT_MAX_WORKERS,
+                           help="Maximum number of pages which revisions are fetched concurrently")
 
         # Required arguments
         parser.parser.add_argument('url',
@@ -20,22 +20,29 @@
 #     Santiago Dueñas <sduenas@bitergia.com>
 #
 
+import contextlib
 import io
 import logging
 import nntplib
+import queue
+import threading
 
 import email.parser
 
-from grimoirelab.toolkit.datetime import str_to_datetime
+from grimoirelab.toolkit.datetime import (InvalidDateError,
+                                          datetime_to_utc,
+                                          str_to_datetime)
 
 from ...backend import (Backend,
                         BackendCommand,
                         BackendCommandArgumentParser)
 from ...errors import ArchiveError, ParseError
-from ...utils import message_to_dict
+from ...utils import concurrent_map, message_to_dict
 
 CATEGORY_ARTICLE = "article"
 DEFAULT_OFFSET = 1
+DEFAULT_MAX_WORKERS = 1  # Number of NNTP connections fetching articles in parallel
+DEFAULT_OVERVIEW_WINDOW = 1000  # Number of articles requested on each overview command
 
 # Hack to avoid "line too long" errors
 nntplib._MAXLINE = 4096
@@ -50,21 +57,40 @@ class NNTP(Backend):
     using NNTP. It is initialized giving the host and the name of the
     news group.
 
+    Articles are fetched in parallel when `max_workers` is greater
+    than one, using a pool with that number of connections. When
+    `skip_before` is set, articles sent before that date, according
+    to the overview data of the group, are not downloaded. The
+    overview is requested in windows of `overview_window` articles
+    that are processed one after the other. The size of the window
+    is stored with the archived data, so archives are always read
+    using the windows they were recorded with.
+
     :param host: host
     :param group: name of the group
     :param tag: label used to mark the data
     :param archive: archive to store/retrieve items
+    :param max_workers: maximum number of connections fetching
+        articles in parallel
+    :param skip_before: skip articles sent before this date
+    :param overview_window: number of articles requested on each
+        overview command
     """
-    version = '0.5.2'
+    version = '0.7.0'
 
     CATEGORIES = [CATEGORY_ARTICLE]
 
-    def __init__(self, host, group, tag=None, archive=None):
+    def __init__(self, host, group, tag=None, archive=None,
+                 max_workers=DEFAULT_MAX_WORKERS, skip_before=None,
+                 overview_window=DEFAULT_OVERVIEW_WINDOW):
         origin = host + '-' + group
 
         super().__init__(origin, tag=tag, archive=archive)
         self.host = host
         self.group = group
+        self.max_workers = max(1, max_workers)
+        self.skip_before = datetime_to_utc(skip_before) if skip_before else None
+        self.overview_window = max(1, overview_window)
         self.client = None
 
     def fetch(self, category=CATEGORY_ARTICLE, offset=DEFAULT_OFFSET):
@@ -81,7 +107,10 @@ class NNTP(Backend):
         if not offset:
             offset = DEFAULT_OFFSET
 
-        kwargs = {'offset': offset}
+        kwargs = {
+            'offset': offset,
+            'overview_window': self.overview_window
+        }
         items = super().fetch(category, **kwargs)
 
         return items
@@ -99,37 +128,41 @@ class NNTP(Backend):
         logger.info("Fetching articles of '%s' group on '%s' offset %s",
                     self.group, self.host, str(offset))
 
-        narts, iarts, tarts = (0, 0, 0)
+        narts, iarts, sarts, tarts = (0, 0, 0, 0)
 
         _, _, first, last, _ = self.client.group(self.group)
+        first = max(first, offset)
 
-        if offset <= last:
-            first = max(first, offset)
-            _, overview = self.client.over((first, last))
-        else:
-            overview = []
+        # Archives recorded before the overview was requested
+        # in windows do not include its size; the overview of
+        # these archives was requested with a single command
+        window = kwargs.get('overview_window', None) or max(1, last - first + 1)
 
-        tarts = len(overview)
+        logger.debug("Articles to fetch from %s to %s", first, last)
 
-        logger.debug("Total number of articles to fetch: %s", tarts)
+        for start in range(first, last + 1, window):
+            end = min(start + window - 1, last)
+            _, overview = self.client.over((start, end))
 
-        for article_id, _ in overview:
-            try:
-                article_raw = self.client.article(article_id)
-                article = self.__parse_article(article_raw)
-            except ParseError:
-                logger.warning("Error parsing %s article; skipping",
-                               article_id)
-                iarts += 1
-                continue
-            except nntplib.NNTPTemporaryError as e:
-                logger.warning("Error '%s' fetching article %s; skipping",
-                               e.response, article_id)
-                iarts += 1
-                continue
-
-            yield article
-            narts += 1
+            tarts += len(overview)
+
+            article_ids = [article_id for article_id, over in overview
+                           if not self.__skip_article(article_id, over)]
+            sarts += len(overview) - len(article_ids)
+
+            articles = concurrent_map(self.__fetch_article, article_ids,
+                                      max_workers=self.max_workers)
+
+            for article in articles:
+                if not article:
+                    iarts += 1
+                    continue
+
+                yield article
+                narts += 1
+
+        logger.info("Done. %s/%s articles fetched; %s ignored; %s skipped",
+                    narts, tarts, iarts, sarts)
 
     def metadata(self, item):
         """NNTP metadata.
@@ -218,7 +251,41 @@ class NNTP(Backend):
     def _init_client(self, from_archive=False):
         """Init client"""
 
-        return NNTTPClient(self.host, self.archive, from_archive)
+        return NNTTPClient(self.host, self.archive, from_archive,
+                           max_connections=self.max_workers)
+
+    def __skip_article(self, article_id, over):
+        """Check whether an article was sent before `skip_before`"""
+
+        if not self.skip_before or not over.get('date'):
+            return False
+
+        try:
+            dt = str_to_datetime(over['date'])
+        except InvalidDateError:
+            return False
+
+        if dt < self.skip_before:
+            logger.debug("Article %s sent before %s; skipped",
+                         article_id, str(self.skip_before))
+            return True
+
+        return False
+
+    def __fetch_article(self, article_id):
+        try:
+            article_raw = self.client.article(article_id)
+            article = self.__parse_article(article_raw)
+        except ParseError:
+            logger.warning("Error parsing %s article; skipping",
+                           article_id)
+            return None
+        except nntplib.NNTPTemporaryError as e:
+            logger.warning("Error '%s' fetching article %s; skipping",
+                           e.response, article_id)
+            return None
+
+        return article
 
     def __parse_article(self, info):
         reader = io.BytesIO(b'\n'.join(info['lines']))
@@ -244,23 +311,39 @@ class NNTP(Backend):
 class NNTTPClient():
     """NNTP client
 
+    The client keeps a pool of connections to the server, so
+    commands can be run by several threads at the same time.
+    Connections are opened when they are needed, up to
+    `max_connections`, and all of them select the last group
+    requested.
+
     :param host: host
     :param group: name of the group
     :param archive: an archive to store/read fetched data
     :param from_archive: it tells whether to write/read the archive
+    :param max_connections: maximum number of connections
     """
 
     GROUP = "group"
     ARTICLE = "article"
     OVER = "over"
 
-    def __init__(self, host, archive=None, from_archive=False):
+    def __init__(self, host, archive=None, from_archive=False, max_connections=1):
         self.host = host
         self.archive = archive
         self.from_archive = from_archive
+        self.max_connections = max(1, max_connections)
+
+        self._handlers = []
+        self._pool = queue.Queue()
+        self._groups = {}
+        self._group_name = None
+        self._lock = threading.Lock()
 
         if not self.from_archive:
             self.handler = nntplib.NNTP(self.host)
+            self._handlers.append(self.handler)
+            self._pool.put(self.handler)
 
     def __del__(self):
         if not self.from_archive:
@@ -305,7 +388,9 @@ class NNTTPClient():
 
         :param article_id: id of the article to fetch
         """
-        fetched_data = self.handler.article(article_id)
+        with self._connection() as handler:
+            fetched_data = handler.article(article_id)
+
         data = {
             'number': fetched_data[1].number,
             'message_id': fetched_data[1].message_id,
@@ -322,9 +407,10 @@ class NNTTPClient():
         """
         try:
             if method == NNTTPClient.GROUP:
-                data = self.handler.group(args)
+                data = self._select_group(args)
             elif method == NNTTPClient.OVER:
-                data = self.handler.over(args)
+                with self._connection() as handler:
+                    data = handler.over(args)
             elif method == NNTTPClient.ARTICLE:
                 data = self._fetch_article(args)
         except nntplib.NNTPTemporaryError as e:
@@ -352,8 +438,69 @@ class NNTTPClient():
 
         return data
 
+    def _select_group(self, group_name):
+        """Select the group used by the connections"""
+
+        with self._connection() as handler:
+            data = handler.group(group_name)
+            self._group_name = group_name
+            self._groups[id(handler)] = group_name
+
+        return data
+
+    @contextlib.contextmanager
+    def _connection(self):
+        """Get a connection from the pool, opening it when needed.
+
+        Connections whose command raised an error are closed and
+        removed from the pool, so they are not used again. A new
+        one is opened in their place when it is needed.
+        """
+        handler = None
+
+        while not handler:
+            try:
+                handler = self._pool.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    if len(self._handlers) < self.max_connections:
+                        handler = nntplib.NNTP(self.host)
+                        self._handlers.append(handler)
+
+                if not handler:
+                    handler = self._pool.get()
+
+        try:
+            if self._group_name and self._groups.get(id(handler)) != self._group_name:
+                handler.group(self._group_name)
+                self._groups[id(handler)] = self._group_name
+
+            yield handler
+        except Exception:
+            self.__close_connection(handler)
+            raise
+        else:
+            self._pool.put(handler)
+
+    def __close_connection(self, handler):
+        """Close a connection and remove it from the pool"""
+
+        with self._lock:
+            self._handlers.remove(handler)
+            self._groups.pop(id(handler), None)
+
+        try:
+            handler.quit()
+        except (nntplib.NNTPError, OSError, EOFError):
+            pass
+
+        # Wake up a thread waiting for a connection, if any;
+        # it will open a new one in place of the closed one
+        self._pool.put(None)
+
     def quit(self):
-        self.handler.quit()
+        for handler in self._handlers:
+            handler.quit()
 
 
 class NNTPCommand(BackendCommand):
@@ -361,6 +508,13 @@ class NNTPCommand(BackendCommand):
 
     BACKEND = NNTP
 
+    def _pre_init(self):
+        """Initialize the date before which articles are skipped"""
+
+        if self.parsed_args.skip_before:
+            skip_before = str_to_datetime(self.parsed_args.skip_before)
+            setattr(self.parsed_args, 'skip_before', skip_before)
+
     @staticmethod
     def setup_cmd_parser():
         """Returns the NNTP argument parser."""
@@ -368,6 +522,18 @@ class NNTPCommand(BackendCommand):
         parser = BackendCommandArgumentParser(offset=True,
                                               archive=True)
 
+        # Optional arguments
+        group = parser.parser.add_argument_group('NNTP arguments')
+        group.add_argument('--max-workers', dest='max_workers',
+                           type=int, default=DEFAULT_MAX_WORKERS,
+                           help="Maximum number of connections fetching articles in parallel")
+        group.add_argument('--skip-before', dest='skip_before',
+                           default=None,
+                           help="Skip articles sent before this date")
+        group.add_argument('--overview-window', dest='overview_window',
+                           type=int, default=DEFAULT_OVERVIEW_WINDOW,
+                           help="Number of articles requested on each overview command")
+
         # Required arguments
         parser.parser.add_argument('host',
                                    help="NNTP server host")
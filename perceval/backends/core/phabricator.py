@@ -20,6 +20,7 @@
 #     Santiago Dueñas <sduenas@bitergia.com>
 #
 
+import functools
 import json
 import logging
 
@@ -30,10 +31,13 @@ from ...backend import (Backend,
                         BackendCommandArgumentParser)
 from ...client import HttpClient
 from ...errors import BaseError
-from ...utils import DEFAULT_DATETIME
+from ...state import StateStore
+from ...utils import DEFAULT_DATETIME, concurrent_map
 
 CATEGORY_TASK = "task"
 
+DEFAULT_MAX_WORKERS = 1  # Number of Conduit calls run concurrently
+
 logger = logging.getLogger(__name__)
 
 
@@ -49,21 +53,31 @@ class Phabricator(Backend):
     :param api_token: token needed to use the API
     :param tag: label used to mark the data
     :param archive: archive to store/retrieve items
+    :param max_workers: maximum number of Conduit calls run
+        concurrently
+    :param state_path: path to the state store used to keep the
+        users and projects between runs; when it is set, PHIDs
+        already stored are not requested again. It is not used
+        when items are archived
     """
-    version = '0.10.0'
+    version = '0.11.0'
 
     CATEGORIES = [CATEGORY_TASK]
 
-    def __init__(self, url, api_token, tag=None, archive=None):
+    def __init__(self, url, api_token, tag=None, archive=None,
+                 max_workers=DEFAULT_MAX_WORKERS, state_path=None):
         origin = url
 
         super().__init__(origin, tag=tag, archive=archive)
         self.url = url
         self.api_token = api_token
+        self.max_workers = max(1, max_workers)
+        self.state_path = state_path
         self.client = None
 
         self._users = {}
         self._projects = {}
+        self._state = None
 
     def fetch(self, category=CATEGORY_TASK, from_date=DEFAULT_DATETIME):
         """Fetch the tasks from the server.
@@ -97,6 +111,14 @@ class Phabricator(Backend):
 
         logger.info("Fetching tasks of '%s' from %s", self.url, str(from_date))
 
+        # Archives must keep every request needed to replay
+        # the fetch, so the state store is ignored when data
+        # is archived or fetched from an archive
+        if self.state_path and not self.archive:
+            self._state = self._state or StateStore(self.state_path)
+        else:
+            self._state = None
+
         ntasks = 0
 
         for task in self.__fetch_tasks(from_date):
@@ -227,7 +249,15 @@ class Phabricator(Backend):
                 break
 
             tasks_ids = [t['id'] for t in tasks]
-            tasks_trans = self.__fetch_and_parse_tasks_transactions(*tasks_ids)
+
+            # Transactions and the PHIDs referenced by the
+            # tasks are requested at the same time
+            calls = [functools.partial(self.__fetch_and_parse_tasks_transactions, *tasks_ids),
+                     functools.partial(self.__prefetch_tasks_phids, tasks)]
+            tasks_trans, _ = concurrent_map(lambda call: call(), calls,
+                                            max_workers=self.max_workers)
+
+            self.__resolve_tasks_transactions(tasks_trans)
 
             for task in tasks:
                 # Task check point
@@ -251,41 +281,139 @@ class Phabricator(Backend):
                 yield task
 
     def __get_or_fetch_user(self, user_id):
-        if user_id in self._users:
-            return self._users[user_id]
+        if user_id not in self._users:
+            logger.debug("User %s not found on client cache; fetching it", user_id)
+            self.__prefetch_phids([user_id], [])
 
-        logger.debug("User %s not found on client cache; fetching it", user_id)
+        return self._users[user_id]
 
-        if user_id.startswith('PHID-USER-'):
-            users = self.__fetch_and_parse_users(user_id)
-        else:
-            logger.debug("User %s is not a real user. Using PHID API to fetch it",
-                         user_id)
-            users = self.__fetch_and_parse_phids(user_id)
-
-        if len(users) == 0:
-            logger.warning("User %s not found on the server. Setting empty data",
-                           user_id)
-            user = None
-        else:
-            user = users[0]
+    def __get_or_fetch_project(self, project_id):
+        if project_id not in self._projects:
+            logger.debug("Project %s not found on client cache; fetching it", project_id)
+            self.__prefetch_phids([], [project_id])
 
-        self._users[user_id] = user
-        return user
+        return self._projects[project_id]
 
-    def __get_or_fetch_project(self, project_id):
-        if project_id in self._projects:
-            return self._projects[project_id]
+    def __prefetch_tasks_phids(self, tasks):
+        """Fetch the authors, owners and projects of a set of tasks"""
+
+        users_ids = []
+        projects_ids = []
+
+        for task in tasks:
+            users_ids.append(task['fields']['authorPHID'])
+
+            if task['fields']['ownerPHID']:
+                users_ids.append(task['fields']['ownerPHID'])
+
+            projects_ids.extend(task['attachments']['projects']['projectPHIDs'])
+
+        self.__prefetch_phids(users_ids, projects_ids)
+
+    def __prefetch_transactions_phids(self, tasks_trans):
+        """Fetch the users and projects referenced by a set of transactions"""
+
+        users_ids = []
+        projects_ids = []
+
+        for trans in tasks_trans.values():
+            for tt in trans:
+                users_ids.append(tt['authorPHID'])
+
+                ttype = tt['transactionType']
+                values = [value for value in (tt['newValue'], tt['oldValue']) if value]
+
+                if ttype == 'reassign':
+                    users_ids.extend(values)
+                elif ttype == 'core:columns':
+                    projects_ids.extend(e['boardPHID'] for value in values for e in value)
+                elif ttype == 'core:subscribers':
+                    for e in [e for value in values for e in value if e]:
+                        if e.startswith('PHID-PROJ'):
+                            projects_ids.append(e)
+                        elif e.startswith('PHID-USER'):
+                            users_ids.append(e)
+                elif ttype in ['core:edit-policy', 'core:view-policy']:
+                    projects_ids.extend(value for value in values if value.startswith('PHID-PROJ'))
+                elif ttype == 'core:edge':
+                    for value in values:
+                        if isinstance(value, dict):
+                            value = [content.get('dst') for content in value.values()]
+                        elif not isinstance(value, list):
+                            continue
+                        projects_ids.extend(e for e in value if e and e.startswith('PHID-PROJ'))
+
+        self.__prefetch_phids(users_ids, projects_ids)
+
+    def __prefetch_phids(self, users_ids, projects_ids):
+        """Fetch a set of users and projects not found on the cache.
+
+        PHIDs are searched first on the state store, when it is set.
+        The rest of them are requested to the server using, at most,
+        two calls that run concurrently: one for real users and
+        another one for any other kind of PHID. The results are
+        stored on both caches. PHIDs not returned by the server are
+        only kept in memory, so they are requested again on the
+        next runs.
+        """
+        users_ids = self.__filter_cached_phids(self._users, 'user', users_ids)
+        projects_ids = self.__filter_cached_phids(self._projects, 'project', projects_ids)
+
+        real_users_ids = [phid for phid in users_ids if phid.startswith('PHID-USER-')]
+        other_ids = [phid for phid in users_ids if phid not in real_users_ids]
+
+        if other_ids:
+            logger.debug("Users %s are not real users. Using PHID API to fetch them",
+                         ', '.join(other_ids))
+
+        other_ids += [phid for phid in projects_ids if phid not in other_ids]
+
+        calls = []
+        if real_users_ids:
+            calls.append(functools.partial(self.__fetch_and_parse_users, *real_users_ids))
+        if other_ids:
+            calls.append(functools.partial(self.__fetch_and_parse_phids, *other_ids))
+
+        if not calls:
+            return
+
+        found = {}
+        for results in concurrent_map(lambda call: call(), calls,
+                                      max_workers=self.max_workers):
+            found.update({obj['phid']: obj for obj in results})
+
+        users = {}
+        for user_id in users_ids:
+            if user_id not in found:
+                logger.warning("User %s not found on the server. Setting empty data",
+                               user_id)
+            users[user_id] = found.get(user_id, None)
+
+        projects = {project_id: found.get(project_id, None) for project_id in projects_ids}
+
+        self._users.update(users)
+        self._projects.update(projects)
 
-        logger.debug("Project %s not found on client cache; fetching it", project_id)
+        if self._state:
+            users = {phid: user for phid, user in users.items() if user is not None}
+            projects = {phid: project for phid, project in projects.items() if project is not None}
 
-        phids = self.__fetch_and_parse_phids(project_id)
-        project = None
-        if phids:
-            project = phids[0]
+            if users:
+                self._state.set_many('user:' + self.origin, users)
+            if projects:
+                self._state.set_many('project:' + self.origin, projects)
 
-        self._projects[project_id] = project
-        return project
+    def __filter_cached_phids(self, cache, kind, phids):
+        """Return the distinct PHIDs not found on the cache nor on the state"""
+
+        phids = [phid for phid in dict.fromkeys(phids) if phid not in cache]
+
+        if self._state and phids:
+            stored = self._state.get_many(kind + ':' + self.origin, phids)
+            cache.update(stored)
+            phids = [phid for phid in phids if phid not in stored]
+
+        return phids
 
     def __fetch_and_parse_tasks_transactions(self, *tasks_ids):
         logger.debug("Fetching and parsing tasks transactions")
@@ -293,6 +421,11 @@ class Phabricator(Backend):
         raw_json = self.client.transactions(*tasks_ids)
         tasks_trans = self.parse_tasks_transactions(raw_json)
 
+        return tasks_trans
+
+    def __resolve_tasks_transactions(self, tasks_trans):
+        self.__prefetch_transactions_phids(tasks_trans)
+
         for trans in tasks_trans.values():
             for tt in trans:
                 author_id = tt['authorPHID']
@@ -319,8 +452,6 @@ class Phabricator(Backend):
                     tt['oldValue_data'] = self.__resolve_project_ids(tt['oldValue'])
                     tt['newValue_data'] = self.__resolve_project_ids(tt['newValue'])
 
-        return tasks_trans
-
     def __resolve_reassign_id(self, value):
         if not value:
             return value
@@ -431,6 +562,15 @@ class PhabricatorCommand(BackendCommand):
                                               token_auth=True,
                                               archive=True)
 
+        # Phabricator options
+        group = parser.parser.add_argument_group('Phabricator arguments')
+        group.add_argument('--max-workers', dest='max_workers',
+                           type=int, default=DEFAULT_MAX_WORKERS,
+                           help="Maximum number of Conduit calls run concurrently")
+        group.add_argument('--state-path', dest='state_path',
+                           help="Path to the state store used to keep users and projects between runs; "
+                                "ignored when items are archived")
+
         # Required arguments
         parser.parser.add_argument('url',
                                    help="URL of the Phabricator server")
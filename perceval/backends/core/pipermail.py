@@ -24,8 +24,11 @@
 #
 
 import datetime
+import email.utils
 import logging
 import os
+import re
+import shutil
 
 import bs4
 import dateutil
@@ -34,10 +37,15 @@ import requests
 from grimoirelab.toolkit.datetime import datetime_to_utc
 from grimoirelab.toolkit.uris import urijoin
 
-from .mbox import MBox, MailingList, CATEGORY_MESSAGE
+from .mbox import (MBox,
+                   MailingList,
+                   CATEGORY_MESSAGE,
+                   DEFAULT_MAX_WORKERS)
 from ...backend import (BackendCommand,
                         BackendCommandArgumentParser)
-from ...utils import DEFAULT_DATETIME
+from ...client import HttpClient
+from ...utils import (DEFAULT_DATETIME,
+                      concurrent_map)
 
 PIPERMAIL_COMPRESSED_TYPES = ['.gz', '.bz2', '.zip',
                               '.tar', '.tar.gz', '.tar.bz2',
@@ -47,6 +55,8 @@ PIPERMAIL_TYPES = PIPERMAIL_COMPRESSED_TYPES + PIPERMAIL_ACCEPTED_TYPES
 
 MOD_MBOX_THREAD_STR = "/thread"
 
+DEFAULT_DOWNLOAD_WORKERS = 1  # Number of archives downloaded concurrently
+
 logger = logging.getLogger(__name__)
 
 
@@ -63,15 +73,24 @@ class Pipermail(MBox):
     :param verify: allows to disable SSL verification
     :param tag: label used to mark the data
     :param archive: archive to store/retrieve items
+    :param state_path: path to the state store used to keep an index
+        of each mbox between runs
+    :param max_workers: maximum number of processes parsing mboxes
+        in parallel
+    :param download_workers: maximum number of archives downloaded
+        concurrently
     """
-    version = '0.9.0'
+    version = '0.12.0'
 
     CATEGORIES = [CATEGORY_MESSAGE]
 
-    def __init__(self, url, dirpath, verify=True, tag=None, archive=None):
-        super().__init__(url, dirpath, tag=tag, archive=archive)
+    def __init__(self, url, dirpath, verify=True, tag=None, archive=None, state_path=None,
+                 max_workers=DEFAULT_MAX_WORKERS, download_workers=DEFAULT_DOWNLOAD_WORKERS):
+        super().__init__(url, dirpath, tag=tag, archive=archive, state_path=state_path,
+                         max_workers=max_workers)
         self.url = url
         self.verify = verify
+        self.download_workers = max(1, download_workers)
 
     def fetch(self, category=CATEGORY_MESSAGE, from_date=DEFAULT_DATETIME):
         """Fetch the messages from the Pipermail archiver.
@@ -101,7 +120,8 @@ class Pipermail(MBox):
         logger.info("Looking for messages from '%s' since %s",
                     self.url, str(from_date))
 
-        mailing_list = PipermailList(self.url, self.dirpath, self.verify)
+        mailing_list = PipermailList(self.url, self.dirpath, self.verify,
+                                     download_workers=self.download_workers)
         mailing_list.fetch(from_date=from_date)
 
         messages = self._fetch_and_parse_messages(mailing_list, from_date)
@@ -157,6 +177,14 @@ class PipermailCommand(BackendCommand):
         group.add_argument('--no-verify', dest='verify',
                            action='store_false',
                            help="Value 'True' enable SSL verification")
+        group.add_argument('--state-path', dest='state_path',
+                           help="Path to the state store used to keep an index of the mboxes between runs")
+        group.add_argument('--max-workers', dest='max_workers',
+                           type=int, default=DEFAULT_MAX_WORKERS,
+                           help="Maximum number of processes parsing mboxes in parallel")
+        group.add_argument('--download-workers', dest='download_workers',
+                           type=int, default=DEFAULT_DOWNLOAD_WORKERS,
+                           help="Maximum number of archives downloaded concurrently")
 
         # Required arguments
         parser.parser.add_argument('url',
@@ -172,14 +200,28 @@ class PipermailList(MailingList):
     from a mailing list stored by Pipermail. This class also allows
     to keep them in sync.
 
+    Archives already stored are only downloaded again when they were
+    modified on the server. Plain archives are updated requesting
+    only the bytes appended since the last download. The last bytes
+    of the stored archive are requested too, so when they do not
+    match the remote ones, because the archive was regenerated, the
+    whole archive is downloaded again.
+
     :param url: URL to the Pipermail archiver for this list
     :param dirpath: path to the local mboxes archives
     :param verify: allows to disable SSL verification
+    :param download_workers: maximum number of archives downloaded
+        concurrently
     """
-    def __init__(self, url, dirpath, verify=True):
+    CHUNK_SIZE = 1024 * 1024
+    RANGE_OVERLAP = 1024
+
+    def __init__(self, url, dirpath, verify=True, download_workers=DEFAULT_DOWNLOAD_WORKERS):
         super().__init__(url, dirpath)
         self.url = url
         self.verify = verify
+        self.download_workers = max(1, download_workers)
+        self.client = HttpClient(url)
 
     def fetch(self, from_date=DEFAULT_DATETIME):
         """Fetch the mbox files from the remote archiver.
@@ -206,16 +248,15 @@ class PipermailList(MailingList):
 
         from_date = datetime_to_utc(from_date)
 
-        r = requests.get(self.url, verify=self.verify)
-        r.raise_for_status()
+        r = self.client.fetch(self.url, verify=self.verify)
 
         links = self._parse_archive_links(r.text)
 
-        fetched = []
-
         if not os.path.exists(self.dirpath):
             os.makedirs(self.dirpath)
 
+        selected = []
+
         for l in links:
             filename = os.path.basename(l)
 
@@ -226,10 +267,12 @@ class PipermailList(MailingList):
                 from_date < mbox_dt):
 
                 filepath = os.path.join(self.dirpath, filename)
-                success = self._download_archive(l, filepath)
+                selected.append((l, filepath))
+
+        results = concurrent_map(lambda archive: self._download_archive(*archive),
+                                 selected, max_workers=self.download_workers)
 
-                if success:
-                    fetched.append((l, filepath))
+        fetched = [archive for archive, success in zip(selected, results) if success]
 
         logger.info("%s/%s MBoxes downloaded", len(fetched), len(links))
 
@@ -298,9 +341,14 @@ class PipermailList(MailingList):
 
     def _download_archive(self, url, filepath):
         try:
-            r = requests.get(url, stream=True, verify=self.verify)
-            r.raise_for_status()
-            self._write_archive(r, filepath)
+            r = self._request_archive(url, filepath)
+
+            if r.status_code == 304:
+                logger.debug("%s archive not modified since last download", url)
+                return True
+
+            append = r.status_code == 206
+            self._write_archive(r, filepath, append=append)
         except requests.exceptions.HTTPError as e:
             if e.response.status_code == 403:
                 logger.warning("Ignoring %s archive due to: %s", url, str(e))
@@ -311,11 +359,124 @@ class PipermailList(MailingList):
             logger.warning("Ignoring %s archive due to: %s", url, str(e))
             return False
 
+        last_modified = r.headers.get('Last-Modified', None)
+
+        if last_modified:
+            self.__set_modification_time(filepath, last_modified)
+
         logger.debug("%s archive downloaded and stored in %s", url, filepath)
 
         return True
 
+    def _request_archive(self, url, filepath):
+        """Request an archive, only when it was modified.
+
+        When the archive was already stored, the request includes
+        its modification time in 'If-Modified-Since' header. For
+        plain archives, only the bytes appended after the stored
+        ones are requested, starting `RANGE_OVERLAP` bytes before
+        its end. If the server cannot send that range or the
+        overlapped bytes are not the stored ones, the whole archive
+        is requested again.
+
+        Notice that 'If-Range' header cannot be used here because
+        the archive changes each time messages are appended to it.
+        """
+        headers = {}
+        overlap = 0
+
+        if os.path.exists(filepath):
+            stat = os.stat(filepath)
+            headers['If-Modified-Since'] = email.utils.formatdate(stat.st_mtime, usegmt=True)
+
+            if stat.st_size > 0 and self.__is_plain_archive(filepath):
+                overlap = min(stat.st_size, self.RANGE_OVERLAP)
+                headers['Range'] = 'bytes=%s-' % (stat.st_size - overlap)
+
+        try:
+            r = self.client.fetch(url, headers=headers, stream=True, verify=self.verify)
+        except requests.exceptions.HTTPError as e:
+            if e.response.status_code != 416 or 'Range' not in headers:
+                raise e
+            r = None
+
+        if r is not None and r.status_code == 206 and \
+                not self.__is_continuation(r, filepath, overlap):
+            logger.debug("%s archive was rewritten; downloading it again", url)
+            r.close()
+            r = None
+
+        if r is None:
+            headers.pop('Range')
+            r = self.client.fetch(url, headers=headers, stream=True, verify=self.verify)
+
+        return r
+
+    @classmethod
+    def _write_archive(cls, r, filepath, append=False):
+        """Write the content of a response in chunks.
+
+        Data is written to a temporary file first, so archives
+        are not left half written when the download fails. When
+        `append` is set, data is appended to the stored archive.
+        """
+        dirpath, filename = os.path.split(filepath)
+        part_path = os.path.join(dirpath, '.' + filename + '.part')
+
+        try:
+            with open(part_path, 'wb') as fd:
+                for chunk in r.raw.stream(cls.CHUNK_SIZE, decode_content=False):
+                    fd.write(chunk)
+
+            if append:
+                with open(part_path, 'rb') as part, open(filepath, 'ab') as fd:
+                    shutil.copyfileobj(part, fd)
+                os.remove(part_path)
+            else:
+                os.replace(part_path, filepath)
+        except Exception as e:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise e
+
+    @staticmethod
+    def __is_plain_archive(filepath):
+        ext = os.path.splitext(filepath)[-1]
+        return ext in PIPERMAIL_ACCEPTED_TYPES
+
+    @classmethod
+    def __is_continuation(cls, r, filepath, overlap):
+        """Check whether a partial response continues a stored archive.
+
+        The response has to start `overlap` bytes before the end of
+        the archive and these bytes must be equal to the stored ones.
+        They are consumed from the response, so only the new bytes
+        are left on it.
+        """
+        size = os.path.getsize(filepath)
+
+        if cls.__content_range_start(r) != size - overlap:
+            return False
+
+        with open(filepath, 'rb') as fd:
+            fd.seek(size - overlap)
+            stored = fd.read(overlap)
+
+        return r.raw.read(overlap, decode_content=False) == stored
+
+    @staticmethod
+    def __content_range_start(r):
+        content_range = r.headers.get('Content-Range', '')
+        match = re.match(r'bytes (\d+)-', content_range)
+        return int(match.group(1)) if match else None
+
     @staticmethod
-    def _write_archive(r, filepath):
-        with open(filepath, 'wb') as fd:
-            fd.write(r.raw.read())
+    def __set_modification_time(filepath, last_modified):
+        try:
+            ts = email.utils.parsedate_to_datetime(last_modified).timestamp()
+        except (TypeError, ValueError):
+            logger.debug("Invalid Last-Modified header %s for %s; ignored",
+                         last_modified, filepath)
+            return
+
+        os.utime(filepath, (ts, ts))
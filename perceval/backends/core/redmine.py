@@ -20,6 +20,7 @@
 #     Santiago Dueñas <sduenas@bitergia.com>
 #
 
+import collections
 import json
 import logging
 
@@ -32,11 +33,13 @@ from ...backend import (Backend,
                         BackendCommand,
                         BackendCommandArgumentParser)
 from ...client import HttpClient
-from ...utils import DEFAULT_DATETIME
+from ...state import StateStore
+from ...utils import DEFAULT_DATETIME, concurrent_map
 
 CATEGORY_ISSUE = "issue"
 
 MAX_ISSUES = 100  # Maximum number of issues per query
+DEFAULT_MAX_WORKERS = 1  # Number of issues and users fetched concurrently
 USER_FIELDS = ['assigned_to', 'author']
 
 logger = logging.getLogger(__name__)
@@ -56,22 +59,31 @@ class Redmine(Backend):
     :param max_issues:  maximum number of issues requested on the same query
     :param tag: label used to mark the data
     :param archive: archive to store/retrieve items
+    :param max_workers: maximum number of issues and users fetched
+        concurrently
+    :param state_path: path to the state store used to keep the users
+        between runs; when it is set, users already stored are not
+        requested again. It is not used when items are archived
     """
-    version = '0.9.4'
+    version = '0.10.0'
 
     CATEGORIES = [CATEGORY_ISSUE]
 
     def __init__(self, url, api_token=None, max_issues=MAX_ISSUES,
-                 tag=None, archive=None):
+                 tag=None, archive=None, max_workers=DEFAULT_MAX_WORKERS,
+                 state_path=None):
         origin = url
 
         super().__init__(origin, tag=tag, archive=archive)
         self.url = url
         self.api_token = api_token
         self.max_issues = max_issues
+        self.max_workers = max(1, max_workers)
+        self.state_path = state_path
         self.client = None
 
         self._users = {}
+        self._state = None
 
     def fetch(self, category=CATEGORY_ISSUE, from_date=DEFAULT_DATETIME):
         """Fetch the issues from the server.
@@ -107,27 +119,38 @@ class Redmine(Backend):
         logger.info("Fetching issues of '%s' from %s",
                     self.url, str(from_date))
 
+        # Archives must keep every request needed to replay
+        # the fetch, so the state store is ignored when data
+        # is archived or fetched from an archive
+        if self.state_path and not self.archive:
+            self._state = self._state or StateStore(self.state_path)
+        else:
+            self._state = None
+
         nissues = 0
 
-        for issue_id in self.__fetch_issues_ids(from_date):
-            issue = self.__fetch_and_parse_issue(issue_id)
+        for issues_ids in self.__fetch_issues_ids(from_date):
+            issues = concurrent_map(self.__fetch_and_parse_issue, issues_ids,
+                                    max_workers=self.max_workers)
+            issues = [issue for issue in issues]
 
-            for key in USER_FIELDS:
-                if key not in issue:
-                    continue
+            self.__prefetch_users(issues)
 
-                user = self.__get_or_fetch_user(issue[key]['id'])
-                issue[key + '_data'] = user
+            for issue in issues:
+                for key in USER_FIELDS:
+                    if key not in issue:
+                        continue
 
-            for journal in issue['journals']:
-                if 'user' not in journal:
-                    continue
+                    issue[key + '_data'] = self._users[issue[key]['id']]
 
-                user = self.__get_or_fetch_user(journal['user']['id'])
-                journal['user_data'] = user
+                for journal in issue['journals']:
+                    if 'user' not in journal:
+                        continue
 
-            yield issue
-            nissues += 1
+                    journal['user_data'] = self._users[journal['user']['id']]
+
+                yield issue
+                nissues += 1
 
         logger.info("Fetch process completed: %s issues fetched", nissues)
 
@@ -229,26 +252,64 @@ class Redmine(Backend):
         return RedmineClient(self.url, self.api_token, self.archive, from_archive)
 
     def __fetch_issues_ids(self, from_date):
+        """Fetch the identifiers of the issues, page by page"""
+
         offset = 0
         issues = self.__fetch_and_parse_issues_page(from_date, offset,
                                                     self.max_issues)
 
         while issues:
-            issue = issues.pop(0)
-            issue_id = issue['id']
-            yield issue_id
+            yield [issue['id'] for issue in issues]
+
+            offset += self.max_issues
+            issues = self.__fetch_and_parse_issues_page(from_date, offset,
+                                                        self.max_issues)
 
-            if not issues:
-                offset += self.max_issues
-                issues = self.__fetch_and_parse_issues_page(from_date, offset,
-                                                            self.max_issues)
+    def __prefetch_users(self, issues):
+        """Fetch the users of a set of issues not found on the cache.
+
+        Users are searched first on the state store, when it is set.
+        The rest of them are requested to the server and stored on
+        both caches. Users not found on the server are only kept in
+        memory, so they are requested again on the next runs.
+        """
+        namespace = 'user:' + self.origin
+        users_ids = collections.OrderedDict()
+
+        for issue in issues:
+            ids = [issue[key]['id'] for key in USER_FIELDS if key in issue]
+            ids += [journal['user']['id'] for journal in issue['journals'] if 'user' in journal]
 
-    def __get_or_fetch_user(self, user_id):
-        if user_id in self._users:
-            return self._users[user_id]
+            for user_id in ids:
+                if user_id not in self._users:
+                    users_ids[user_id] = None
 
-        logger.debug("User %s not found on client cache; fetching it", user_id)
+        users_ids = list(users_ids)
 
+        if not users_ids:
+            return
+
+        if self._state:
+            stored = self._state.get_many(namespace, users_ids)
+            for user_id in users_ids:
+                if str(user_id) in stored:
+                    self._users[user_id] = stored[str(user_id)]
+            users_ids = [user_id for user_id in users_ids if user_id not in self._users]
+
+        logger.debug("%s users not found on cache; fetching them", len(users_ids))
+
+        users = concurrent_map(self.__fetch_user, users_ids,
+                               max_workers=self.max_workers)
+        users = dict(zip(users_ids, users))
+
+        self._users.update(users)
+
+        found = {user_id: user for user_id, user in users.items() if user}
+
+        if self._state and found:
+            self._state.set_many(namespace, found)
+
+    def __fetch_user(self, user_id):
         try:
             user = self.__fetch_and_parse_user(user_id)
         except requests.exceptions.HTTPError as e:
@@ -259,8 +320,6 @@ class Redmine(Backend):
             else:
                 raise e
 
-        self._users[user_id] = user
-
         return user
 
     def __fetch_and_parse_issues_page(self, from_date, offset, max_issues):
@@ -300,6 +359,12 @@ class RedmineCommand(BackendCommand):
         group.add_argument('--max-issues', dest='max_issues',
                            type=int, default=MAX_ISSUES,
                            help="Maximum number of issues requested on the same query")
+        group.add_argument('--max-workers', dest='max_workers',
+                           type=int, default=DEFAULT_MAX_WORKERS,
+                           help="Maximum number of issues and users fetched concurrently")
+        group.add_argument('--state-path', dest='state_path',
+                           help="Path to the state store used to keep the users between runs; "
+                                "ignored when items are archived")
 
         # Required arguments
         parser.parser.add_argument('url',
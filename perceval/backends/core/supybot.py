@@ -33,10 +33,12 @@ from ...backend import (Backend,
                         BackendCommand,
                         BackendCommandArgumentParser)
 from ...errors import ParseError
-from ...utils import DEFAULT_DATETIME
+from ...utils import DEFAULT_DATETIME, concurrent_map
 
 CATEGORY_MESSAGE = "message"
 
+DEFAULT_MAX_WORKERS = 1  # Number of processes parsing log files in parallel
+
 logger = logging.getLogger(__name__)
 
 
@@ -55,22 +57,31 @@ class Supybot(Backend):
     The format of the messages must also follow a pattern. This
     patterns can be found in `SupybotParser` class documentation.
 
+    When `max_workers` is greater than one, log files are parsed
+    in parallel by a pool of processes.
+
     :param uri: URI of the IRC archives; typically, the URL of their
         IRC channel
     :param dirpath: directory path where the archives are stored
     :param tag: label used to mark the data
     :param archive: archive to store/retrieve items
+    :param max_workers: maximum number of processes parsing log
+        files in parallel
     """
-    version = '0.8.2'
+    version = '0.9.0'
 
     CATEGORIES = [CATEGORY_MESSAGE]
 
-    def __init__(self, uri, dirpath, tag=None, archive=None):
+    FILENAME_DATE_REGEX = re.compile(r"_(\d{4})-(\d{2})-(\d{2})\.log$")
+
+    def __init__(self, uri, dirpath, tag=None, archive=None,
+                 max_workers=DEFAULT_MAX_WORKERS):
         origin = uri
 
         super().__init__(origin, tag=tag, archive=archive)
         self.uri = uri
         self.dirpath = dirpath
+        self.max_workers = max(1, max_workers)
 
     def fetch(self, category=CATEGORY_MESSAGE, from_date=DEFAULT_DATETIME):
         """Fetch the messages from the Supybot IRC logger.
@@ -109,10 +120,10 @@ class Supybot(Backend):
         nmessages = 0
         archives = self.__retrieve_archives(from_date)
 
-        for archive in archives:
+        for archive, messages in zip(archives, self.__parse_archives(archives)):
             logger.debug("Parsing supybot archive %s", archive)
 
-            for message in self.parse_supybot_log(archive):
+            for message in messages:
                 dt = str_to_datetime(message['timestamp'])
 
                 if dt < from_date:
@@ -210,6 +221,26 @@ class Supybot(Backend):
     def _init_client(self, from_archive=False):
         pass
 
+    def __parse_archives(self, archives):
+        """Parse the archives, in parallel when it is possible.
+
+        :returns: a generator with the messages of each archive,
+            following the order of the list
+        """
+        if self.max_workers < 2:
+            for archive in archives:
+                yield self.parse_supybot_log(archive)
+            return
+
+        results = concurrent_map(_parse_supybot_archive, archives,
+                                 max_workers=self.max_workers,
+                                 processes=True)
+
+        for messages, error in results:
+            if error:
+                raise ParseError(cause=error)
+            yield messages
+
     def __retrieve_archives(self, from_date):
         """Retrieve the Supybot archives after the given date"""
 
@@ -246,6 +277,18 @@ class Supybot(Backend):
         default_dt = datetime.datetime(2100, 1, 1,
                                        tzinfo=dateutil.tz.tzutc())
 
+        # Fast path for the filenames that follow the
+        # pattern '#channel_YYYY-MM-DD.log'
+        m = self.FILENAME_DATE_REGEX.search(filepath)
+
+        if m:
+            try:
+                return default_dt.replace(year=int(m.group(1)),
+                                          month=int(m.group(2)),
+                                          day=int(m.group(3)))
+            except ValueError:
+                pass
+
         try:
             name = os.path.basename(filepath)
             dt = dateutil.parser.parse(name, default=default_dt,
@@ -259,6 +302,25 @@ class Supybot(Backend):
         return dt
 
 
+def _parse_supybot_archive(filepath):
+    """Parse a Supybot log file on a pool of processes.
+
+    Parsing errors are returned as strings because they
+    cannot be sent back by the pool.
+
+    :param filepath: path to the IRC log file
+
+    :returns: a tuple with the list of messages and the
+        cause of the error found parsing the file, if any
+    """
+    try:
+        messages = [message for message in Supybot.parse_supybot_log(filepath)]
+    except ParseError as e:
+        return None, str(e)
+
+    return messages, None
+
+
 class SupybotCommand(BackendCommand):
     """Class to run Supybot backend from the command line."""
 
@@ -274,6 +336,12 @@ class SupybotCommand(BackendCommand):
         parser = BackendCommandArgumentParser(from_date=True,
                                               aliases=aliases)
 
+        # Optional arguments
+        group = parser.parser.add_argument_group('Supybot arguments')
+        group.add_argument('--max-workers', dest='max_workers',
+                           type=int, default=DEFAULT_MAX_WORKERS,
+                           help="Maximum number of processes parsing log files in parallel")
+
         # Required arguments
         parser.parser.add_argument('uri',
                                    help="URI of the IRC channel")
@@ -308,6 +376,11 @@ class SupybotParser:
     An exception is raised when any of the lines does not follow any
     of the above formats.
 
+    Most of the lines are comments with a well formed timestamp,
+    so they are parsed without regular expressions. Any line that
+    does not strictly follow that layout is parsed with the patterns
+    defined in this class.
+
     :param stream: an iterator which produces Supybot log lines
     """
     TIMESTAMP_PATTERN = r"""^(?P<ts>\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}[\+\-]\d{4})\s\s
@@ -356,6 +429,12 @@ class SupybotParser:
             line = line.rstrip('\n')
             self.nline += 1
 
+            item = self._parse_supybot_comment_fast(line)
+
+            if item:
+                yield item
+                continue
+
             if self.SUPYBOT_EMPTY_REGEX.match(line):
                 continue
 
@@ -373,6 +452,43 @@ class SupybotParser:
 
             yield item
 
+    def _parse_supybot_comment_fast(self, line):
+        """Parse a comment line without using regular expressions.
+
+        Only lines like '2016-06-27T12:00:00+0000  <nick> body' are
+        parsed. To produce the same results that the patterns, lines
+        with nicks that include '!' or that might be empty comments
+        are not parsed here.
+
+        :returns: the parsed item or `None` when the line has to be
+            parsed with the regular expressions
+        """
+        if len(line) < 28 or line[24:27] != '  <':
+            return None
+
+        if line[4] != '-' or line[7] != '-' or line[10] != 'T' or \
+                line[13] != ':' or line[16] != ':' or line[19] not in ('+', '-'):
+            return None
+
+        digits = line[0:4] + line[5:7] + line[8:10] + line[11:13] + \
+            line[14:16] + line[17:19] + line[20:24]
+
+        if not digits.isdecimal():
+            return None
+
+        msg = line[26:]
+        end = msg.find('>')
+
+        if end < 0 or msg[end + 1:end + 2] != ' ' or len(msg) < end + 3:
+            return None
+
+        nick = msg[1:end]
+
+        if '!' in nick or msg.rstrip().endswith('>'):
+            return None
+
+        return self._build_item(line[:24], self.TCOMMENT, nick, msg[end + 2:].strip())
+
     def _parse_supybot_timestamp(self, line):
         """Parse timestamp section"""
 
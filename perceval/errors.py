@@ -85,3 +85,9 @@ class ParseError(BaseError):
     """Exception raised a parsing errors occurs"""
 
     message = "%(cause)s"
+
+
+class StateStoreError(BaseError):
+    """Generic error for state stores"""
+
+    message = "%(cause)s"
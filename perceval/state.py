@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Santiago Dueñas <sduenas@bitergia.com>
+#
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+from .errors import StateStoreError
+
+
+logger = logging.getLogger(__name__)
+
+
+class StateStore:
+    """Persistent key-value store for the state of backends.
+
+    Backends can use this class to keep data between different
+    executions, such as items emitted on previous runs, cursors
+    or caches of entities that rarely change (i.e users). Thus,
+    incremental fetching processes only need to request what
+    changed since the last run.
+
+    Values are grouped in namespaces and must be serializable
+    to JSON. The store is backed by a SQLite database that will
+    be created when `store_path` does not exist. An instance
+    can be shared among threads.
+
+    :param store_path: path to the store file
+
+    :raises StateStoreError: when the file is not a valid store
+    """
+    STATE_TABLE = "state"
+
+    # Table structure
+    STATE_CREATE_STMT = "CREATE TABLE IF NOT EXISTS " + STATE_TABLE + " ( " \
+                        "namespace VARCHAR(256) NOT NULL, " \
+                        "key VARCHAR(256) NOT NULL, " \
+                        "value TEXT, " \
+                        "PRIMARY KEY (namespace, key))"
+
+    def __init__(self, store_path):
+        self.store_path = store_path
+
+        dirpath = os.path.dirname(os.path.abspath(self.store_path))
+        if not os.path.exists(dirpath):
+            os.makedirs(dirpath)
+
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(self.store_path, check_same_thread=False)
+
+        try:
+            self._db.execute(self.STATE_CREATE_STMT)
+            self._db.commit()
+        except sqlite3.DatabaseError as e:
+            msg = "invalid state store file; cause: %s" % str(e)
+            raise StateStoreError(cause=msg)
+
+        logger.debug("State store %s initialized", self.store_path)
+
+    def __del__(self):
+        conn = getattr(self, '_db', None)
+        if conn:
+            conn.close()
+
+    def get(self, namespace, key, default=None):
+        """Get the value stored for a key.
+
+        :param namespace: namespace of the key
+        :param key: key to retrieve
+        :param default: value returned when the key is not found
+
+        :returns: the stored value or `default`
+
+        :raises StateStoreError: when an error occurs retrieving data
+        """
+        select_stmt = "SELECT value " \
+                      "FROM " + self.STATE_TABLE + " " \
+                      "WHERE namespace = ? AND key = ?"
+
+        with self._lock:
+            try:
+                cursor = self._db.cursor()
+                cursor.execute(select_stmt, (namespace, str(key)))
+                row = cursor.fetchone()
+                cursor.close()
+            except sqlite3.DatabaseError as e:
+                msg = "state retrieval error; cause: %s" % str(e)
+                raise StateStoreError(cause=msg)
+
+        return json.loads(row[0]) if row else default
+
+    def get_many(self, namespace, keys):
+        """Get the values stored for a set of keys.
+
+        Keys not found in the store will not be included
+        in the result.
+
+        :param namespace: namespace of the keys
+        :param keys: list of keys to retrieve
+
+        :returns: a dict with the stored values
+
+        :raises StateStoreError: when an error occurs retrieving data
+        """
+        keys = [str(key) for key in keys]
+        found = {}
+
+        # Keep the number of parameters under the SQLite limit
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            select_stmt = "SELECT key, value " \
+                          "FROM " + self.STATE_TABLE + " " \
+                          "WHERE namespace = ? AND key IN (" + ','.join('?' * len(chunk)) + ")"
+
+            with self._lock:
+                try:
+                    cursor = self._db.cursor()
+                    cursor.execute(select_stmt, [namespace] + chunk)
+                    rows = cursor.fetchall()
+                    cursor.close()
+                except sqlite3.DatabaseError as e:
+                    msg = "state retrieval error; cause: %s" % str(e)
+                    raise StateStoreError(cause=msg)
+
+            found.update({key: json.loads(value) for key, value in rows})
+
+        return found
+
+    def set(self, namespace, key, value):
+        """Store a value for a key, replacing the previous one.
+
+        :param namespace: namespace of the key
+        :param key: key to store
+        :param value: JSON serializable value
+
+        :raises StateStoreError: when an error occurs storing data
+        """
+        self.set_many(namespace, {key: value})
+
+    def set_many(self, namespace, values):
+        """Store several key-value pairs in a single transaction.
+
+        :param namespace: namespace of the keys
+        :param values: dict of JSON serializable values
+
+        :raises StateStoreError: when an error occurs storing data
+        """
+        rows = [(namespace, str(key), json.dumps(value, sort_keys=True))
+                for key, value in values.items()]
+
+        insert_stmt = "INSERT OR REPLACE INTO " + self.STATE_TABLE + " " \
+                      "(namespace, key, value) VALUES (?, ?, ?)"
+
+        with self._lock:
+            try:
+                cursor = self._db.cursor()
+                cursor.executemany(insert_stmt, rows)
+                self._db.commit()
+                cursor.close()
+            except sqlite3.DatabaseError as e:
+                msg = "state storage error; cause: %s" % str(e)
+                raise StateStoreError(cause=msg)
+
+    def delete(self, namespace, key):
+        """Remove a key from the store.
+
+        :param namespace: namespace of the key
+        :param key: key to remove
+
+        :raises StateStoreError: when an error occurs removing data
+        """
+        delete_stmt = "DELETE FROM " + self.STATE_TABLE + " " \
+                      "WHERE namespace = ? AND key = ?"
+
+        with self._lock:
+            try:
+                cursor = self._db.cursor()
+                cursor.execute(delete_stmt, (namespace, str(key)))
+                self._db.commit()
+                cursor.close()
+            except sqlite3.DatabaseError as e:
+                msg = "state removal error; cause: %s" % str(e)
+                raise StateStoreError(cause=msg)
+
+    def keys(self, namespace):
+        """List the keys stored under a namespace.
+
+        :param namespace: namespace to inspect
+
+        :returns: a list of keys
+
+        :raises StateStoreError: when an error occurs retrieving data
+        """
+        select_stmt = "SELECT key " \
+                      "FROM " + self.STATE_TABLE + " " \
+                      "WHERE namespace = ? " \
+                      "ORDER BY key"
+
+        with self._lock:
+            try:
+                cursor = self._db.cursor()
+                cursor.execute(select_stmt, (namespace,))
+                rows = cursor.fetchall()
+                cursor.close()
+            except sqlite3.DatabaseError as e:
+                msg = "state retrieval error; cause: %s" % str(e)
+                raise StateStoreError(cause=msg)
+
+        return [row[0] for row in rows]
@@ -21,8 +21,12 @@
 #     Germán Poo-Caamaño <gpoo@gnome.org>
 #
 
+import collections
+import concurrent.futures
 import datetime
 import email
+import email.parser
+import io
 import logging
 import mailbox
 import re
@@ -102,6 +106,56 @@ def months_range(from_date, to_date):
         pos = x
 
 
+def concurrent_map(func, iterable, max_workers=1, processes=False):
+    """Apply a function to the items of an iterable using a pool of threads.
+
+    Generator that returns the results of calling `func` with each
+    item of `iterable`, in the same order the items are read. Up to
+    `max_workers` calls run at the same time. The iterable is consumed
+    lazily, so the number of items read ahead is bounded by twice the
+    number of workers. When `max_workers` is lower than 2, the items
+    are processed one by one without creating any thread.
+
+    Exceptions raised by `func` are propagated once the failed item
+    is reached; the calls not started yet are cancelled.
+
+    CPU bound functions can run on a pool of processes setting
+    `processes`. In that case, `func`, the items and the results
+    must be picklable.
+
+    :param func: function to call with each item
+    :param iterable: items to process
+    :param max_workers: maximum number of concurrent calls
+    :param processes: use a pool of processes instead of threads
+
+    :returns: a generator of results
+    """
+    if not max_workers or max_workers < 2:
+        for item in iterable:
+            yield func(item)
+        return
+
+    if processes:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers)
+    else:
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+    pending = collections.deque()
+
+    try:
+        for item in iterable:
+            pending.append(executor.submit(func, item))
+
+            if len(pending) >= 2 * max_workers:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
 def message_to_dict(msg):
     """Convert an email message into a dictionary.
 
@@ -126,20 +180,7 @@ def message_to_dict(msg):
         headers = {}
 
         for header, value in msg.items():
-            hv = []
-
-            for text, charset in email.header.decode_header(value):
-                if type(text) == bytes:
-                    charset = charset if charset else 'utf-8'
-                    try:
-                        text = text.decode(charset, errors='surrogateescape')
-                    except (UnicodeError, LookupError):
-                        # Try again with a 7bit encoding
-                        text = text.decode('ascii', errors='surrogateescape')
-                hv.append(text)
-
-            v = ' '.join(hv)
-            headers[header] = v if v else None
+            headers[header] = _decode_header(value)
 
         return headers
 
@@ -189,6 +230,67 @@ def message_to_dict(msg):
     return message
 
 
+def message_headers_to_dict(raw_msg, headers):
+    """Convert some headers of a raw email message into a dictionary.
+
+    Only the header section of the message is parsed and only the
+    given headers are decoded, so this function is much faster than
+    `message_to_dict`. It is useful to check whether a message has
+    to be fully parsed or not.
+
+    Headers are decoded the same way `message_to_dict` does. Those
+    not found in the message will not be included in the result.
+
+    :param raw_msg: email message in bytes
+    :param headers: list of headers to decode
+
+    :returns : dictionary of type `requests.structures.CaseInsensitiveDict`
+
+    :raises ParseError: when an error occurs decoding the headers
+    """
+    names = {header.lower() for header in headers}
+    msg = email.parser.BytesHeaderParser().parsebytes(raw_msg)
+
+    message = requests.structures.CaseInsensitiveDict()
+
+    try:
+        for header, value in msg.items():
+            if header.lower() in names:
+                message[header] = _decode_header(value)
+    except UnicodeError as e:
+        raise ParseError(cause=str(e))
+
+    return message
+
+
+def _decode_header(value):
+    """Decode the value of an email header"""
+
+    hv = []
+
+    for text, charset in email.header.decode_header(value):
+        if type(text) == bytes:
+            charset = charset if charset else 'utf-8'
+            try:
+                text = text.decode(charset, errors='surrogateescape')
+            except (UnicodeError, LookupError):
+                # Try again with a 7bit encoding
+                text = text.decode('ascii', errors='surrogateescape')
+        hv.append(text)
+
+    v = ' '.join(hv)
+
+    return v if v else None
+
+
+_ILLEGAL_XML_UNICHRS = [(0x00, 0x08), (0x0B, 0x1F),
+                        (0x7F, 0x84), (0x86, 0x9F)]
+
+_ILLEGAL_XML_CHARS_REGEX = re.compile('[%s]' % ''.join(['%s-%s' % (chr(low), chr(high))
+                                                        for (low, high) in _ILLEGAL_XML_UNICHRS
+                                                        if low < sys.maxunicode]))
+
+
 def remove_invalid_xml_chars(raw_xml):
     """Remove control and invalid characters from an xml stream.
 
@@ -198,27 +300,14 @@ def remove_invalid_xml_chars(raw_xml):
     lawlesst's on GitHub Gist (https://gist.github.com/lawlesst/4110923),
     that is based on the previous answer.
 
+    All the invalid characters are replaced in a single pass,
+    so the cost is linear with the size of the stream.
+
     :param xml: XML stream
 
     :returns: a purged XML stream
     """
-    illegal_unichrs = [(0x00, 0x08), (0x0B, 0x1F),
-                       (0x7F, 0x84), (0x86, 0x9F)]
-
-    illegal_ranges = ['%s-%s' % (chr(low), chr(high))
-                      for (low, high) in illegal_unichrs
-                      if low < sys.maxunicode]
-
-    illegal_xml_re = re.compile('[%s]' % ''.join(illegal_ranges))
-
-    purged_xml = ''
-
-    for c in raw_xml:
-        if illegal_xml_re.search(c) is not None:
-            c = ' '
-        purged_xml += c
-
-    return purged_xml
+    return _ILLEGAL_XML_CHARS_REGEX.sub(' ', raw_xml)
 
 
 def xml_to_dict(raw_xml):
@@ -240,31 +329,85 @@ def xml_to_dict(raw_xml):
     :raises ParseError: raised when an error occurs parsing the given
         XML stream
     """
-    def node_to_dict(node):
-        d = {}
-        d.update(node.items())
+    purged_xml = remove_invalid_xml_chars(raw_xml)
+
+    try:
+        tree = xml.etree.ElementTree.fromstring(purged_xml)
+    except xml.etree.ElementTree.ParseError as e:
+        cause = "XML stream %s" % (str(e))
+        raise ParseError(cause=cause)
+
+    d = _xml_node_to_dict(tree)
+
+    return d
 
-        text = getattr(node, 'text', None)
 
-        if text is not None:
-            d['__text__'] = text
+def xml_elements_to_dict(raw_xml, tag):
+    """Convert the elements of a XML stream into dictionaries.
 
-        childs = {}
-        for child in node:
-            childs.setdefault(child.tag, []).append(node_to_dict(child))
+    This function parses the stream incrementally, returning a
+    generator of dictionaries, one for each element named `tag`
+    that is a direct child of the root element. Each element is
+    converted using the same format that `xml_to_dict` produces
+    and it is released from the tree once it is converted. Thus,
+    large streams can be processed without keeping the whole
+    document in memory.
 
-        d.update(childs.items())
+    As a consequence, when the stream is invalid, the elements
+    found before the error are returned before the exception
+    is raised.
 
-        return d
+    :param raw_xml: XML stream
+    :param tag: name of the elements to convert
 
+    :returns: a generator of dicts with the data of the elements
+
+    :raises ParseError: raised when an error occurs parsing the given
+        XML stream
+    """
     purged_xml = remove_invalid_xml_chars(raw_xml)
 
+    context = xml.etree.ElementTree.iterparse(io.StringIO(purged_xml),
+                                              events=('start', 'end'))
+    root = None
+    depth = 0
+
     try:
-        tree = xml.etree.ElementTree.fromstring(purged_xml)
+        for event, node in context:
+            if event == 'start':
+                root = node if root is None else root
+                depth += 1
+                continue
+
+            depth -= 1
+
+            if depth != 1 or node.tag != tag:
+                continue
+
+            yield _xml_node_to_dict(node)
+
+            # Release the elements already parsed
+            root.clear()
     except xml.etree.ElementTree.ParseError as e:
         cause = "XML stream %s" % (str(e))
         raise ParseError(cause=cause)
 
-    d = node_to_dict(tree)
+
+def _xml_node_to_dict(node):
+    """Convert a XML element and its children into a dict"""
+
+    d = {}
+    d.update(node.items())
+
+    text = getattr(node, 'text', None)
+
+    if text is not None:
+        d['__text__'] = text
+
+    childs = {}
+    for child in node:
+        childs.setdefault(child.tag, []).append(_xml_node_to_dict(child))
+
+    d.update(childs.items())
 
     return d
@@ -110,6 +110,9 @@ setup(name="perceval",
           'urllib3>=1.22',
           'grimoirelab-toolkit>=0.1.4'
       ],
+      extras_require={
+          'lxml': ['lxml>=3.7']
+      },
       scripts=[
           'bin/perceval'
       ],
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Santiago Dueñas <sduenas@bitergia.com>
+#
+
+"""Benchmark of the Askbot parser.
+
+Measures the cost of parsing the pages of a question, stored
+in the test fixtures, when each parser method builds its own
+tree and when the tree is built only once.
+
+Usage: python3 bench_askbot.py [iterations]
+"""
+
+import os
+import sys
+import timeit
+import unittest.mock
+
+from perceval.backends.core import askbot
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'askbot')
+
+QUESTIONS = {
+    '24396': ['html_24396_multipage_openstack.html',
+              'html_24396_multipage_2_openstack.html',
+              'html_24396_multipage_3_openstack.html',
+              'html_24396_multipage_4_openstack.html'],
+    '26830': ['html_26830_comments_question_openstack.html'],
+    '2481': ['askbot_question_multipage_1.html',
+             'askbot_question_multipage_2.html']
+}
+
+
+def read_file(filename):
+    with open(os.path.join(DATA_DIR, filename), 'r') as f:
+        content = f.read()
+    return content
+
+
+def parse_question(pages, single_parse=True):
+    parser = askbot.AskbotParser
+
+    if single_parse:
+        pages = [parser.parse_html(page) for page in pages]
+
+    for page in pages:
+        parser.parse_number_of_html_pages(page)
+
+    parser.parse_question_container(pages[0])
+
+    answers = []
+    for page in pages:
+        answers.extend(parser.parse_answers(page))
+
+    return answers
+
+
+def run(number):
+    parsers = ['html.parser']
+    if askbot.bs4.builder.builder_registry.lookup('lxml'):
+        parsers.append('lxml')
+
+    for qid, filenames in sorted(QUESTIONS.items()):
+        pages = [read_file(filename) for filename in filenames]
+
+        for html_parser in parsers:
+            with unittest.mock.patch.object(askbot, 'HTML_PARSER', html_parser):
+                for single_parse in (False, True):
+                    elapsed = timeit.timeit(lambda: parse_question(pages, single_parse),
+                                            number=number)
+                    print("question %s, %s pages (%s, %s): %.2f ms/question"
+                          % (qid, len(pages), html_parser,
+                             'single parse' if single_parse else 'parse per method',
+                             elapsed / number * 1e3))
+
+
+if __name__ == '__main__':
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    run(number)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Santiago Dueñas <sduenas@bitergia.com>
+#
+
+"""Benchmark of the Bugzilla parsers.
+
+Runs the activity and bug details parsers over the test fixtures,
+with and without lxml for the activity one, and prints the time
+spent per call.
+
+Usage: python3 bench_bugzilla.py [iterations]
+"""
+
+import os
+import sys
+import timeit
+import unittest.mock
+
+from perceval.backends.core import bugzilla
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'bugzilla')
+
+
+def read_file(filename):
+    with open(os.path.join(DATA_DIR, filename), 'r') as f:
+        content = f.read()
+    return content
+
+
+def parse_activity(raw_html):
+    return [event for event in bugzilla.Bugzilla.parse_bug_activity(raw_html)]
+
+
+def parse_details(raw_xml):
+    return [bug for bug in bugzilla.Bugzilla.parse_bugs_details(raw_xml)]
+
+
+def run(number):
+    benchmarks = [
+        ('parse_bug_activity', parse_activity, read_file('bugzilla_bug_activity.html'), True),
+        ('parse_bugs_details', parse_details, read_file('bugzilla_bugs_details.xml'), False)
+    ]
+
+    for name, func, data, uses_lxml in benchmarks:
+        results = {}
+
+        if uses_lxml and bugzilla.lxml:
+            results['lxml'] = timeit.timeit(lambda: func(data), number=number)
+
+        with unittest.mock.patch.object(bugzilla, 'lxml', None):
+            results['default'] = timeit.timeit(lambda: func(data), number=number)
+
+        for parser, elapsed in results.items():
+            print("%s (%s): %.1f us/call" % (name, parser, elapsed / number * 1e6))
+
+
+if __name__ == '__main__':
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    run(number)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Santiago Dueñas <sduenas@bitergia.com>
+#
+
+"""Benchmark of the XML utilities.
+
+Builds a Bugzilla bugs details stream of 200 bugs from the test
+fixtures and measures the cost of purging invalid characters,
+comparing it with the former per-character loop, and of converting
+the bugs with `xml_to_dict` and `xml_elements_to_dict`.
+
+Usage: python3 bench_utils.py [iterations]
+"""
+
+import os
+import re
+import sys
+import timeit
+
+from perceval import utils
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+
+NUMBER_OF_BUGS = 200
+
+BUG_REGEX = re.compile(r'<bug>.*?</bug>', re.DOTALL)
+
+
+def read_file(filename):
+    with open(os.path.join(DATA_DIR, filename), 'r') as f:
+        content = f.read()
+    return content
+
+
+def build_bugs_details(nbugs):
+    raw_xml = read_file('bugzilla/bugzilla_bugs_details.xml')
+    invalid_xml = read_file('utils/bugzilla_bugs_invalid_chars.xml')
+
+    head, _, _ = raw_xml.partition('<bug>')
+    bugs = BUG_REGEX.findall(raw_xml) + BUG_REGEX.findall(invalid_xml)
+
+    stream = [head.rstrip()]
+    for i in range(nbugs):
+        stream.append(bugs[i % len(bugs)])
+    stream.append('</bugzilla>\n')
+
+    return '\n'.join(stream)
+
+
+def purge_per_char(raw_xml):
+    illegal_xml_re = re.compile('[\x00-\x08\x0b-\x1f\x7f-\x84\x86-\x9f]')
+
+    purged_xml = ''
+
+    for c in raw_xml:
+        if illegal_xml_re.search(c) is not None:
+            c = ' '
+        purged_xml += c
+
+    return purged_xml
+
+
+def parse_tree(raw_xml):
+    return utils.xml_to_dict(raw_xml)['bug']
+
+
+def parse_elements(raw_xml):
+    return [bug for bug in utils.xml_elements_to_dict(raw_xml, 'bug')]
+
+
+def run(number):
+    raw_xml = build_bugs_details(NUMBER_OF_BUGS)
+
+    print("stream: %s bugs, %.1f KB" % (NUMBER_OF_BUGS, len(raw_xml) / 1024))
+
+    purgers = [
+        ('per char', purge_per_char),
+        ('single pass', utils.remove_invalid_xml_chars)
+    ]
+
+    for name, func in purgers:
+        elapsed = timeit.timeit(lambda: func(raw_xml), number=number)
+        print("remove_invalid_xml_chars (%s): %.1f us/call" % (name, elapsed / number * 1e6))
+
+    benchmarks = [
+        ('xml_to_dict', parse_tree),
+        ('xml_elements_to_dict', parse_elements)
+    ]
+
+    for name, func in benchmarks:
+        elapsed = timeit.timeit(lambda: func(raw_xml), number=number)
+        print("%s: %.1f us/call" % (name, elapsed / number * 1e6))
+
+
+if __name__ == '__main__':
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    run(number)
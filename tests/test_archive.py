@@ -27,6 +27,7 @@ import pickle
 import shutil
 import sqlite3
 import tempfile
+import threading
 import unittest
 import unittest.mock
 
@@ -255,6 +256,41 @@ class TestArchive(unittest.TestCase):
 
         self.assertEqual(data.url, response.url)
 
+    def test_store_retrieve_threads(self):
+        """Test whether an archive can be shared among threads"""
+
+        archive_path = os.path.join(self.test_path, 'myarchive')
+        archive = Archive.create(archive_path)
+
+        def store(n):
+            for i in range(10):
+                url = "https://example.com/tasks/%s" % (n * 10 + i)
+                archive.store(url, {}, {}, url)
+
+        threads = [threading.Thread(target=store, args=(n,)) for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        nrows = count_number_rows(archive_path, Archive.ARCHIVE_TABLE)
+        self.assertEqual(nrows, 40)
+
+        results = {}
+
+        def retrieve(n):
+            url = "https://example.com/tasks/%s" % n
+            results[n] = archive.retrieve(url, {}, {})
+
+        threads = [threading.Thread(target=retrieve, args=(n,)) for n in range(40)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        for n in range(40):
+            self.assertEqual(results[n], "https://example.com/tasks/%s" % n)
+
     def test_retrieve_missing(self):
         """Test whether the retrieval of non archived data throws an error
 
@@ -25,6 +25,7 @@ import json
 import os
 import shutil
 import unittest
+import unittest.mock
 
 import bs4
 import httpretty
@@ -153,6 +154,32 @@ class TestAskbotParser(unittest.TestCase):
         pages = AskbotParser.parse_number_of_html_pages(html_question[0])
         self.assertEqual(pages, 4)
 
+    def test_parse_html(self):
+        """Test whether a parsed page can be shared by the parser methods"""
+
+        page = read_file('data/askbot/html_24396_multipage_openstack.html')
+
+        tree = AskbotParser.parse_html(page)
+        self.assertIsInstance(tree, bs4.BeautifulSoup)
+
+        # The same tree gives the same results than the raw page
+        pages = AskbotParser.parse_number_of_html_pages(tree)
+        self.assertEqual(pages, 4)
+
+        container_info = AskbotParser.parse_question_container(tree)
+        self.assertDictEqual(container_info, AskbotParser.parse_question_container(page))
+
+        parsed_answers = AskbotParser.parse_answers(tree)
+        self.assertListEqual(parsed_answers, AskbotParser.parse_answers(page))
+
+    @unittest.mock.patch('perceval.backends.core.askbot.HTML_PARSER', 'html.parser')
+    def test_parse_html_parser(self):
+        """Test whether pages are parsed with Python's HTML parser when lxml is not available"""
+
+        self.test_parse_question_container()
+        self.test_parse_answers()
+        self.test_parse_number_of_html_pages()
+
     def test_parse_user_info(self):
         """Test user info parsing.
 
@@ -371,6 +398,50 @@ class TestAskbotClient(unittest.TestCase):
         self.assertRegex(reqs[1].path, '/post_comments')
         self.assertDictEqual(reqs[1].querystring, expected)
 
+    @httpretty.activate
+    def test_get_comments_urls_checked_once(self):
+        """Test if the URL schema is only checked on the first call"""
+
+        body = read_file('data/askbot/askbot_2481_multicomments.json')
+
+        httpretty.register_uri(httpretty.GET,
+                               ASKBOT_COMMENTS_API_URL,
+                               body='', status=404)
+        httpretty.register_uri(httpretty.GET,
+                               ASKBOT_COMMENTS_API_URL_OLD,
+                               body=body, status=200)
+
+        client = AskbotClient(ASKBOT_URL)
+
+        results = [client.get_comments(post_id) for post_id in (17, 18, 19)]
+        self.assertListEqual(results, [body, body, body])
+
+        paths = [req.path.split('?')[0] for req in httpretty.httpretty.latest_requests]
+        self.assertListEqual(paths, ['/s/post_comments', '/post_comments',
+                                     '/post_comments', '/post_comments'])
+
+        # Once the new schema works, the old one is not tried
+        httpretty.reset()
+        httpretty.register_uri(httpretty.GET,
+                               ASKBOT_COMMENTS_API_URL,
+                               body=body, status=200)
+        httpretty.register_uri(httpretty.GET,
+                               ASKBOT_COMMENTS_API_URL_OLD,
+                               body=body, status=200)
+
+        client = AskbotClient(ASKBOT_URL)
+        _ = client.get_comments(17)
+
+        httpretty.register_uri(httpretty.GET,
+                               ASKBOT_COMMENTS_API_URL,
+                               body='', status=404)
+
+        with self.assertRaises(requests.exceptions.HTTPError):
+            _ = client.get_comments(18)
+
+        paths = [req.path.split('?')[0] for req in httpretty.httpretty.latest_requests]
+        self.assertListEqual(paths, ['/s/post_comments', '/s/post_comments'])
+
 
 class TestAskbotBackend(unittest.TestCase):
     """Askbot backend tests."""
@@ -378,10 +449,11 @@ class TestAskbotBackend(unittest.TestCase):
     def test_initialization(self):
         """Test whether attributes are initializated."""
 
-        ab = Askbot(ASKBOT_URL, tag='test')
+        ab = Askbot(ASKBOT_URL, max_workers=4, tag='test')
 
         self.assertEqual(ab.url, ASKBOT_URL)
         self.assertEqual(ab.tag, 'test')
+        self.assertEqual(ab.max_workers, 4)
         self.assertIsNone(ab.client, None)
 
         # When tag is empty or None it will be set to
@@ -489,6 +561,57 @@ class TestAskbotBackend(unittest.TestCase):
         self.assertEqual(questions[1]['data']['id'], 2481)
         self.assertEqual(questions[1]['category'], backend.metadata_category(questions[1]))
 
+    @httpretty.activate
+    def test_fetch_concurrent(self):
+        """Test whether questions are the same when their requests run concurrently"""
+
+        question_api_1 = read_file('data/askbot/askbot_api_questions.json')
+        question_api_2 = read_file('data/askbot/askbot_api_questions_2.json')
+        question_html_1 = read_file('data/askbot/askbot_question.html')
+        question_html_2 = read_file('data/askbot/askbot_question_multipage_1.html')
+        question_html_2_2 = read_file('data/askbot/askbot_question_multipage_2.html')
+        comments = read_file('data/askbot/askbot_2481_multicomments.json')
+
+        def request_callback(method, uri, headers):
+            if uri.startswith(ASKBOT_QUESTIONS_API_URL):
+                body = question_api_2 if 'page=2' in uri else question_api_1
+            else:
+                body = question_html_2_2 if 'page=2' in uri else question_html_2
+            return (200, headers, body)
+
+        httpretty.register_uri(httpretty.GET,
+                               ASKBOT_QUESTIONS_API_URL,
+                               body=request_callback)
+        httpretty.register_uri(httpretty.GET,
+                               ASKBOT_QUESTION_2481_URL,
+                               body=question_html_1, status=200)
+        httpretty.register_uri(httpretty.GET,
+                               ASKBOT_QUESTION_2488_URL,
+                               body=request_callback)
+        httpretty.register_uri(httpretty.GET,
+                               ASKBOT_COMMENTS_API_URL,
+                               body=comments, status=200)
+
+        backend = Askbot(ASKBOT_URL)
+        expected = [question for question in backend.fetch()]
+
+        backend = Askbot(ASKBOT_URL, max_workers=4)
+        questions = [question for question in backend.fetch()]
+
+        self.assertEqual(len(questions), 2)
+
+        for question, expected_question in zip(questions, expected):
+            self.assertEqual(question['uuid'], expected_question['uuid'])
+            self.assertDictEqual(question['data'], expected_question['data'])
+
+        # Answers of both pages are included in order
+        self.assertEqual(questions[1]['data']['id'], 2488)
+
+        answers = questions[1]['data']['answers']
+        self.assertEqual(len(answers), len(questions[1]['data']['answer_ids']))
+        self.assertListEqual([answer['id'] for answer in answers],
+                             [answer['id'] for answer in expected[1]['data']['answers']])
+
     @httpretty.activate
     def test_fetch_from_date(self):
         """Test whether a list of questions is returned from a given date."""
@@ -648,10 +771,12 @@ class TestAskbotCommand(unittest.TestCase):
         args = ['--tag', 'test',
                 '--from-date', '1970-01-01',
                 '--no-archive',
+                '--max-workers', '4',
                 ASKBOT_URL]
 
         parsed_args = parser.parse(*args)
         self.assertEqual(parsed_args.url, ASKBOT_URL)
+        self.assertEqual(parsed_args.max_workers, 4)
         self.assertEqual(parsed_args.tag, 'test')
         self.assertEqual(parsed_args.from_date, DEFAULT_DATETIME)
         self.assertEqual(parsed_args.no_archive, True)
@@ -26,6 +26,7 @@ import datetime
 import os
 import shutil
 import unittest
+import unittest.mock
 
 import httpretty
 import pkg_resources
@@ -63,12 +64,13 @@ class TestBugzillaBackend(unittest.TestCase):
         """Test whether attributes are initializated"""
 
         bg = Bugzilla(BUGZILLA_SERVER_URL, tag='test',
-                      max_bugs=5)
+                      max_bugs=5, max_workers=4)
 
         self.assertEqual(bg.url, BUGZILLA_SERVER_URL)
         self.assertEqual(bg.origin, BUGZILLA_SERVER_URL)
         self.assertEqual(bg.tag, 'test')
         self.assertEqual(bg.max_bugs, 5)
+        self.assertEqual(bg.max_workers, 4)
         self.assertIsNone(bg.client)
 
         # When tag is empty or None it will be set to
@@ -171,18 +173,6 @@ class TestBugzillaBackend(unittest.TestCase):
                 'order': ['changeddate'],
                 'chfieldfrom': ['1970-01-01 00:00:00']
             },
-            {
-                'ctype': ['csv'],
-                'limit': ['500'],
-                'order': ['changeddate'],
-                'chfieldfrom': ['2009-07-30 11:35:33']
-            },
-            {
-                'ctype': ['csv'],
-                'limit': ['500'],
-                'order': ['changeddate'],
-                'chfieldfrom': ['2015-08-12 18:32:11']
-            },
             {
                 'ctype': ['xml'],
                 'id': ['15', '18', '17', '20', '19'],
@@ -203,6 +193,18 @@ class TestBugzillaBackend(unittest.TestCase):
             {
                 'id': ['19']
             },
+            {
+                'ctype': ['csv'],
+                'limit': ['500'],
+                'order': ['changeddate'],
+                'chfieldfrom': ['2009-07-30 11:35:33']
+            },
+            {
+                'ctype': ['csv'],
+                'limit': ['500'],
+                'order': ['changeddate'],
+                'chfieldfrom': ['2015-08-12 18:32:11']
+            },
             {
                 'ctype': ['xml'],
                 'id': ['30', '888'],
@@ -320,6 +322,63 @@ class TestBugzillaBackend(unittest.TestCase):
         for i in range(len(expected)):
             self.assertDictEqual(requests[i].querystring, expected[i])
 
+    @httpretty.activate
+    def test_fetch_concurrent(self):
+        """Test whether bugs are returned in order when activity is fetched concurrently"""
+
+        bodies_csv = [read_file('data/bugzilla/bugzilla_buglist.csv'),
+                      read_file('data/bugzilla/bugzilla_buglist_next.csv'),
+                      ""]
+        bodies_xml = [read_file('data/bugzilla/bugzilla_version.xml', mode='rb'),
+                      read_file('data/bugzilla/bugzilla_bugs_details.xml', mode='rb'),
+                      read_file('data/bugzilla/bugzilla_bugs_details_next.xml', mode='rb')]
+        body_activity = read_file('data/bugzilla/bugzilla_bug_activity.html', mode='rb')
+        body_activity_empty = read_file('data/bugzilla/bugzilla_bug_activity_empty.html', mode='rb')
+
+        def request_callback(method, uri, headers):
+            if uri.startswith(BUGZILLA_BUGLIST_URL):
+                body = bodies_csv.pop(0)
+            elif uri.startswith(BUGZILLA_BUG_URL):
+                body = bodies_xml.pop(0)
+            elif uri.endswith('id=888'):
+                body = body_activity
+            else:
+                body = body_activity_empty
+
+            return (200, headers, body)
+
+        httpretty.register_uri(httpretty.GET,
+                               BUGZILLA_BUGLIST_URL,
+                               responses=[
+                                   httpretty.Response(body=request_callback)
+                                   for _ in range(3)
+                               ])
+        httpretty.register_uri(httpretty.GET,
+                               BUGZILLA_BUG_URL,
+                               responses=[
+                                   httpretty.Response(body=request_callback)
+                                   for _ in range(3)
+                               ])
+        httpretty.register_uri(httpretty.GET,
+                               BUGZILLA_BUG_ACTIVITY_URL,
+                               responses=[
+                                   httpretty.Response(body=request_callback)
+                                   for _ in range(7)
+                               ])
+
+        bg = Bugzilla(BUGZILLA_SERVER_URL, max_bugs=5, max_bugs_csv=500, max_workers=4)
+        bugs = [bug for bug in bg.fetch()]
+
+        expected = ['15', '18', '17', '20', '19', '30', '888']
+        self.assertListEqual([bug['data']['bug_id'][0]['__text__'] for bug in bugs],
+                             expected)
+
+        for bug in bugs[:6]:
+            self.assertEqual(len(bug['data']['activity']), 0)
+
+        self.assertEqual(len(bugs[6]['data']['activity']), 14)
+        self.assertEqual(bugs[6]['uuid'], 'b4009442d38f4241a4e22e3e61b7cd8ef5ced35c')
+
     @httpretty.activate
     def test_fetch_empty(self):
         """Test whether it works when no bugs are fetched"""
@@ -651,6 +710,24 @@ class TestBugzillaBackendParsers(unittest.TestCase):
             bugs = Bugzilla.parse_bugs_details(raw_xml)
             _ = [bug for bug in bugs]
 
+    def test_parse_truncated_bug_details(self):
+        """Test whether no bug is returned when the XML is truncated"""
+
+        raw_xml = read_file('data/bugzilla/bugzilla_bugs_details.xml')
+
+        # The XML is cut in the middle of the third bug
+        end = raw_xml.find('<bug>', raw_xml.find('<bug_id>18</bug_id>'))
+        raw_xml = raw_xml[:end] + '<bug><bug_id>17'
+
+        bugs = Bugzilla.parse_bugs_details(raw_xml)
+        result = []
+
+        with self.assertRaises(ParseError):
+            for bug in bugs:
+                result.append(bug)
+
+        self.assertListEqual(result, [])
+
     def test_parse_activity(self):
         """Test activity bug parsing"""
 
@@ -707,6 +784,14 @@ class TestBugzillaBackendParsers(unittest.TestCase):
             activity = Bugzilla.parse_bug_activity(raw_html)
             _ = [event for event in activity]
 
+    @unittest.mock.patch('perceval.backends.core.bugzilla.lxml', None)
+    def test_parse_activity_no_lxml(self):
+        """Test activity bug parsing when lxml is not available"""
+
+        self.test_parse_activity()
+        self.test_parse_empty_activity()
+        self.test_parse_activity_no_table()
+
 
 class TestBugzillaCommand(unittest.TestCase):
     """BugzillaCommand unit tests"""
@@ -725,6 +810,7 @@ class TestBugzillaCommand(unittest.TestCase):
         args = ['--backend-user', 'jsmith@example.com',
                 '--backend-password', '1234',
                 '--max-bugs', '10', '--max-bugs-csv', '5',
+                '--max-workers', '4',
                 '--tag', 'test',
                 '--from-date', '1970-01-01',
                 '--no-archive',
@@ -735,6 +821,7 @@ class TestBugzillaCommand(unittest.TestCase):
         self.assertEqual(parsed_args.password, '1234')
         self.assertEqual(parsed_args.max_bugs, 10)
         self.assertEqual(parsed_args.max_bugs_csv, 5)
+        self.assertEqual(parsed_args.max_workers, 4)
         self.assertEqual(parsed_args.tag, 'test')
         self.assertEqual(parsed_args.no_archive, True)
         self.assertEqual(parsed_args.url, BUGZILLA_SERVER_URL)
@@ -125,12 +125,14 @@ class TestBugzillaRESTBackend(unittest.TestCase):
         """Test whether attributes are initializated"""
 
         bg = BugzillaREST(BUGZILLA_SERVER_URL, tag='test',
-                          max_bugs=5)
+                          max_bugs=5, max_contents=10, max_workers=3)
 
         self.assertEqual(bg.url, BUGZILLA_SERVER_URL)
         self.assertEqual(bg.origin, BUGZILLA_SERVER_URL)
         self.assertEqual(bg.tag, 'test')
         self.assertEqual(bg.max_bugs, 5)
+        self.assertEqual(bg.max_contents, 10)
+        self.assertEqual(bg.max_workers, 3)
         self.assertIsNone(bg.client)
 
         # When tag is empty or None it will be set to
@@ -245,6 +247,46 @@ class TestBugzillaRESTBackend(unittest.TestCase):
         for i in range(len(expected)):
             self.assertDictEqual(http_requests[i].querystring, expected[i])
 
+    @httpretty.activate
+    def test_fetch_concurrent(self):
+        """Test whether bugs are returned in order when contents are fetched concurrently"""
+
+        setup_http_server()
+
+        bg = BugzillaREST(BUGZILLA_SERVER_URL, max_bugs=2, max_workers=3)
+        bugs = [bug for bug in bg.fetch(from_date=None)]
+
+        self.assertEqual(len(bugs), 3)
+
+        self.assertEqual(bugs[0]['data']['id'], 1273442)
+        self.assertEqual(len(bugs[0]['data']['comments']), 7)
+        self.assertEqual(len(bugs[0]['data']['history']), 6)
+        self.assertEqual(len(bugs[0]['data']['attachments']), 1)
+        self.assertEqual(bugs[0]['uuid'], '68494ad0072ed9e09cecb8235649a38c443326db')
+
+        self.assertEqual(bugs[1]['data']['id'], 1273439)
+        self.assertEqual(len(bugs[1]['data']['comments']), 0)
+        self.assertEqual(len(bugs[1]['data']['history']), 0)
+        self.assertEqual(len(bugs[1]['data']['attachments']), 0)
+        self.assertEqual(bugs[1]['uuid'], 'd306162de06bc759f9bd9227fe3fd5f08aeb0dde')
+
+        self.assertEqual(bugs[2]['data']['id'], 947945)
+        self.assertEqual(len(bugs[2]['data']['comments']), 0)
+        self.assertEqual(len(bugs[2]['data']['history']), 0)
+        self.assertEqual(len(bugs[2]['data']['attachments']), 0)
+        self.assertEqual(bugs[2]['uuid'], '33edda925351c3310fc3e12d7f18a365c365f6bd')
+
+        # Same requests, although the order may change
+        http_requests = httpretty.HTTPretty.latest_requests
+        self.assertEqual(len(http_requests), 9)
+
+        paths = sorted([req.path.split('?')[0] for req in http_requests])
+        expected = ['/rest/bug'] * 3
+        expected += ['/rest/bug/1273442/' + r for r in ['comment', 'history', 'attachment']]
+        expected += ['/rest/bug/947945/' + r for r in ['comment', 'history', 'attachment']]
+        expected.sort()
+        self.assertListEqual(paths, expected)
+
     @httpretty.activate
     def test_fetch_empty(self):
         """Test whether it works when no bugs are fetched"""
@@ -639,7 +681,8 @@ class TestBugzillaRESTCommand(unittest.TestCase):
         args = ['--backend-user', 'jsmith@example.com',
                 '--backend-password', '1234',
                 '--api-token', 'abcdefg',
-                '--max-bugs', '10', '--tag', 'test',
+                '--max-bugs', '10', '--max-contents', '5',
+                '--max-workers', '3', '--tag', 'test',
                 '--from-date', '1970-01-01',
                 '--no-archive',
                 BUGZILLA_SERVER_URL]
@@ -649,6 +692,8 @@ class TestBugzillaRESTCommand(unittest.TestCase):
         self.assertEqual(parsed_args.password, '1234')
         self.assertEqual(parsed_args.api_token, 'abcdefg')
         self.assertEqual(parsed_args.max_bugs, 10)
+        self.assertEqual(parsed_args.max_contents, 5)
+        self.assertEqual(parsed_args.max_workers, 3)
         self.assertEqual(parsed_args.tag, 'test')
         self.assertEqual(parsed_args.from_date, DEFAULT_DATETIME)
         self.assertEqual(parsed_args.no_archive, True)
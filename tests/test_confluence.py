@@ -61,6 +61,8 @@ def setup_http_server():
     body_contents = read_file('data/confluence/confluence_contents.json', 'rb')
     body_contents_next = read_file('data/confluence/confluence_contents_next.json', 'rb')
     body_contents_empty = read_file('data/confluence/confluence_contents_empty.json', 'rb')
+    body_contents_versions = read_file('data/confluence/confluence_contents_versions.json', 'rb')
+    body_contents_versions_next = read_file('data/confluence/confluence_contents_versions_next.json', 'rb')
     body_content_1_v1 = read_file('data/confluence/confluence_content_1_v1.json', 'rb')
     body_content_1_v2 = read_file('data/confluence/confluence_content_1_v2.json', 'rb')
     body_content_2 = read_file('data/confluence/confluence_content_2_v1.json', 'rb')
@@ -71,9 +73,11 @@ def setup_http_server():
             params = urllib.parse.parse_qs(urllib.parse.urlparse(uri).query)
 
             if 'start' in params and params['start'] == ['2']:
-                body = body_contents_next
+                body = body_contents_versions_next if 'expand' in params else body_contents_next
             elif params['cql'][0].startswith("lastModified>='2016-07-08 00:00'"):
                 body = body_contents_empty
+            elif 'expand' in params:
+                body = body_contents_versions
             else:
                 body = body_contents
         elif uri.startswith(CONFLUENCE_HISTORICAL_CONTENT_1):
@@ -129,6 +133,8 @@ class TestConfluenceBackend(unittest.TestCase):
         self.assertEqual(confluence.url, CONFLUENCE_URL)
         self.assertEqual(confluence.origin, CONFLUENCE_URL)
         self.assertEqual(confluence.tag, 'test')
+        self.assertEqual(confluence.max_workers, 1)
+        self.assertFalse(confluence.versions_from_summary)
         self.assertIsNone(confluence.client)
 
         # When tag is empty or None it will be set to
@@ -143,6 +149,11 @@ class TestConfluenceBackend(unittest.TestCase):
         self.assertEqual(confluence.origin, CONFLUENCE_URL)
         self.assertEqual(confluence.tag, CONFLUENCE_URL)
 
+        confluence = Confluence(CONFLUENCE_URL, max_workers=4,
+                                versions_from_summary=True)
+        self.assertEqual(confluence.max_workers, 4)
+        self.assertTrue(confluence.versions_from_summary)
+
     def test_has_archiving(self):
         """Test if it returns True when has_archiving is called"""
 
@@ -192,11 +203,6 @@ class TestConfluenceBackend(unittest.TestCase):
                 'cql': ["lastModified>='1970-01-01 00:00' order by lastModified"],
                 'limit': ['200']
             },
-            {
-                'cql': ["lastModified>='1970-01-01 00:00' order by lastModified"],
-                'start': ['2'],
-                'limit': ['2']  # Hardcoded in JSON dataset
-            },
             {
                 'expand': ['body.storage,history,version'],
                 'status': ['historical'],
@@ -212,6 +218,11 @@ class TestConfluenceBackend(unittest.TestCase):
                 'status': ['historical'],
                 'version': ['1']
             },
+            {
+                'cql': ["lastModified>='1970-01-01 00:00' order by lastModified"],
+                'start': ['2'],
+                'limit': ['2']  # Hardcoded in JSON dataset
+            },
             {
                 'expand': ['body.storage,history,version'],
                 'status': ['historical'],
@@ -266,12 +277,6 @@ class TestConfluenceBackend(unittest.TestCase):
                 'cql': ["lastModified>='2016-06-16 00:00' order by lastModified"],
                 'limit': ['200']
             },
-            {
-                # Hardcoded in JSON dataset
-                'cql': ["lastModified>='1970-01-01 00:00' order by lastModified"],
-                'start': ['2'],
-                'limit': ['2']
-            },
             {
                 'expand': ['body.storage,history,version'],
                 'status': ['historical'],
@@ -287,6 +292,136 @@ class TestConfluenceBackend(unittest.TestCase):
                 'status': ['historical'],
                 'version': ['1']
             },
+            {
+                # Hardcoded in JSON dataset
+                'cql': ["lastModified>='1970-01-01 00:00' order by lastModified"],
+                'start': ['2'],
+                'limit': ['2']
+            },
+            {
+                'expand': ['body.storage,history,version'],
+                'status': ['historical'],
+                'version': ['1']
+            }
+        ]
+
+        self.assertEqual(len(http_requests), len(expected))
+
+        for i in range(len(expected)):
+            self.assertDictEqual(http_requests[i].querystring, expected[i])
+
+    @httpretty.activate
+    def test_fetch_versions_from_summary(self):
+        """Test if it fetches the versions read from the contents summary"""
+
+        setup_http_server()
+
+        confluence = Confluence(CONFLUENCE_URL)
+        expected = [hc for hc in confluence.fetch()]
+
+        confluence = Confluence(CONFLUENCE_URL, max_workers=2,
+                                versions_from_summary=True)
+        hcs = [hc for hc in confluence.fetch()]
+
+        self.assertEqual(len(hcs), 4)
+
+        for x in range(len(hcs)):
+            self.assertEqual(hcs[x]['uuid'], expected[x]['uuid'])
+            self.assertEqual(hcs[x]['updated_on'], expected[x]['updated_on'])
+            self.assertDictEqual(hcs[x]['data'], expected[x]['data'])
+
+    @httpretty.activate
+    def test_fetch_versions_from_summary_from_date(self):
+        """Test if versions created before a given date are not requested"""
+
+        http_requests = setup_http_server()
+
+        from_date = datetime.datetime(2016, 6, 16, 0, 0, 0)
+
+        confluence = Confluence(CONFLUENCE_URL, versions_from_summary=True)
+        hcs = [hc for hc in confluence.fetch(from_date=from_date)]
+
+        expected = [('1', 2), ('2', 1), ('att1', 1)]
+
+        self.assertEqual(len(hcs), len(expected))
+
+        for x in range(len(hcs)):
+            self.assertEqual(hcs[x]['data']['id'], expected[x][0])
+            self.assertEqual(hcs[x]['data']['version']['number'], expected[x][1])
+
+        # Version 1 of content 1 is only requested
+        # to find the first version after 'from_date'
+        versions = [req.querystring['version'] for req in http_requests
+                    if 'version' in req.querystring]
+        self.assertListEqual(versions, [['1'], ['2'], ['1'], ['1']])
+
+    @httpretty.activate
+    def test_fetch_versions_from_summary_missing_version(self):
+        """Test if missing versions are skipped while looking for the first one after a date"""
+
+        http_requests = setup_http_server()
+
+        body_content_1_v2 = read_file('data/confluence/confluence_content_1_v2.json', 'rb')
+
+        def request_callback(method, uri, headers):
+            params = urllib.parse.parse_qs(urllib.parse.urlparse(uri).query)
+            http_requests.append(httpretty.last_request())
+
+            if params['version'] == ['1']:
+                return (404, headers, "Mock 404 error")
+            else:
+                return (200, headers, body_content_1_v2)
+
+        httpretty.register_uri(httpretty.GET,
+                               CONFLUENCE_HISTORICAL_CONTENT_1,
+                               responses=[
+                                   httpretty.Response(body=request_callback)
+                               ])
+
+        from_date = datetime.datetime(2016, 6, 16, 0, 0, 0)
+
+        confluence = Confluence(CONFLUENCE_URL, versions_from_summary=True)
+        hcs = [hc for hc in confluence.fetch(from_date=from_date)]
+
+        expected = [('1', 2), ('2', 1), ('att1', 1)]
+
+        self.assertEqual(len(hcs), len(expected))
+
+        for x in range(len(hcs)):
+            self.assertEqual(hcs[x]['data']['id'], expected[x][0])
+            self.assertEqual(hcs[x]['data']['version']['number'], expected[x][1])
+
+        # The missing version is requested only once
+        versions = [req.querystring['version'] for req in http_requests
+                    if 'version' in req.querystring]
+        self.assertListEqual(versions, [['1'], ['2'], ['1'], ['1']])
+
+    @httpretty.activate
+    def test_fetch_versions_from_summary_skip_contents(self):
+        """Test if contents updated before a given date are skipped"""
+
+        http_requests = setup_http_server()
+
+        from_date = datetime.datetime(2016, 7, 2, 0, 0, 0)
+
+        confluence = Confluence(CONFLUENCE_URL, versions_from_summary=True)
+        hcs = [hc for hc in confluence.fetch(from_date=from_date)]
+
+        self.assertEqual(len(hcs), 1)
+        self.assertEqual(hcs[0]['data']['id'], 'att1')
+
+        expected = [
+            {
+                'cql': ["lastModified>='2016-07-02 00:00' order by lastModified"],
+                'expand': ['version'],
+                'limit': ['200']
+            },
+            {
+                'cql': ["lastModified>='1970-01-01 00:00' order by lastModified"],
+                'expand': ['version'],
+                'start': ['2'],
+                'limit': ['2']  # Hardcoded in JSON dataset
+            },
             {
                 'expand': ['body.storage,history,version'],
                 'status': ['historical'],
@@ -339,16 +474,16 @@ class TestConfluenceBackend(unittest.TestCase):
                 'cql': ["lastModified>='1970-01-01 00:00' order by lastModified"],
                 'limit': ['200']
             },
-            {
-                'cql': ["lastModified>='1970-01-01 00:00' order by lastModified"],
-                'start': ['2'],
-                'limit': ['2']  # Hardcoded in JSON dataset
-            },
             {
                 'expand': ['body.storage,history,version'],
                 'status': ['historical'],
                 'version': ['1']
             },
+            {
+                'cql': ["lastModified>='1970-01-01 00:00' order by lastModified"],
+                'start': ['2'],
+                'limit': ['2']  # Hardcoded in JSON dataset
+            },
             {
                 'expand': ['body.storage,history,version'],
                 'status': ['historical'],
@@ -488,6 +623,16 @@ class TestConfluenceCommand(unittest.TestCase):
         self.assertEqual(parsed_args.tag, 'test')
         self.assertEqual(parsed_args.no_archive, True)
         self.assertEqual(parsed_args.from_date, DEFAULT_DATETIME)
+        self.assertFalse(parsed_args.versions_from_summary)
+        self.assertEqual(parsed_args.max_workers, 1)
+
+        args = ['http://example.com',
+                '--versions-from-summary',
+                '--max-workers', '4']
+
+        parsed_args = parser.parse(*args)
+        self.assertTrue(parsed_args.versions_from_summary)
+        self.assertEqual(parsed_args.max_workers, 4)
 
 
 class TestConfluenceClient(unittest.TestCase):
@@ -555,6 +700,38 @@ class TestConfluenceClient(unittest.TestCase):
         for i in range(len(expected)):
             self.assertDictEqual(http_requests[i].querystring, expected[i])
 
+    @httpretty.activate
+    def test_contents_expand_version(self):
+        """Test contents API call including the latest versions"""
+
+        http_requests = setup_http_server()
+
+        client = ConfluenceClient(CONFLUENCE_URL)
+
+        pages = client.contents(max_contents=2, expand_version=True)
+        pages = [p for p in pages]
+
+        self.assertEqual(len(pages), 2)
+
+        expected = [
+            {
+                'cql': ["lastModified>='1970-01-01 00:00' order by lastModified"],
+                'expand': ['version'],
+                'limit': ['2']
+            },
+            {
+                'cql': ["lastModified>='1970-01-01 00:00' order by lastModified"],
+                'expand': ['version'],
+                'start': ['2'],
+                'limit': ['2']
+            }
+        ]
+
+        self.assertEqual(len(http_requests), len(expected))
+
+        for i in range(len(expected)):
+            self.assertDictEqual(http_requests[i].querystring, expected[i])
+
     @httpretty.activate
     def test_historical_content(self):
         """Test historical content API call"""
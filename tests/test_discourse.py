@@ -26,6 +26,7 @@ import datetime
 import os
 import shutil
 import unittest
+import urllib.parse
 
 import httpretty
 import pkg_resources
@@ -44,8 +45,8 @@ DISCOURSE_TOPICS_URL = DISCOURSE_SERVER_URL + '/latest.json'
 DISCOURSE_TOPIC_URL_1148 = DISCOURSE_SERVER_URL + '/t/1148.json'
 DISCOURSE_TOPIC_URL_1149 = DISCOURSE_SERVER_URL + '/t/1149.json'
 DISCOURSE_TOPIC_URL_1150 = DISCOURSE_SERVER_URL + '/t/1150.json'
+DISCOURSE_TOPIC_POSTS_URL_1148 = DISCOURSE_SERVER_URL + '/t/1148/posts.json'
 DISCOURSE_POST_URL_1 = DISCOURSE_SERVER_URL + '/posts/21.json'
-DISCOURSE_POST_URL_2 = DISCOURSE_SERVER_URL + '/posts/22.json'
 
 
 def read_file(filename, mode='r'):
@@ -65,6 +66,7 @@ class TestDiscourseBackend(unittest.TestCase):
         self.assertEqual(discourse.url, DISCOURSE_SERVER_URL)
         self.assertEqual(discourse.origin, DISCOURSE_SERVER_URL)
         self.assertEqual(discourse.tag, 'test')
+        self.assertEqual(discourse.max_workers, 1)
         self.assertIsNone(discourse.client)
 
         # When origin is empty or None it will be set to
@@ -79,6 +81,9 @@ class TestDiscourseBackend(unittest.TestCase):
         self.assertEqual(discourse.origin, DISCOURSE_SERVER_URL)
         self.assertEqual(discourse.tag, DISCOURSE_SERVER_URL)
 
+        discourse = Discourse(DISCOURSE_SERVER_URL, max_workers=4)
+        self.assertEqual(discourse.max_workers, 4)
+
     def test_has_archiving(self):
         """Test if it returns True when has_archiving is called"""
 
@@ -99,7 +104,7 @@ class TestDiscourseBackend(unittest.TestCase):
                          read_file('data/discourse/discourse_topics_empty.json')]
         body_topic_1148 = read_file('data/discourse/discourse_topic_1148.json')
         body_topic_1149 = read_file('data/discourse/discourse_topic_1149.json')
-        body_post = read_file('data/discourse/discourse_post.json')
+        body_posts = read_file('data/discourse/discourse_topic_posts_1148.json')
 
         def request_callback(method, uri, headers):
             if uri.startswith(DISCOURSE_TOPICS_URL):
@@ -108,9 +113,8 @@ class TestDiscourseBackend(unittest.TestCase):
                 body = body_topic_1148
             elif uri.startswith(DISCOURSE_TOPIC_URL_1149):
                 body = body_topic_1149
-            elif uri.startswith(DISCOURSE_POST_URL_1) or \
-                    uri.startswith(DISCOURSE_POST_URL_2):
-                body = body_post
+            elif uri.startswith(DISCOURSE_TOPIC_POSTS_URL_1148):
+                body = body_posts
             else:
                 raise
 
@@ -135,12 +139,7 @@ class TestDiscourseBackend(unittest.TestCase):
                                    httpretty.Response(body=request_callback)
                                ])
         httpretty.register_uri(httpretty.GET,
-                               DISCOURSE_POST_URL_1,
-                               responses=[
-                                   httpretty.Response(body=request_callback)
-                               ])
-        httpretty.register_uri(httpretty.GET,
-                               DISCOURSE_POST_URL_2,
+                               DISCOURSE_TOPIC_POSTS_URL_1148,
                                responses=[
                                    httpretty.Response(body=request_callback)
                                ])
@@ -172,16 +171,16 @@ class TestDiscourseBackend(unittest.TestCase):
         # less than the number of posts of a topic
         self.assertEqual(len(topics[1]['data']['post_stream']['posts']), 22)
         self.assertEqual(topics[1]['data']['post_stream']['posts'][0]['id'], 18952)
-        self.assertEqual(topics[1]['data']['post_stream']['posts'][20]['id'], 2500)
+        self.assertEqual(topics[1]['data']['post_stream']['posts'][20]['id'], 21)
+        self.assertEqual(topics[1]['data']['post_stream']['posts'][21]['id'], 22)
 
-        # Check requests
+        # Check requests; the remaining posts are requested at once
         expected = [
             {'page': ['0']},
             {'page': ['1']},
             {},
             {},
-            {},
-            {}
+            {'post_ids[]': ['21', '22']}
         ]
 
         self.assertEqual(len(requests_http), len(expected))
@@ -199,7 +198,7 @@ class TestDiscourseBackend(unittest.TestCase):
                          read_file('data/discourse/discourse_topics_empty.json')]
         body_topic_1148 = read_file('data/discourse/discourse_topic_1148.json')
         body_topic_1149 = read_file('data/discourse/discourse_topic_1149.json')
-        body_post = read_file('data/discourse/discourse_post.json')
+        body_posts = read_file('data/discourse/discourse_topic_posts_1148.json')
 
         def request_callback(method, uri, headers):
             if uri.startswith(DISCOURSE_TOPICS_URL):
@@ -208,9 +207,8 @@ class TestDiscourseBackend(unittest.TestCase):
                 body = body_topic_1148
             elif uri.startswith(DISCOURSE_TOPIC_URL_1149):
                 body = body_topic_1149
-            elif uri.startswith(DISCOURSE_POST_URL_1) or \
-                    uri.startswith(DISCOURSE_POST_URL_2):
-                body = body_post
+            elif uri.startswith(DISCOURSE_TOPIC_POSTS_URL_1148):
+                body = body_posts
             else:
                 raise
 
@@ -235,12 +233,7 @@ class TestDiscourseBackend(unittest.TestCase):
                                    httpretty.Response(body=request_callback)
                                ])
         httpretty.register_uri(httpretty.GET,
-                               DISCOURSE_POST_URL_1,
-                               responses=[
-                                   httpretty.Response(body=request_callback)
-                               ])
-        httpretty.register_uri(httpretty.GET,
-                               DISCOURSE_POST_URL_2,
+                               DISCOURSE_TOPIC_POSTS_URL_1148,
                                responses=[
                                    httpretty.Response(body=request_callback)
                                ])
@@ -265,8 +258,7 @@ class TestDiscourseBackend(unittest.TestCase):
         expected = [
             {'page': ['0']},
             {},
-            {},
-            {}
+            {'post_ids[]': ['21', '22']}
         ]
 
         self.assertEqual(len(requests_http), len(expected))
@@ -297,7 +289,7 @@ class TestDiscourseBackend(unittest.TestCase):
         body_topic_1148 = read_file('data/discourse/discourse_topic_1148.json')
         body_topic_1149 = read_file('data/discourse/discourse_topic_1149.json')
         body_topic_1150 = read_file('data/discourse/discourse_topic_1150.json')
-        body_post = read_file('data/discourse/discourse_post.json')
+        body_posts = read_file('data/discourse/discourse_topic_posts_1148.json')
 
         def request_callback(method, uri, headers):
             if uri.startswith(DISCOURSE_TOPICS_URL):
@@ -308,9 +300,8 @@ class TestDiscourseBackend(unittest.TestCase):
                 body = body_topic_1149
             elif uri.startswith(DISCOURSE_TOPIC_URL_1150):
                 body = body_topic_1150
-            elif uri.startswith(DISCOURSE_POST_URL_1) or \
-                    uri.startswith(DISCOURSE_POST_URL_2):
-                body = body_post
+            elif uri.startswith(DISCOURSE_TOPIC_POSTS_URL_1148):
+                body = body_posts
             else:
                 raise
             return (200, headers, body)
@@ -337,12 +328,7 @@ class TestDiscourseBackend(unittest.TestCase):
                                    httpretty.Response(body=request_callback)
                                ])
         httpretty.register_uri(httpretty.GET,
-                               DISCOURSE_POST_URL_1,
-                               responses=[
-                                   httpretty.Response(body=request_callback)
-                               ])
-        httpretty.register_uri(httpretty.GET,
-                               DISCOURSE_POST_URL_2,
+                               DISCOURSE_TOPIC_POSTS_URL_1148,
                                responses=[
                                    httpretty.Response(body=request_callback)
                                ])
@@ -372,6 +358,44 @@ class TestDiscourseBackend(unittest.TestCase):
         self.assertEqual(topics[1]['category'], 'topic')
         self.assertEqual(topics[0]['tag'], DISCOURSE_SERVER_URL)
 
+    @httpretty.activate
+    def test_fetch_concurrent(self):
+        """Test whether topics fetched concurrently are returned in order"""
+
+        body_topics = read_file('data/discourse/discourse_topics_pinned.json')
+        body_topics_empty = read_file('data/discourse/discourse_topics_empty.json')
+        bodies = {
+            DISCOURSE_TOPIC_URL_1148: read_file('data/discourse/discourse_topic_1148.json'),
+            DISCOURSE_TOPIC_URL_1149: read_file('data/discourse/discourse_topic_1149.json'),
+            DISCOURSE_TOPIC_URL_1150: read_file('data/discourse/discourse_topic_1150.json'),
+            DISCOURSE_TOPIC_POSTS_URL_1148: read_file('data/discourse/discourse_topic_posts_1148.json')
+        }
+
+        def request_callback(method, uri, headers):
+            if uri.startswith(DISCOURSE_TOPICS_URL):
+                params = urllib.parse.parse_qs(urllib.parse.urlparse(uri).query)
+                body = body_topics if params['page'] == ['0'] else body_topics_empty
+            else:
+                body = bodies[uri.split('?')[0]]
+            return (200, headers, body)
+
+        for url in [DISCOURSE_TOPICS_URL] + list(bodies.keys()):
+            httpretty.register_uri(httpretty.GET, url,
+                                   body=request_callback)
+
+        discourse = Discourse(DISCOURSE_SERVER_URL)
+        expected = [topic for topic in discourse.fetch()]
+
+        discourse = Discourse(DISCOURSE_SERVER_URL, max_workers=3)
+        topics = [topic for topic in discourse.fetch()]
+
+        self.assertEqual(len(topics), 3)
+        self.assertListEqual([topic['data']['id'] for topic in topics], [1149, 1148, 1150])
+
+        for x in range(len(topics)):
+            self.assertEqual(topics[x]['uuid'], expected[x]['uuid'])
+            self.assertDictEqual(topics[x]['data'], expected[x]['data'])
+
     @httpretty.activate
     def test_fetch_topic_last_posted_at_null(self):
         """Test whether list of topics is returned when a topic has last_posted_at null"""
@@ -438,7 +462,7 @@ class TestDiscourseBackendArchive(TestCaseBackendArchive):
                          read_file('data/discourse/discourse_topics_empty.json')]
         body_topic_1148 = read_file('data/discourse/discourse_topic_1148.json')
         body_topic_1149 = read_file('data/discourse/discourse_topic_1149.json')
-        body_post = read_file('data/discourse/discourse_post.json')
+        body_posts = read_file('data/discourse/discourse_topic_posts_1148.json')
 
         def request_callback(method, uri, headers):
             if uri.startswith(DISCOURSE_TOPICS_URL):
@@ -447,8 +471,8 @@ class TestDiscourseBackendArchive(TestCaseBackendArchive):
                 body = body_topic_1148
             elif uri.startswith(DISCOURSE_TOPIC_URL_1149):
                 body = body_topic_1149
-            elif uri.startswith(DISCOURSE_POST_URL_1) or uri.startswith(DISCOURSE_POST_URL_2):
-                body = body_post
+            elif uri.startswith(DISCOURSE_TOPIC_POSTS_URL_1148):
+                body = body_posts
             else:
                 raise
 
@@ -473,12 +497,7 @@ class TestDiscourseBackendArchive(TestCaseBackendArchive):
                                    httpretty.Response(body=request_callback)
                                ])
         httpretty.register_uri(httpretty.GET,
-                               DISCOURSE_POST_URL_1,
-                               responses=[
-                                   httpretty.Response(body=request_callback)
-                               ])
-        httpretty.register_uri(httpretty.GET,
-                               DISCOURSE_POST_URL_2,
+                               DISCOURSE_TOPIC_POSTS_URL_1148,
                                responses=[
                                    httpretty.Response(body=request_callback)
                                ])
@@ -495,7 +514,7 @@ class TestDiscourseBackendArchive(TestCaseBackendArchive):
                          read_file('data/discourse/discourse_topics_empty.json')]
         body_topic_1148 = read_file('data/discourse/discourse_topic_1148.json')
         body_topic_1149 = read_file('data/discourse/discourse_topic_1149.json')
-        body_post = read_file('data/discourse/discourse_post.json')
+        body_posts = read_file('data/discourse/discourse_topic_posts_1148.json')
 
         def request_callback(method, uri, headers):
             if uri.startswith(DISCOURSE_TOPICS_URL):
@@ -504,9 +523,8 @@ class TestDiscourseBackendArchive(TestCaseBackendArchive):
                 body = body_topic_1148
             elif uri.startswith(DISCOURSE_TOPIC_URL_1149):
                 body = body_topic_1149
-            elif uri.startswith(DISCOURSE_POST_URL_1) or \
-                    uri.startswith(DISCOURSE_POST_URL_2):
-                body = body_post
+            elif uri.startswith(DISCOURSE_TOPIC_POSTS_URL_1148):
+                body = body_posts
             else:
                 raise
 
@@ -531,12 +549,7 @@ class TestDiscourseBackendArchive(TestCaseBackendArchive):
                                    httpretty.Response(body=request_callback)
                                ])
         httpretty.register_uri(httpretty.GET,
-                               DISCOURSE_POST_URL_1,
-                               responses=[
-                                   httpretty.Response(body=request_callback)
-                               ])
-        httpretty.register_uri(httpretty.GET,
-                               DISCOURSE_POST_URL_2,
+                               DISCOURSE_TOPIC_POSTS_URL_1148,
                                responses=[
                                    httpretty.Response(body=request_callback)
                                ])
@@ -565,7 +578,7 @@ class TestDiscourseBackendArchive(TestCaseBackendArchive):
         body_topic_1148 = read_file('data/discourse/discourse_topic_1148.json')
         body_topic_1149 = read_file('data/discourse/discourse_topic_1149.json')
         body_topic_1150 = read_file('data/discourse/discourse_topic_1150.json')
-        body_post = read_file('data/discourse/discourse_post.json')
+        body_posts = read_file('data/discourse/discourse_topic_posts_1148.json')
 
         def request_callback(method, uri, headers):
             if uri.startswith(DISCOURSE_TOPICS_URL):
@@ -576,9 +589,8 @@ class TestDiscourseBackendArchive(TestCaseBackendArchive):
                 body = body_topic_1149
             elif uri.startswith(DISCOURSE_TOPIC_URL_1150):
                 body = body_topic_1150
-            elif uri.startswith(DISCOURSE_POST_URL_1) or \
-                    uri.startswith(DISCOURSE_POST_URL_2):
-                body = body_post
+            elif uri.startswith(DISCOURSE_TOPIC_POSTS_URL_1148):
+                body = body_posts
             else:
                 raise
             return (200, headers, body)
@@ -605,12 +617,7 @@ class TestDiscourseBackendArchive(TestCaseBackendArchive):
                                    httpretty.Response(body=request_callback)
                                ])
         httpretty.register_uri(httpretty.GET,
-                               DISCOURSE_POST_URL_1,
-                               responses=[
-                                   httpretty.Response(body=request_callback)
-                               ])
-        httpretty.register_uri(httpretty.GET,
-                               DISCOURSE_POST_URL_2,
+                               DISCOURSE_TOPIC_POSTS_URL_1148,
                                responses=[
                                    httpretty.Response(body=request_callback)
                                ])
@@ -768,6 +775,34 @@ class TestDiscourseClient(unittest.TestCase):
         self.assertRegex(req.path, '/posts/21.json')
         self.assertDictEqual(req.querystring, expected)
 
+    @httpretty.activate
+    def test_topic_posts(self):
+        """Test topic posts API call"""
+
+        # Set up a mock HTTP server
+        body = read_file('data/discourse/discourse_topic_posts_1148.json')
+        httpretty.register_uri(httpretty.GET,
+                               DISCOURSE_TOPIC_POSTS_URL_1148,
+                               body=body, status=200)
+
+        # Call API
+        client = DiscourseClient(DISCOURSE_SERVER_URL, api_key='aaaa')
+        response = client.topic_posts(1148, [21, 22])
+
+        self.assertEqual(response, body)
+
+        # Check request params
+        expected = {
+            'api_key': ['aaaa'],
+            'post_ids[]': ['21', '22']
+        }
+
+        req = httpretty.last_request()
+
+        self.assertEqual(req.method, 'GET')
+        self.assertRegex(req.path, '/t/1148/posts.json')
+        self.assertDictEqual(req.querystring, expected)
+
     def test_sanitize_for_archive_no_api_key(self):
         """Test whether the sanitize method works properly when the api_key does not exist"""
 
@@ -816,6 +851,12 @@ class TestDiscourseCommand(unittest.TestCase):
         self.assertEqual(parsed_args.tag, 'test')
         self.assertEqual(parsed_args.no_archive, True)
         self.assertEqual(parsed_args.from_date, DEFAULT_DATETIME)
+        self.assertEqual(parsed_args.max_workers, 1)
+
+        args = ['--max-workers', '4', DISCOURSE_SERVER_URL]
+
+        parsed_args = parser.parse(*args)
+        self.assertEqual(parsed_args.max_workers, 4)
 
 
 if __name__ == "__main__":
@@ -126,5 +126,14 @@ class TestParseError(unittest.TestCase):
         self.assertEqual('error on line 10', str(e))
 
 
+class TestStateStoreError(unittest.TestCase):
+
+    def test_message(self):
+        """Make sure that prints the correct error"""
+
+        e = errors.StateStoreError(cause='state store not found')
+        self.assertEqual('state store not found', str(e))
+
+
 if __name__ == "__main__":
     unittest.main()
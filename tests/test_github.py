@@ -22,7 +22,10 @@
 #
 
 import datetime
+import json
 import os
+import shutil
+import tempfile
 import time
 import unittest
 
@@ -792,6 +795,81 @@ class TestGitHubBackend(unittest.TestCase):
         self.assertEqual(issue['data']['reactions']['total_count'], 0)
         self.assertEqual(issue['data']['reactions_data'], [])
 
+    @httpretty.activate
+    def test_fetch_issues_incremental(self):
+        """Test whether unchanged comments and reactions are taken from the state store"""
+
+        body = read_file('data/github/github_request')
+        login = read_file('data/github/github_login')
+        orgs = read_file('data/github/github_orgs')
+        comments = read_file('data/github/github_issue_comments_1')
+        reactions = read_file('data/github/github_issue_comment_1_reactions')
+        rate_limit = read_file('data/github/rate_limit')
+
+        headers = {
+            'X-RateLimit-Remaining': '20',
+            'X-RateLimit-Reset': '15'
+        }
+
+        httpretty.register_uri(httpretty.GET,
+                               GITHUB_RATE_LIMIT,
+                               body=rate_limit, status=200,
+                               forcing_headers=headers)
+        httpretty.register_uri(httpretty.GET,
+                               GITHUB_ISSUES_URL,
+                               body=body, status=200,
+                               forcing_headers=headers)
+        httpretty.register_uri(httpretty.GET,
+                               GITHUB_ISSUE_1_COMMENTS_URL,
+                               body=comments, status=200,
+                               forcing_headers=headers)
+        httpretty.register_uri(httpretty.GET,
+                               GITHUB_ISSUE_COMMENT_1_REACTION_URL,
+                               body=reactions, status=200,
+                               forcing_headers=headers)
+        httpretty.register_uri(httpretty.GET,
+                               GITHUB_USER_URL,
+                               body=login, status=200,
+                               forcing_headers=headers)
+        httpretty.register_uri(httpretty.GET,
+                               GITHUB_ORGS_URL,
+                               body=orgs, status=200,
+                               forcing_headers=headers)
+
+        test_path = tempfile.mkdtemp(prefix='perceval_')
+        self.addCleanup(shutil.rmtree, test_path)
+        state_path = os.path.join(test_path, 'state')
+
+        def reaction_requests():
+            return [req for req in httpretty.HTTPretty.latest_requests
+                    if req.path.startswith('/repos/zhquan_example/repo/issues/comments/1/reactions')]
+
+        github = GitHub("zhquan_example", "repo", "aaa", state_path=state_path)
+        issues = [issue for issue in github.fetch()]
+        self.assertEqual(len(issues), 1)
+        self.assertEqual(len(reaction_requests()), 1)
+
+        # Nothing changed, so reactions are not requested again
+        github = GitHub("zhquan_example", "repo", "aaa", state_path=state_path)
+        new_issues = [issue for issue in github.fetch()]
+        self.assertEqual(len(new_issues), 1)
+        self.assertEqual(len(reaction_requests()), 1)
+        self.assertEqual(new_issues[0]['data'], issues[0]['data'])
+
+        # A new reaction was added to the comment
+        new_comments = json.loads(comments)
+        new_comments[0]['reactions']['total_count'] = 3
+        httpretty.register_uri(httpretty.GET,
+                               GITHUB_ISSUE_1_COMMENTS_URL,
+                               body=json.dumps(new_comments), status=200,
+                               forcing_headers=headers)
+
+        github = GitHub("zhquan_example", "repo", "aaa", state_path=state_path)
+        new_issues = [issue for issue in github.fetch()]
+        self.assertEqual(len(new_issues), 1)
+        self.assertEqual(len(reaction_requests()), 2)
+        self.assertEqual(new_issues[0]['data']['comments_data'][0]['reactions']['total_count'], 3)
+
     @httpretty.activate
     def test_fetch_issue_enterprise(self):
         """Test if it fetches issues from a GitHub Enterprise server"""
@@ -1294,6 +1372,61 @@ class TestGitHubBackendArchive(TestCaseBackendArchive):
 
         self._test_fetch_from_archive(from_date=None)
 
+    @httpretty.activate
+    def test_fetch_issues_from_archive_with_state(self):
+        """Test whether the state store is not used when items are archived"""
+
+        body = read_file('data/github/github_request')
+        login = read_file('data/github/github_login')
+        orgs = read_file('data/github/github_orgs')
+        comments = read_file('data/github/github_issue_comments_1')
+        reactions = read_file('data/github/github_issue_comment_1_reactions')
+        rate_limit = read_file('data/github/rate_limit')
+
+        headers = {
+            'X-RateLimit-Remaining': '20',
+            'X-RateLimit-Reset': '15'
+        }
+
+        httpretty.register_uri(httpretty.GET,
+                               GITHUB_RATE_LIMIT,
+                               body=rate_limit, status=200,
+                               forcing_headers=headers)
+        httpretty.register_uri(httpretty.GET,
+                               GITHUB_ISSUES_URL,
+                               body=body, status=200,
+                               forcing_headers=headers)
+        httpretty.register_uri(httpretty.GET,
+                               GITHUB_ISSUE_1_COMMENTS_URL,
+                               body=comments, status=200,
+                               forcing_headers=headers)
+        httpretty.register_uri(httpretty.GET,
+                               GITHUB_ISSUE_COMMENT_1_REACTION_URL,
+                               body=reactions, status=200,
+                               forcing_headers=headers)
+        httpretty.register_uri(httpretty.GET,
+                               GITHUB_USER_URL,
+                               body=login, status=200,
+                               forcing_headers=headers)
+        httpretty.register_uri(httpretty.GET,
+                               GITHUB_ORGS_URL,
+                               body=orgs, status=200,
+                               forcing_headers=headers)
+
+        state_path = os.path.join(self.test_path, 'state')
+
+        # Fill the state store with the issues
+        github = GitHub("zhquan_example", "repo", "aaa", state_path=state_path)
+        _ = [issue for issue in github.fetch()]
+
+        # Every request is archived, so the archive can be replayed
+        self.backend_write_archive = GitHub("zhquan_example", "repo", "aaa",
+                                            archive=self.archive, state_path=state_path)
+        self.backend_read_archive = GitHub("zhquan_example", "repo", "aaa",
+                                           archive=self.archive, state_path=state_path)
+
+        self._test_fetch_from_archive(from_date=None)
+
     @httpretty.activate
     def test_fetch_pulls_from_archive(self):
         """Test whether a list of pull requests is returned from archive"""
@@ -2323,6 +2456,7 @@ class TestGitHubCommand(unittest.TestCase):
                 '--api-token', 'abcdefgh',
                 '--from-date', '1970-01-01',
                 '--enterprise-url', 'https://example.com',
+                '--state-path', '/tmp/state',
                 'zhquan_example', 'repo']
 
         parsed_args = parser.parse(*args)
@@ -2336,6 +2470,7 @@ class TestGitHubCommand(unittest.TestCase):
         self.assertEqual(parsed_args.from_date, DEFAULT_DATETIME)
         self.assertEqual(parsed_args.no_archive, True)
         self.assertEqual(parsed_args.api_token, 'abcdefgh')
+        self.assertEqual(parsed_args.state_path, '/tmp/state')
 
 
 if __name__ == "__main__":
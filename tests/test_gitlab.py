@@ -40,13 +40,16 @@ from perceval.errors import RateLimitError
 from perceval.utils import DEFAULT_DATETIME
 from perceval.backends.core.gitlab import (GitLab,
                                            GitLabCommand,
-                                           GitLabClient)
+                                           GitLabClient,
+                                           CATEGORY_ISSUE,
+                                           CATEGORY_MERGE_REQUEST)
 from base import TestCaseBackendArchive
 
 GITLAB_URL = "https://gitlab.com"
 GITLAB_API_URL = GITLAB_URL + "/api/v4"
 GITLAB_URL_PROJECT = GITLAB_API_URL + "/projects/fdroid%2Ffdroiddata"
 GITLAB_ISSUES_URL = GITLAB_API_URL + "/projects/fdroid%2Ffdroiddata/issues"
+GITLAB_MERGES_URL = GITLAB_API_URL + "/projects/fdroid%2Ffdroiddata/merge_requests"
 
 GITLAB_ENTERPRISE_URL = "https://gitlab.ow2.org"
 GITLAB_ENTERPRISE_API_URL = GITLAB_ENTERPRISE_URL + "/api/v4"
@@ -172,6 +175,68 @@ def setup_http_server(url_project, issues_url, rate_limit_headers=None):
                            forcing_headers=rate_limit_headers)
 
 
+def setup_merges_http_server(url_project, merges_url):
+    project = read_file('data/gitlab/project')
+    page_1 = read_file('data/gitlab/merge_page_1')
+    emoji = read_file('data/gitlab/emoji')
+    empty_emoji = read_file('data/gitlab/empty_emoji')
+
+    httpretty.register_uri(httpretty.GET,
+                           url_project,
+                           body=project,
+                           status=200)
+    httpretty.register_uri(httpretty.GET,
+                           merges_url,
+                           body=page_1,
+                           status=200)
+
+    for merge_id in [1, 2]:
+        httpretty.register_uri(httpretty.GET,
+                               merges_url + "/%s/notes" % merge_id,
+                               body=read_file('data/gitlab/merge_%s_notes' % merge_id),
+                               status=200)
+        httpretty.register_uri(httpretty.GET,
+                               merges_url + "/%s/versions" % merge_id,
+                               body=read_file('data/gitlab/merge_%s_versions' % merge_id),
+                               status=200)
+        httpretty.register_uri(httpretty.GET,
+                               merges_url + "/%s/award_emoji" % merge_id,
+                               body=emoji if merge_id == 1 else empty_emoji,
+                               status=200)
+        httpretty.register_uri(httpretty.GET,
+                               merges_url + "/%s/notes/1/award_emoji" % merge_id,
+                               body=emoji,
+                               status=200)
+
+    httpretty.register_uri(httpretty.GET,
+                           merges_url + "/1/notes/2/award_emoji",
+                           body=empty_emoji,
+                           status=200)
+
+
+def setup_keyset_http_server(url_project, issues_url, issues):
+    """Mock a server that filters issues by their update date"""
+
+    def request_callback(request, uri, headers):
+        updated_after = request.querystring.get('updated_after', [''])[0]
+        updated_after = updated_after.replace('+00:00', '.000Z')
+        page = int(request.querystring.get('page', ['1'])[0])
+        per_page = int(request.querystring['per_page'][0])
+
+        selected = [issue for issue in issues if issue['updated_at'] >= updated_after]
+        selected = selected[(page - 1) * per_page:page * per_page]
+
+        return (200, headers, json.dumps(selected))
+
+    httpretty.register_uri(httpretty.GET,
+                           url_project,
+                           body=read_file('data/gitlab/project'),
+                           status=200)
+    httpretty.register_uri(httpretty.GET,
+                           issues_url,
+                           body=request_callback)
+
+
 def read_file(filename, mode='r'):
     with open(os.path.join(
             os.path.dirname(os.path.abspath(__file__)), filename), mode) as f:
@@ -196,6 +261,7 @@ class TestGitLabBackend(unittest.TestCase):
         self.assertEqual(gitlab.origin, GITLAB_URL + '/fdroid/fdroiddata')
         self.assertEqual(gitlab.tag, 'test')
         self.assertIsNone(gitlab.client)
+        self.assertListEqual(gitlab.categories, [CATEGORY_ISSUE, CATEGORY_MERGE_REQUEST])
 
         # When tag is empty or None it will be set to
         # the value in origin
@@ -312,6 +378,86 @@ class TestGitLabBackend(unittest.TestCase):
 
         self.assertEqual(len(issues), 0)
 
+    @httpretty.activate
+    def test_fetch_merges(self):
+        """Test whether merge requests are properly fetched from GitLab"""
+
+        setup_merges_http_server(GITLAB_URL_PROJECT, GITLAB_MERGES_URL)
+
+        gitlab = GitLab("fdroid", "fdroiddata", "your-token")
+
+        merges = [merges for merges in gitlab.fetch(category=CATEGORY_MERGE_REQUEST)]
+
+        self.assertEqual(len(merges), 2)
+
+        merge = merges[0]
+        self.assertEqual(merge['origin'], GITLAB_URL + '/fdroid/fdroiddata')
+        self.assertEqual(merge['uuid'], 'e08bc7e7d875d9da3fb51c7f7a701f0bfb74fc91')
+        self.assertEqual(merge['updated_on'], 1489752000.0)
+        self.assertEqual(merge['category'], CATEGORY_MERGE_REQUEST)
+        self.assertEqual(merge['tag'], GITLAB_URL + '/fdroid/fdroiddata')
+        self.assertEqual(merge['data']['iid'], 1)
+        self.assertEqual(len(merge['data']['notes_data']), 2)
+        self.assertEqual(len(merge['data']['notes_data'][0]['award_emoji_data']), 2)
+        self.assertEqual(len(merge['data']['notes_data'][1]['award_emoji_data']), 0)
+        self.assertEqual(len(merge['data']['award_emoji_data']), 2)
+        self.assertEqual(len(merge['data']['versions_data']), 2)
+        self.assertEqual(merge['data']['versions_data'][0]['id'], 2)
+
+        merge = merges[1]
+        self.assertEqual(merge['updated_on'], 1489911300.0)
+        self.assertEqual(merge['category'], CATEGORY_MERGE_REQUEST)
+        self.assertEqual(merge['data']['iid'], 2)
+        self.assertEqual(len(merge['data']['notes_data']), 1)
+        self.assertEqual(len(merge['data']['award_emoji_data']), 0)
+        self.assertEqual(len(merge['data']['versions_data']), 1)
+
+        # Merge requests fetched concurrently are the same
+        gitlab = GitLab("fdroid", "fdroiddata", "your-token", max_workers=2)
+        concurrent_merges = [merges for merges in gitlab.fetch(category=CATEGORY_MERGE_REQUEST)]
+
+        for merge, concurrent_merge in zip(merges, concurrent_merges):
+            self.assertDictEqual(merge['data'], concurrent_merge['data'])
+
+    @httpretty.activate
+    def test_fetch_merges_from_date(self):
+        """Test whether the date filter for merge requests is sent to the server"""
+
+        setup_merges_http_server(GITLAB_URL_PROJECT, GITLAB_MERGES_URL)
+
+        gitlab = GitLab("fdroid", "fdroiddata", "your-token")
+        from_date = datetime.datetime(2017, 3, 18)
+        merges = [merges for merges in gitlab.fetch(category=CATEGORY_MERGE_REQUEST,
+                                                    from_date=from_date)]
+
+        self.assertEqual(len(merges), 2)
+
+        requests = [req for req in httpretty.HTTPretty.latest_requests
+                    if req.path.startswith('/api/v4/projects/fdroid%2Ffdroiddata/merge_requests?')]
+        self.assertEqual(len(requests), 1)
+
+        self.assertListEqual(sorted(requests[0].querystring.keys()),
+                             ['order_by', 'sort', 'state', 'updated_after'])
+        self.assertIn('updated_after=2017-03-18T00%3A00%3A00%2B00%3A00', requests[0].path)
+
+    @httpretty.activate
+    def test_fetch_concurrent(self):
+        """Test whether issues fetched concurrently are returned in order"""
+
+        setup_http_server(GITLAB_URL_PROJECT, GITLAB_ISSUES_URL)
+
+        gitlab = GitLab("fdroid", "fdroiddata", "your-token")
+        issues = [issue for issue in gitlab.fetch()]
+
+        gitlab = GitLab("fdroid", "fdroiddata", "your-token", max_workers=4)
+        concurrent_issues = [issue for issue in gitlab.fetch()]
+
+        self.assertEqual(len(concurrent_issues), 4)
+
+        for issue, concurrent_issue in zip(issues, concurrent_issues):
+            self.assertEqual(issue['uuid'], concurrent_issue['uuid'])
+            self.assertDictEqual(issue['data'], concurrent_issue['data'])
+
 
 class TestGitHUbBackendArchive(TestCaseBackendArchive):
     """GitHub backend tests using an archive"""
@@ -328,6 +474,22 @@ class TestGitHUbBackendArchive(TestCaseBackendArchive):
         setup_http_server(GITLAB_URL_PROJECT, GITLAB_ISSUES_URL)
         self._test_fetch_from_archive(from_date=None)
 
+    @httpretty.activate
+    def test_fetch_merges_from_archive(self):
+        """Test whether merge requests are properly fetched from the archive"""
+
+        setup_merges_http_server(GITLAB_URL_PROJECT, GITLAB_MERGES_URL)
+        self._test_fetch_from_archive(category=CATEGORY_MERGE_REQUEST, from_date=None)
+
+    @httpretty.activate
+    def test_fetch_concurrent_from_archive(self):
+        """Test whether issues fetched concurrently are properly fetched from the archive"""
+
+        setup_http_server(GITLAB_URL_PROJECT, GITLAB_ISSUES_URL)
+        self.backend_write_archive.max_workers = 4
+        self.backend_read_archive.max_workers = 4
+        self._test_fetch_from_archive(from_date=None)
+
     @httpretty.activate
     def test_fetch_from_date(self):
         """Test whether issues from a given date are properly fetched from GitLab"""
@@ -475,6 +637,59 @@ class TestGitLabClient(unittest.TestCase):
         self.assertDictEqual(httpretty.last_request().querystring, expected)
         self.assertEqual(httpretty.last_request().headers["PRIVATE-TOKEN"], "your-token")
 
+    @httpretty.activate
+    def test_issues_keyset(self):
+        """Test issues API call using keyset pagination"""
+
+        dt = datetime.datetime(2017, 1, 1)
+        issues = [{'id': i, 'iid': i,
+                   'updated_at': (dt + datetime.timedelta(hours=i // 3)).strftime('%Y-%m-%dT%H:%M:%S.000Z')}
+                  for i in range(250)]
+        setup_keyset_http_server(GITLAB_URL_PROJECT, GITLAB_ISSUES_URL, issues)
+
+        client = GitLabClient("fdroid", "fdroiddata", "your-token", keyset_pagination=True)
+
+        raw_issues = [issues for issues in client.issues()]
+        fetched = [issue for raw in raw_issues for issue in json.loads(raw)]
+
+        self.assertEqual(len(raw_issues), 3)
+        self.assertListEqual([issue['id'] for issue in fetched], list(range(250)))
+
+        # Check requests
+        expected = {
+            'state': ['all'],
+            'sort': ['asc'],
+            'order_by': ['updated_at'],
+            'per_page': ['100'],
+            'updated_after': ['2017-01-03T18:00:00.000Z']
+        }
+
+        self.assertDictEqual(httpretty.last_request().querystring, expected)
+
+        # Issues updated after the given date
+        from_date = datetime.datetime(2017, 1, 3)
+        raw_issues = [issues for issues in client.issues(from_date=from_date)]
+        fetched = [issue for raw in raw_issues for issue in json.loads(raw)]
+
+        self.assertListEqual([issue['id'] for issue in fetched], list(range(144, 250)))
+
+    @httpretty.activate
+    def test_issues_keyset_same_date(self):
+        """Test keyset pagination when a whole page shares the same update date"""
+
+        issues = [{'id': i, 'iid': i, 'updated_at': '2017-01-01T00:00:00.000Z'}
+                  for i in range(150)]
+        issues += [{'id': i, 'iid': i, 'updated_at': '2017-01-02T00:00:00.000Z'}
+                   for i in range(150, 160)]
+        setup_keyset_http_server(GITLAB_URL_PROJECT, GITLAB_ISSUES_URL, issues)
+
+        client = GitLabClient("fdroid", "fdroiddata", "your-token", keyset_pagination=True)
+
+        raw_issues = [issues for issues in client.issues()]
+        fetched = [issue for raw in raw_issues for issue in json.loads(raw)]
+
+        self.assertListEqual([issue['id'] for issue in fetched], list(range(160)))
+
     @httpretty.activate
     def test_issues_empty(self):
         """Test when issue is empty API call"""
@@ -651,6 +866,8 @@ class TestGitLabCommand(unittest.TestCase):
                 '--api-token', 'abcdefgh',
                 '--from-date', '1970-01-01',
                 '--enterprise-url', 'https://example.com',
+                '--max-workers', '4',
+                '--keyset-pagination',
                 'zhquan_example', 'repo']
 
         parsed_args = parser.parse(*args)
@@ -663,6 +880,8 @@ class TestGitLabCommand(unittest.TestCase):
         self.assertEqual(parsed_args.from_date, DEFAULT_DATETIME)
         self.assertEqual(parsed_args.no_archive, True)
         self.assertEqual(parsed_args.api_token, 'abcdefgh')
+        self.assertEqual(parsed_args.max_workers, 4)
+        self.assertEqual(parsed_args.keyset_pagination, True)
 
 
 if __name__ == "__main__":
@@ -21,6 +21,7 @@
 #
 
 import datetime
+import hashlib
 import os
 import shutil
 import tempfile
@@ -34,6 +35,7 @@ import pkg_resources
 pkg_resources.declare_namespace('perceval.backends')
 
 from perceval.backend import BackendCommandArgumentParser
+from perceval.state import StateStore
 from perceval.utils import DEFAULT_DATETIME
 from perceval.backends.core.mbox import MailingList
 from perceval.backends.core.hyperkitty import (HyperKitty,
@@ -70,6 +72,8 @@ class TestHyperKittyList(unittest.TestCase):
         self.assertEqual(hkls.uri, HYPERKITTY_URL)
         self.assertEqual(hkls.dirpath, self.tmp_path)
         self.assertEqual(hkls.client.base_url, HYPERKITTY_URL)
+        self.assertIsNone(hkls.state)
+        self.assertEqual(hkls.download_workers, 1)
 
     @httpretty.activate
     @unittest.mock.patch('perceval.backends.core.hyperkitty.datetime_utcnow')
@@ -109,6 +113,90 @@ class TestHyperKittyList(unittest.TestCase):
         self.assertEqual(mboxes[0].filepath, os.path.join(self.tmp_path, '2016-03.mbox.gz'))
         self.assertEqual(mboxes[1].filepath, os.path.join(self.tmp_path, '2016-04.mbox.gz'))
 
+    @httpretty.activate
+    @unittest.mock.patch('perceval.backends.core.hyperkitty.datetime_utcnow')
+    def test_fetch_completed_months(self, mock_utcnow):
+        """Test whether archives of completed months are not downloaded again"""
+
+        mock_utcnow.return_value = datetime.datetime(2016, 4, 10,
+                                                     tzinfo=dateutil.tz.tzutc())
+
+        mbox_march = read_file('data/hyperkitty/hyperkitty_2016_march.mbox', 'rb')
+        mbox_april = read_file('data/hyperkitty/hyperkitty_2016_april.mbox', 'rb')
+
+        httpretty.register_uri(httpretty.GET,
+                               HYPERKITTY_URL,
+                               body="")
+        httpretty.register_uri(httpretty.GET,
+                               HYPERKITTY_URL + 'export/2016-02.mbox.gz',
+                               body="")
+        httpretty.register_uri(httpretty.GET,
+                               HYPERKITTY_URL + 'export/2016-03.mbox.gz',
+                               body=mbox_march)
+        httpretty.register_uri(httpretty.GET,
+                               HYPERKITTY_URL + 'export/2016-04.mbox.gz',
+                               body=mbox_april)
+
+        def exported_months():
+            paths = [req.path for req in httpretty.latest_requests() if '/export/' in req.path]
+            return sorted(path.split('/export/')[1][:7] for path in paths)
+
+        from_date = datetime.datetime(2016, 2, 10)
+        state = StateStore(os.path.join(self.tmp_path, 'state'))
+        dirpath = os.path.join(self.tmp_path, 'mboxes')
+
+        hkls = HyperKittyList(HYPERKITTY_URL, dirpath, state=state, download_workers=3)
+        fetched = hkls.fetch(from_date=from_date)
+
+        self.assertEqual(len(fetched), 3)
+        self.assertListEqual(exported_months(), ['2016-02', '2016-03', '2016-04'])
+        self.assertListEqual(state.keys('hyperkitty:' + HYPERKITTY_URL),
+                             ['2016-02.mbox.gz', '2016-03.mbox.gz'])
+
+        # Only the open month is downloaded again and the
+        # archives of completed months are not hashed
+        httpretty.latest_requests().clear()
+
+        with unittest.mock.patch('perceval.backends.core.hyperkitty.hashlib.sha1',
+                                 wraps=hashlib.sha1) as mock_sha1:
+            fetched = hkls.fetch(from_date=from_date)
+            self.assertEqual(mock_sha1.call_count, 1)
+
+        self.assertEqual(len(fetched), 3)
+        self.assertListEqual(exported_months(), ['2016-04'])
+
+        # Archives with a new modification time are hashed
+        # but, when they did not change, not downloaded
+        filepath = os.path.join(dirpath, '2016-03.mbox.gz')
+        stat = os.stat(filepath)
+        os.utime(filepath, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+        httpretty.latest_requests().clear()
+
+        with unittest.mock.patch('perceval.backends.core.hyperkitty.hashlib.sha1',
+                                 wraps=hashlib.sha1) as mock_sha1:
+            fetched = hkls.fetch(from_date=from_date)
+            self.assertEqual(mock_sha1.call_count, 2)
+
+        self.assertEqual(len(fetched), 3)
+        self.assertListEqual(exported_months(), ['2016-04'])
+
+        entry = state.get('hyperkitty:' + HYPERKITTY_URL, '2016-03.mbox.gz')
+        self.assertEqual(entry['mtime'], os.stat(filepath).st_mtime_ns)
+
+        # Archives that do not match the manifest are downloaded again
+        with open(os.path.join(dirpath, '2016-03.mbox.gz'), 'ab') as fd:
+            fd.write(b'garbage')
+
+        httpretty.latest_requests().clear()
+        fetched = hkls.fetch(from_date=from_date)
+
+        self.assertEqual(len(fetched), 3)
+        self.assertListEqual(exported_months(), ['2016-03', '2016-04'])
+        self.assertEqual(read_file(os.path.join(dirpath, '2016-03.mbox.gz'), 'rb'), mbox_march)
+        self.assertListEqual(sorted(os.listdir(dirpath)),
+                             ['2016-02.mbox.gz', '2016-03.mbox.gz', '2016-04.mbox.gz'])
+
     @httpretty.activate
     @unittest.mock.patch('perceval.backends.core.hyperkitty.datetime_utcnow')
     def test_fetch_from_date_after_current_day(self, mock_utcnow):
@@ -165,6 +253,9 @@ class TestHyperKittyBackend(unittest.TestCase):
         self.assertEqual(backend.dirpath, self.tmp_path)
         self.assertEqual(backend.origin, 'http://example.com/')
         self.assertEqual(backend.tag, 'test')
+        self.assertIsNone(backend.state_path)
+        self.assertEqual(backend.max_workers, 1)
+        self.assertEqual(backend.download_workers, 1)
 
         # When tag is empty or None it will be set to
         # the value in uri
@@ -317,6 +408,17 @@ class TestHyperKittyCommand(unittest.TestCase):
         self.assertEqual(parsed_args.mboxes_path, '/tmp/perceval/')
         self.assertEqual(parsed_args.tag, 'test')
         self.assertEqual(parsed_args.from_date, DEFAULT_DATETIME)
+        self.assertIsNone(parsed_args.state_path)
+        self.assertEqual(parsed_args.max_workers, 1)
+        self.assertEqual(parsed_args.download_workers, 1)
+
+        args = ['http://example.com/archives/list/test@example.com/',
+                '--max-workers', '2',
+                '--download-workers', '4']
+
+        parsed_args = parser.parse(*args)
+        self.assertEqual(parsed_args.max_workers, 2)
+        self.assertEqual(parsed_args.download_workers, 4)
 
 
 if __name__ == "__main__":
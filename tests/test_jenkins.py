@@ -25,8 +25,11 @@
 import json
 import os
 import requests
+import shutil
+import tempfile
 import time
 import unittest
+import urllib.parse
 
 import httpretty
 import pkg_resources
@@ -172,6 +175,8 @@ class TestJenkinsBackend(unittest.TestCase):
         self.assertEqual(jenkins.sleep_time, 60)
         self.assertEqual(jenkins.detail_depth, 2)
         self.assertEqual(jenkins.tag, 'test')
+        self.assertEqual(jenkins.max_workers, 1)
+        self.assertIsNone(jenkins.state_path)
         self.assertIsNone(jenkins.client)
 
         # When tag is empty or None it will be set to
@@ -188,6 +193,10 @@ class TestJenkinsBackend(unittest.TestCase):
         self.assertEqual(jenkins.origin, JENKINS_SERVER_URL)
         self.assertEqual(jenkins.tag, JENKINS_SERVER_URL)
 
+        jenkins = Jenkins(JENKINS_SERVER_URL, max_workers=4, state_path='/tmp/state')
+        self.assertEqual(jenkins.max_workers, 4)
+        self.assertEqual(jenkins.state_path, '/tmp/state')
+
     def test_has_archiving(self):
         """Test if it returns True when has_archiving is called"""
 
@@ -324,6 +333,169 @@ class TestJenkinsBackend(unittest.TestCase):
         # Builds just from JENKINS_JOB_BUILDS_2
         self.assertEqual(len(builds), 32)
 
+    @httpretty.activate
+    def test_fetch_concurrent(self):
+        """Test whether jobs fetched concurrently return the same builds"""
+
+        configure_http_server()
+
+        jenkins = Jenkins(JENKINS_SERVER_URL)
+        expected = [build['uuid'] for build in jenkins.fetch()]
+
+        jenkins = Jenkins(JENKINS_SERVER_URL, max_workers=4)
+        builds = [build['uuid'] for build in jenkins.fetch()]
+
+        self.assertEqual(len(builds), 64)
+        self.assertListEqual(builds, expected)
+
+    @httpretty.activate
+    def test_fetch_incremental(self):
+        """Test whether only new builds are requested using the state store"""
+
+        bodies_jobs = read_file('data/jenkins/jenkins_jobs.json', mode='rb')
+        bodies_builds_job = read_file('data/jenkins/jenkins_job_builds.json')
+        bodies_builds_new = read_file('data/jenkins/jenkins_job_builds_new.json')
+        http_requests = []
+
+        def request_callback(method, uri, headers):
+            params = urllib.parse.parse_qs(urllib.parse.urlparse(uri).query)
+            http_requests.append((urllib.parse.urlparse(uri).path, params))
+
+            if uri.startswith(JENKINS_JOBS_URL):
+                body = bodies_jobs
+            elif JENKINS_JOB_BUILDS_500_ERROR in uri:
+                return (500, headers, '500 Internal Server Error')
+            elif JENKINS_JOB_BUILDS_JSON_ERROR in uri:
+                body = '{'
+            elif 'tree' in params:
+                body = bodies_builds_new
+            else:
+                body = bodies_builds_job
+
+            return (200, headers, body)
+
+        for job in ['', JENKINS_JOB_BUILDS_1, JENKINS_JOB_BUILDS_2,
+                    JENKINS_JOB_BUILDS_500_ERROR, JENKINS_JOB_BUILDS_JSON_ERROR]:
+            path = '/job/' + job if job else ''
+            httpretty.register_uri(httpretty.GET,
+                                   JENKINS_SERVER_URL + path + '/api/json',
+                                   body=request_callback)
+
+        test_path = tempfile.mkdtemp(prefix='perceval_')
+        state_path = os.path.join(test_path, 'state')
+
+        jenkins = Jenkins(JENKINS_SERVER_URL, state_path=state_path)
+        builds = [build for build in jenkins.fetch()]
+        self.assertEqual(len(builds), 64)
+
+        # Only builds newer than the last ones seen are returned
+        http_requests.clear()
+
+        jenkins = Jenkins(JENKINS_SERVER_URL, state_path=state_path)
+        builds = [build for build in jenkins.fetch()]
+
+        expected = [
+            ('https://build.opnfv.org/ci/job/apex-deploy-virtual-os-onos-nofeature-ha-master/109/', 1458960478.582),
+            ('https://build.opnfv.org/ci/job/apex-deploy-virtual-os-onos-nofeature-ha-master/108/', 1458917278.582),
+            ('https://build.opnfv.org/ci/job/apex-deploy-virtual-os-onos-nofeature-ha-master/109/', 1458960478.582),
+            ('https://build.opnfv.org/ci/job/apex-deploy-virtual-os-onos-nofeature-ha-master/108/', 1458917278.582)
+        ]
+
+        self.assertEqual(len(builds), len(expected))
+
+        for x in range(len(expected)):
+            self.assertEqual(builds[x]['data']['url'], expected[x][0])
+            self.assertEqual(builds[x]['updated_on'], expected[x][1])
+
+        expected = [
+            ('/ci/api/json', {}),
+            ('/ci/job/apex-build-brahmaputra/api/json', {'tree': ['builds[*[*]]{0,100}']}),
+            ('/ci/job/apex-build-master/api/json', {'tree': ['builds[*[*]]{0,100}']}),
+            ('/ci/job/500-error-job/api/json', {'depth': ['1']}),
+            ('/ci/job/invalid-json-job/api/json', {'depth': ['1']})
+        ]
+
+        self.assertListEqual(http_requests, expected)
+
+        # The last build seen was updated, so no builds are returned
+        jenkins = Jenkins(JENKINS_SERVER_URL, state_path=state_path)
+        builds = [build for build in jenkins.fetch()]
+        self.assertListEqual(builds, [])
+
+        shutil.rmtree(test_path)
+
+    @httpretty.activate
+    def test_fetch_incremental_running_builds(self):
+        """Test whether builds running on a fetch are requested again on the next one"""
+
+        bodies_jobs = read_file('data/jenkins/jenkins_jobs.json', mode='rb')
+        bodies_builds_new = read_file('data/jenkins/jenkins_job_builds_new.json')
+
+        # Build 107 is still running on the first fetch
+        builds_running = json.loads(read_file('data/jenkins/jenkins_job_builds.json'))
+        builds_running['builds'][0]['building'] = True
+        builds_running['builds'][0]['result'] = None
+        bodies_builds_running = json.dumps(builds_running)
+
+        def request_callback(method, uri, headers):
+            params = urllib.parse.parse_qs(urllib.parse.urlparse(uri).query)
+
+            if uri.startswith(JENKINS_JOBS_URL):
+                body = bodies_jobs
+            elif JENKINS_JOB_BUILDS_500_ERROR in uri:
+                return (500, headers, '500 Internal Server Error')
+            elif JENKINS_JOB_BUILDS_JSON_ERROR in uri:
+                body = '{'
+            elif 'tree' in params:
+                body = bodies_builds_new
+            else:
+                body = bodies_builds_running
+
+            return (200, headers, body)
+
+        for job in ['', JENKINS_JOB_BUILDS_1, JENKINS_JOB_BUILDS_2,
+                    JENKINS_JOB_BUILDS_500_ERROR, JENKINS_JOB_BUILDS_JSON_ERROR]:
+            path = '/job/' + job if job else ''
+            httpretty.register_uri(httpretty.GET,
+                                   JENKINS_SERVER_URL + path + '/api/json',
+                                   body=request_callback)
+
+        test_path = tempfile.mkdtemp(prefix='perceval_')
+        state_path = os.path.join(test_path, 'state')
+
+        jenkins = Jenkins(JENKINS_SERVER_URL, state_path=state_path)
+        builds = [build for build in jenkins.fetch()]
+        self.assertEqual(len(builds), 64)
+        self.assertTrue(builds[0]['data']['building'])
+        self.assertIsNone(builds[0]['data']['result'])
+
+        # Build 107 finished, so it is returned again with its result
+        jenkins = Jenkins(JENKINS_SERVER_URL, state_path=state_path)
+        builds = [build for build in jenkins.fetch()]
+
+        expected = [
+            ('https://build.opnfv.org/ci/job/apex-deploy-virtual-os-onos-nofeature-ha-master/109/', 'SUCCESS'),
+            ('https://build.opnfv.org/ci/job/apex-deploy-virtual-os-onos-nofeature-ha-master/108/', 'SUCCESS'),
+            ('https://build.opnfv.org/ci/job/apex-deploy-virtual-os-onos-nofeature-ha-master/107/', 'SUCCESS'),
+            ('https://build.opnfv.org/ci/job/apex-deploy-virtual-os-onos-nofeature-ha-master/109/', 'SUCCESS'),
+            ('https://build.opnfv.org/ci/job/apex-deploy-virtual-os-onos-nofeature-ha-master/108/', 'SUCCESS'),
+            ('https://build.opnfv.org/ci/job/apex-deploy-virtual-os-onos-nofeature-ha-master/107/', 'SUCCESS')
+        ]
+
+        self.assertEqual(len(builds), len(expected))
+
+        for x in range(len(expected)):
+            self.assertEqual(builds[x]['data']['url'], expected[x][0])
+            self.assertEqual(builds[x]['data']['result'], expected[x][1])
+            self.assertFalse(builds[x]['data']['building'])
+
+        # All the builds finished, so no builds are returned
+        jenkins = Jenkins(JENKINS_SERVER_URL, state_path=state_path)
+        builds = [build for build in jenkins.fetch()]
+        self.assertListEqual(builds, [])
+
+        shutil.rmtree(test_path)
+
 
 class TestJenkinsBackendArchive(TestCaseBackendArchive):
     """Jenkins backend tests using an archive"""
@@ -340,6 +512,52 @@ class TestJenkinsBackendArchive(TestCaseBackendArchive):
         configure_http_server()
         self._test_fetch_from_archive()
 
+    @httpretty.activate
+    def test_fetch_incremental_from_archive(self):
+        """Test whether builds fetched using the state store are returned from an archive"""
+
+        bodies_jobs = read_file('data/jenkins/jenkins_jobs.json', mode='rb')
+        bodies_builds_job = read_file('data/jenkins/jenkins_job_builds.json')
+        bodies_builds_new = read_file('data/jenkins/jenkins_job_builds_new.json')
+
+        def request_callback(method, uri, headers):
+            params = urllib.parse.parse_qs(urllib.parse.urlparse(uri).query)
+
+            if uri.startswith(JENKINS_JOBS_URL):
+                body = bodies_jobs
+            elif JENKINS_JOB_BUILDS_500_ERROR in uri:
+                return (500, headers, '500 Internal Server Error')
+            elif JENKINS_JOB_BUILDS_JSON_ERROR in uri:
+                body = '{'
+            elif 'tree' in params:
+                body = bodies_builds_new
+            else:
+                body = bodies_builds_job
+
+            return (200, headers, body)
+
+        for job in ['', JENKINS_JOB_BUILDS_1, JENKINS_JOB_BUILDS_2,
+                    JENKINS_JOB_BUILDS_500_ERROR, JENKINS_JOB_BUILDS_JSON_ERROR]:
+            path = '/job/' + job if job else ''
+            httpretty.register_uri(httpretty.GET,
+                                   JENKINS_SERVER_URL + path + '/api/json',
+                                   body=request_callback)
+
+        state_path = os.path.join(self.test_path, 'state')
+
+        jenkins = Jenkins(JENKINS_SERVER_URL, state_path=state_path)
+        _ = [build for build in jenkins.fetch()]
+
+        self.backend_write_archive = Jenkins(JENKINS_SERVER_URL, archive=self.archive,
+                                             state_path=state_path)
+        self.backend_read_archive = Jenkins(JENKINS_SERVER_URL, archive=self.archive,
+                                            state_path=state_path)
+        self._test_fetch_from_archive()
+
+        # The numbers used to fetch the builds are stored with the archive
+        self.assertDictEqual(self.archive.backend_params['last_builds'],
+                             {JENKINS_JOB_BUILDS_1: 107, JENKINS_JOB_BUILDS_2: 107})
+
     @httpretty.activate
     def test_fetch_empty_from_archive(self):
         """Test whether it works when no jobs are fetched from archive"""
@@ -387,6 +605,15 @@ class TestJenkinsCommand(unittest.TestCase):
         self.assertEqual(parsed_args.sleep_time, 60)
         self.assertEqual(parsed_args.no_archive, True)
         self.assertListEqual(parsed_args.blacklist_jobs, ['1', '2', '3', '4'])
+        self.assertEqual(parsed_args.max_workers, 1)
+        self.assertIsNone(parsed_args.state_path)
+
+        args = ['--max-workers', '4', '--state-path', '/tmp/state',
+                JENKINS_SERVER_URL]
+
+        parsed_args = parser.parse(*args)
+        self.assertEqual(parsed_args.max_workers, 4)
+        self.assertEqual(parsed_args.state_path, '/tmp/state')
 
 
 class TestJenkinsClient(unittest.TestCase):
@@ -458,6 +685,26 @@ class TestJenkinsClient(unittest.TestCase):
 
         self.assertEqual(response, body)
 
+    @httpretty.activate
+    def test_get_builds_range(self):
+        """Test get_builds API call requesting a range of builds"""
+
+        # Set up a mock HTTP server
+        body = read_file('data/jenkins/jenkins_job_builds_new.json')
+        httpretty.register_uri(httpretty.GET,
+                               JENKINS_JOB_BUILDS_URL_1_DEPTH_1,
+                               body=body, status=200)
+
+        client = JenkinsClient(JENKINS_SERVER_URL, detail_depth=2)
+        response = client.get_builds(JENKINS_JOB_BUILDS_1, offset=100, max_builds=50)
+
+        self.assertEqual(response, body)
+
+        expected = {
+            'tree': ['builds[*[*[*]]]{100,150}']
+        }
+        self.assertDictEqual(httpretty.last_request().querystring, expected)
+
     @httpretty.activate
     def test_connection_error(self):
         """Test that HTTP connection error is correctly handled"""
@@ -25,6 +25,7 @@
 import json
 import os
 import unittest
+import urllib.parse
 
 import httpretty
 import pkg_resources
@@ -141,8 +142,16 @@ class TestJiraBackend(unittest.TestCase):
         self.assertEqual(jira.origin, JIRA_SERVER_URL)
         self.assertEqual(jira.tag, 'test')
         self.assertEqual(jira.max_issues, 5)
+        self.assertEqual(jira.max_workers, 1)
+        self.assertIsNone(jira.fields)
+        self.assertIsNone(jira.expand)
         self.assertIsNone(jira.client)
 
+        # 'updated' field is always requested
+        jira = Jira(JIRA_SERVER_URL, fields=['summary'], expand=[])
+        self.assertListEqual(jira.fields, ['summary', 'updated'])
+        self.assertListEqual(jira.expand, [])
+
         # When tag is empty or None it will be set to
         # the value in url
         jira = Jira(JIRA_SERVER_URL)
@@ -343,6 +352,76 @@ class TestJiraBackend(unittest.TestCase):
         self.assertRegex(request.path, '/rest/api/2/search')
         self.assertDictEqual(request.querystring, expected_req)
 
+    @httpretty.activate
+    def test_fetch_concurrent(self):
+        """Test whether pages fetched concurrently are returned in order"""
+
+        bodies_json = {
+            '0': read_file('data/jira/jira_issues_page_1.json'),
+            '2': read_file('data/jira/jira_issues_page_2.json')
+        }
+
+        body = read_file('data/jira/jira_fields.json')
+
+        def request_callback(method, uri, headers):
+            params = urllib.parse.parse_qs(urllib.parse.urlparse(uri).query)
+            return (200, headers, bodies_json[params['startAt'][0]])
+
+        httpretty.register_uri(httpretty.GET,
+                               JIRA_SEARCH_URL,
+                               body=request_callback)
+
+        httpretty.register_uri(httpretty.GET,
+                               JIRA_FIELDS_URL,
+                               body=body, status=200)
+
+        jira = Jira(JIRA_SERVER_URL)
+        expected = [issue for issue in jira.fetch()]
+
+        jira = Jira(JIRA_SERVER_URL, max_workers=4)
+        issues = [issue for issue in jira.fetch()]
+
+        self.assertEqual(len(issues), 3)
+
+        for x in range(len(issues)):
+            self.assertEqual(issues[x]['uuid'], expected[x]['uuid'])
+            self.assertDictEqual(issues[x]['data'], expected[x]['data'])
+
+    @httpretty.activate
+    def test_fetch_fields_expand(self):
+        """Test whether the fields and the expanded entities can be restricted"""
+
+        bodies_json = read_file('data/jira/jira_issues_page_2.json')
+
+        body = read_file('data/jira/jira_fields.json')
+
+        httpretty.register_uri(httpretty.GET,
+                               JIRA_SEARCH_URL,
+                               body=bodies_json, status=200)
+
+        httpretty.register_uri(httpretty.GET,
+                               JIRA_FIELDS_URL,
+                               body=body, status=200)
+
+        jira = Jira(JIRA_SERVER_URL, fields=['summary', 'customfield_10301'],
+                    expand=['changelog'])
+
+        issues = [issue for issue in jira.fetch()]
+
+        expected_req = {
+            'expand': ['changelog'],
+            'fields': ['summary,customfield_10301,updated'],
+            'jql': ['updated > 0 order by updated asc'],
+            'startAt': ['0'],
+            'maxResults': ['100']
+        }
+
+        self.assertEqual(len(issues), 1)
+        self.assertEqual(issues[0]['updated_on'], 1457006245)
+
+        request = httpretty.last_request()
+        self.assertDictEqual(request.querystring, expected_req)
+
     @httpretty.activate
     def test_fetch_empty(self):
         """Test whether it works when no issues are fetched"""
@@ -505,6 +584,9 @@ class TestJiraClient(unittest.TestCase):
         self.assertEqual(client.verify, False)
         self.assertEqual(client.cert, None)
         self.assertEqual(client.max_issues, 100)
+        self.assertEqual(client.max_workers, 1)
+        self.assertIsNone(client.fields)
+        self.assertIsNone(client.expand)
 
     @httpretty.activate
     def test_get_issues(self):
@@ -564,6 +646,50 @@ class TestJiraClient(unittest.TestCase):
         self.assertEqual(pages[0], bodies_json[0])
         self.assertEqual(pages[1], bodies_json[1])
 
+    @httpretty.activate
+    def test_get_issues_concurrent(self):
+        """Test whether the pages after the first one are fetched concurrently"""
+
+        from_date = str_to_datetime('2015-01-01')
+
+        requests = []
+
+        def request_callback(method, uri, headers):
+            params = urllib.parse.parse_qs(urllib.parse.urlparse(uri).query)
+            start_at = int(params['startAt'][0])
+            requests.append(params)
+
+            body = {
+                'startAt': start_at,
+                'maxResults': 2,
+                'total': 7,
+                'issues': [{'id': str(i)} for i in range(start_at, min(start_at + 2, 7))]
+            }
+            return (200, headers, json.dumps(body))
+
+        httpretty.register_uri(httpretty.GET,
+                               JIRA_SEARCH_URL,
+                               body=request_callback)
+
+        client = JiraClient(url='http://example.com', project=None,
+                            user=None, password=None,
+                            verify=True, cert=None, max_issues=2,
+                            max_workers=3, expand=[])
+
+        pages = [json.loads(page) for page in client.get_issues(from_date)]
+
+        self.assertListEqual([page['startAt'] for page in pages], [0, 2, 4, 6])
+
+        issues = [issue['id'] for page in pages for issue in page['issues']]
+        self.assertListEqual(issues, [str(i) for i in range(7)])
+
+        self.assertEqual(len(requests), 4)
+        self.assertListEqual(sorted(int(r['startAt'][0]) for r in requests), [0, 2, 4, 6])
+
+        # Nothing is expanded
+        for r in requests:
+            self.assertNotIn('expand', r)
+
     @httpretty.activate
     def test_get_fields(self):
         """Test get fields API call"""
@@ -653,6 +779,29 @@ class TestJiraCommand(unittest.TestCase):
         self.assertEqual(parsed_args.no_archive, True)
         self.assertEqual(parsed_args.from_date, DEFAULT_DATETIME)
         self.assertEqual(parsed_args.url, JIRA_SERVER_URL)
+        self.assertEqual(parsed_args.max_workers, 1)
+        self.assertIsNone(parsed_args.fields)
+        self.assertIsNone(parsed_args.expand)
+
+        args = [JIRA_SERVER_URL,
+                '--max-workers', '4',
+                '--fields', 'summary,status',
+                '--expand', '']
+
+        parsed_args = parser.parse(*args)
+        self.assertEqual(parsed_args.max_workers, 4)
+        self.assertListEqual(parsed_args.fields, ['summary', 'status'])
+        self.assertListEqual(parsed_args.expand, [])
+
+        # The url is not taken as a value of the lists
+        args = ['--fields', 'summary,status',
+                '--expand', 'changelog',
+                JIRA_SERVER_URL]
+
+        parsed_args = parser.parse(*args)
+        self.assertEqual(parsed_args.url, JIRA_SERVER_URL)
+        self.assertListEqual(parsed_args.fields, ['summary', 'status'])
+        self.assertListEqual(parsed_args.expand, ['changelog'])
 
 
 if __name__ == '__main__':
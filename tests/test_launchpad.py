@@ -27,7 +27,9 @@ import json
 import os
 import pkg_resources
 import requests
+import time
 import unittest
+import urllib.parse
 
 pkg_resources.declare_namespace('perceval.backends')
 
@@ -64,6 +66,8 @@ class TestLaunchpadBackend(unittest.TestCase):
         self.assertEqual(launchpad.package, None)
         self.assertEqual(launchpad.origin, 'https://launchpad.net/mydistribution')
         self.assertEqual(launchpad.tag, 'test')
+        self.assertEqual(launchpad.max_workers, 1)
+        self.assertIsNone(launchpad.max_rate)
         self.assertIsNone(launchpad.client)
 
         launchpad = Launchpad('mydistribution', tag='test', package="mypackage")
@@ -250,6 +254,63 @@ class TestLaunchpadBackend(unittest.TestCase):
         self.assertListEqual(issues[2]['data']['messages_data'], issue_3_expected['messages_data'])
         self.assertDictEqual(issues[2]['data'], issue_3_expected)
 
+    @httpretty.activate
+    def test_fetch_concurrent(self):
+        """Test whether issues fetched concurrently are returned in order"""
+
+        bodies = {
+            '/1.0/bugs/1': read_file('data/launchpad/launchpad_issue_1'),
+            '/1.0/bugs/2': read_file('data/launchpad/launchpad_issue_2'),
+            '/1.0/bugs/3': read_file('data/launchpad/launchpad_issue_3'),
+            '/1.0/bugs/1/messages': read_file('data/launchpad/launchpad_issue_1_comments'),
+            '/1.0/bugs/2/messages': read_file('data/launchpad/launchpad_issue_2_comments'),
+            '/1.0/bugs/3/messages': read_file('data/launchpad/launchpad_empty_issue_comments'),
+            '/1.0/bugs/1/attachments': read_file('data/launchpad/launchpad_issue_1_attachments'),
+            '/1.0/bugs/2/attachments': read_file('data/launchpad/launchpad_empty_issue_attachments'),
+            '/1.0/bugs/3/attachments': read_file('data/launchpad/launchpad_empty_issue_attachments'),
+            '/1.0/bugs/1/activity': read_file('data/launchpad/launchpad_issue_1_activities'),
+            '/1.0/bugs/2/activity': read_file('data/launchpad/launchpad_issue_2_activities'),
+            '/1.0/bugs/3/activity': read_file('data/launchpad/launchpad_empty_issue_activities'),
+            '/1.0/~user': read_file('data/launchpad/launchpad_user_1')
+        }
+        issues_pages = {
+            None: read_file('data/launchpad/launchpad_issues_page_1'),
+            '1': read_file('data/launchpad/launchpad_issues_page_2'),
+            '2': read_file('data/launchpad/launchpad_issues_page_3')
+        }
+
+        def request_callback(method, uri, headers):
+            url = urllib.parse.urlparse(uri)
+
+            if url.path in bodies:
+                body = bodies[url.path]
+            else:
+                params = urllib.parse.parse_qs(url.query)
+                body = issues_pages[params.get('ws.start', [None])[0]]
+
+            return (200, headers, body)
+
+        for path in [LAUNCHPAD_PACKAGE_PROJECT_URL] + [LAUNCHPAD_API_URL + p[4:] for p in bodies]:
+            httpretty.register_uri(httpretty.GET, path,
+                                   body=request_callback)
+
+        launchpad = Launchpad('mydistribution', package="mypackage",
+                              items_per_page=2)
+        expected = [issue for issue in launchpad.fetch()]
+
+        launchpad = Launchpad('mydistribution', package="mypackage",
+                              items_per_page=2, max_workers=4)
+        issues = [issue for issue in launchpad.fetch()]
+
+        self.assertEqual(len(issues), 3)
+
+        for x in range(len(issues)):
+            self.assertEqual(issues[x]['uuid'], expected[x]['uuid'])
+            self.assertDictEqual(issues[x]['data'], expected[x]['data'])
+
+        issue_1_expected = json.loads(read_file('data/launchpad/launchpad_issue_1_expected'))
+        self.assertDictEqual(issues[0]['data'], issue_1_expected)
+
     @httpretty.activate
     def test_fetch_from_date(self):
         """Test when return from date"""
@@ -603,6 +664,30 @@ class TestLaunchpadBackendArchive(TestCaseBackendArchive):
 
         self._test_fetch_from_archive()
 
+    @httpretty.activate
+    def test_fetch_page_size_from_archive(self):
+        """Test whether the page size used to fetch the issues is read from the archive"""
+
+        empty_issues = read_file('data/launchpad/launchpad_empty_issues')
+        httpretty.register_uri(httpretty.GET,
+                               LAUNCHPAD_PACKAGE_PROJECT_URL +
+                               "?modified_since=1970-01-01T00%3A00%3A00%2B00%3A00&ws.op=searchTasks"
+                               "&omit_duplicates=false&order_by=date_last_updated&status=Confirmed&status=Expired"
+                               "&status=Fix+Committed&status=Fix+Released"
+                               "&status=In+Progress&status=Incomplete&status=Incomplete+%28with+response%29"
+                               "&status=Incomplete+%28without+response%29"
+                               "&status=Invalid&status=New&status=Opinion&status=Triaged"
+                               "&status=Won%27t+Fix"
+                               "&ws.size=1&ws.start=0",
+                               body=empty_issues,
+                               status=200)
+
+        self.backend_read_archive = Launchpad('mydistribution', package="mypackage",
+                                              archive=self.archive)
+
+        self._test_fetch_from_archive()
+        self.assertEqual(self.archive.backend_params['items_per_page'], 2)
+
     @httpretty.activate
     def test_fetch_empty_no_package_from_archive(self):
         """Test when no issues are returned from an empty archive"""
@@ -802,6 +887,26 @@ class TestLaunchpadClient(unittest.TestCase):
         user_retrieved = client.user("user-not")
         self.assertEqual(user_retrieved, "{}")
 
+    @httpretty.activate
+    def test_max_rate(self):
+        """Test whether the requests are throttled to the maximum rate"""
+
+        httpretty.register_uri(httpretty.GET,
+                               LAUNCHPAD_API_URL + "/bugs/1",
+                               body=read_file('data/launchpad/launchpad_issue_1'),
+                               status=200)
+
+        client = LaunchpadClient("mydistribution", package="mypackage", max_rate=20)
+        self.assertEqual(client.max_rate, 20)
+
+        before = time.time()
+        for _ in range(5):
+            client.issue(1)
+        after = time.time()
+
+        # The first request is sent right away
+        self.assertGreaterEqual(after - before, 4 / 20)
+
     @httpretty.activate
     def test_http_wrong_status_issue_collection(self):
         """Test if an empty collection is returned when the http status is not 200"""
@@ -856,6 +961,15 @@ class TestLaunchpadCommand(unittest.TestCase):
         self.assertEqual(parsed_args.no_archive, True)
         self.assertEqual(parsed_args.items_per_page, '75')
         self.assertEqual(parsed_args.sleep_time, '600')
+        self.assertEqual(parsed_args.max_workers, 1)
+        self.assertIsNone(parsed_args.max_rate)
+
+        args = ['--max-workers', '4', '--max-rate', '2.5',
+                'mydistribution']
+
+        parsed_args = parser.parse(*args)
+        self.assertEqual(parsed_args.max_workers, 4)
+        self.assertEqual(parsed_args.max_rate, 2.5)
 
 
 if __name__ == "__main__":
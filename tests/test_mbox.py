@@ -34,7 +34,8 @@ import unittest.mock
 pkg_resources.declare_namespace('perceval.backends')
 
 from perceval.backend import BackendCommandArgumentParser
-from perceval.utils import DEFAULT_DATETIME
+from perceval.state import StateStore
+from perceval.utils import DEFAULT_DATETIME, message_to_dict
 from perceval.backends.core.mbox import (MBox,
                                          MBoxCommand,
                                          MBoxArchive,
@@ -187,6 +188,8 @@ class TestMBoxBackend(TestBaseMBox):
         self.assertEqual(backend.dirpath, self.tmp_path)
         self.assertEqual(backend.origin, 'http://example.com/')
         self.assertEqual(backend.tag, 'test')
+        self.assertIsNone(backend.state_path)
+        self.assertEqual(backend.max_workers, 1)
 
         # When origin is empty or None it will be set to
         # the value in uri
@@ -238,6 +241,22 @@ class TestMBoxBackend(TestBaseMBox):
             self.assertEqual(message['category'], 'message')
             self.assertEqual(message['tag'], 'http://example.com/')
 
+    def test_fetch_parallel(self):
+        """Test whether mboxes parsed in parallel return the same messages"""
+
+        backend = MBox('http://example.com/', self.tmp_path)
+        expected = [(m['uuid'], m['updated_on']) for m in backend.fetch(from_date=None)]
+
+        # Split plain files in several ranges of bytes
+        backend = MBox('http://example.com/', self.tmp_path, max_workers=2)
+        backend.PARSING_CHUNK_SIZE = 512
+
+        with self.assertLogs('perceval.backends.core.mbox', level='INFO') as cm:
+            messages = [(m['uuid'], m['updated_on']) for m in backend.fetch(from_date=None)]
+
+        self.assertListEqual(messages, expected)
+        self.assertTrue(any('parsed' in line for line in cm.output))
+
     def test_fetch_from_date(self):
         """Test whether a list of messages is returned since a given date"""
 
@@ -267,6 +286,20 @@ class TestMBoxBackend(TestBaseMBox):
             self.assertEqual(message['category'], 'message')
             self.assertEqual(message['tag'], 'http://example.com/')
 
+    def test_fetch_from_date_not_parsed(self):
+        """Test whether messages sent before the given date are not fully parsed"""
+
+        from_date = datetime.datetime(2008, 1, 1)
+
+        backend = MBox('http://example.com/', self.tmp_path)
+
+        with unittest.mock.patch('perceval.backends.core.mbox.message_to_dict',
+                                 wraps=message_to_dict) as mock_to_dict:
+            messages = [m for m in backend.fetch(from_date=from_date)]
+
+        self.assertEqual(len(messages), 7)
+        self.assertEqual(mock_to_dict.call_count, 7)
+
     def test_ignore_messages(self):
         """Test if it ignores some messages without mandatory fields"""
 
@@ -302,33 +335,29 @@ class TestMBoxBackend(TestBaseMBox):
 
         tmp_path_ign = tempfile.mkdtemp(prefix='perceval_')
 
-        def copy_mbox_side_effect(*args, **kwargs):
-            """Copy a mbox archive or raise IO error for 'mbox_multipart.mbox' archive"""
+        read_mbox = MBox._read_mbox
+
+        def read_mbox_side_effect(backend, mbox, offset=0, from_date=DEFAULT_DATETIME):
+            """Read a mbox archive or raise IO error for 'mbox_multipart.mbox' archive"""
 
             error_file = os.path.join(tmp_path_ign, 'mbox_multipart.mbox')
-            mbox = args[0]
 
             if mbox.filepath == error_file:
                 raise OSError('Mock error')
 
-            tmp_path = tempfile.mktemp(prefix='perceval_')
-
-            with mbox.container as f_in:
-                with open(tmp_path, mode='wb') as f_out:
-                    for l in f_in:
-                        f_out.write(l)
-            return tmp_path
+            yield from read_mbox(backend, mbox, offset, from_date)
 
         shutil.copy(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data/mbox/mbox_single.mbox'),
                     tmp_path_ign)
         shutil.copy(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data/mbox/mbox_multipart.mbox'),
                     tmp_path_ign)
 
-        # Mock 'copy_mbox' method for forcing to raise an OSError
+        # Mock '_read_mbox' method for forcing to raise an OSError
         # with file 'data/mbox/mbox_multipart.mbox' to check if
         # the code ignores this file
-        with unittest.mock.patch('perceval.backends.core.mbox.MBox._copy_mbox') as mock_copy_mbox:
-            mock_copy_mbox.side_effect = copy_mbox_side_effect
+        with unittest.mock.patch('perceval.backends.core.mbox.MBox._read_mbox',
+                                 autospec=True) as mock_read_mbox:
+            mock_read_mbox.side_effect = read_mbox_side_effect
 
             backend = MBox('http://example.com/', tmp_path_ign)
             messages = [m for m in backend.fetch()]
@@ -340,6 +369,127 @@ class TestMBoxBackend(TestBaseMBox):
 
         shutil.rmtree(tmp_path_ign)
 
+    def test_fetch_from_index(self):
+        """Test whether the index of the mboxes is used to skip data already parsed"""
+
+        tmp_path_idx = tempfile.mkdtemp(prefix='perceval_')
+        mboxes_path = os.path.join(tmp_path_idx, 'mboxes')
+        state_path = os.path.join(tmp_path_idx, 'state')
+
+        os.makedirs(mboxes_path)
+        shutil.copy(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data/mbox/mbox_single.mbox'),
+                    mboxes_path)
+        shutil.copy(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data/mbox/mbox_complex.mbox'),
+                    mboxes_path)
+
+        from_date = datetime.datetime(2011, 1, 1)
+        read_mbox = MBox._read_mbox
+
+        # First run builds the index of each mbox
+        backend = MBox('http://example.com/', mboxes_path, state_path=state_path)
+        messages = [m for m in backend.fetch(from_date=from_date)]
+        self.assertEqual(len(messages), 0)
+
+        # Unchanged mboxes with old messages are not read again
+        with unittest.mock.patch('perceval.backends.core.mbox.MBox._read_mbox',
+                                 autospec=True) as mock_read_mbox:
+            mock_read_mbox.side_effect = read_mbox
+            backend = MBox('http://example.com/', mboxes_path, state_path=state_path)
+            messages = [m for m in backend.fetch(from_date=from_date)]
+
+            self.assertEqual(len(messages), 0)
+            self.assertEqual(mock_read_mbox.call_count, 0)
+
+        # Only the new messages are parsed when they are appended
+        filepath = os.path.join(mboxes_path, 'mbox_single.mbox')
+        size = os.path.getsize(filepath)
+
+        with open(filepath, 'ab') as fd:
+            fd.write(b"From john  Wed Dec  1 08:26:40 2021\n"
+                     b"Message-ID: <1@example.com>\n"
+                     b"Date: Wed, 01 Dec 2021 14:26:40 +0100\n\n"
+                     b"New message\n")
+
+        with unittest.mock.patch('perceval.backends.core.mbox.MBox._read_mbox',
+                                 autospec=True) as mock_read_mbox:
+            mock_read_mbox.side_effect = read_mbox
+            backend = MBox('http://example.com/', mboxes_path, state_path=state_path)
+            messages = [m for m in backend.fetch(from_date=from_date)]
+
+            self.assertEqual(len(messages), 1)
+            self.assertEqual(messages[0]['data']['Message-ID'], '<1@example.com>')
+            self.assertEqual(mock_read_mbox.call_count, 1)
+            self.assertEqual(mock_read_mbox.call_args[0][2], size)
+
+        # Messages are fetched as usual for older dates
+        backend = MBox('http://example.com/', mboxes_path, state_path=state_path)
+        messages = [m for m in backend.fetch()]
+        self.assertEqual(len(messages), 4)
+
+        expected = [msg for msg in MBox('http://example.com/', mboxes_path).fetch()]
+        self.assertListEqual([m['uuid'] for m in messages],
+                             [m['uuid'] for m in expected])
+
+        shutil.rmtree(tmp_path_idx)
+
+    def test_fetch_from_index_since_date(self):
+        """Test whether reading starts at the first message sent since the given date"""
+
+        tmp_path_idx = tempfile.mkdtemp(prefix='perceval_')
+        mboxes_path = os.path.join(tmp_path_idx, 'mboxes')
+        state_path = os.path.join(tmp_path_idx, 'state')
+
+        os.makedirs(mboxes_path)
+        filepath = os.path.join(mboxes_path, 'mbox_dates.mbox')
+
+        offsets = []
+
+        with open(filepath, 'wb') as fd:
+            for n, date in enumerate(['Wed, 01 Dec 2010 10:00:00 +0000',
+                                      'Thu, 01 Dec 2011 10:00:00 +0000',
+                                      'Sat, 01 Dec 2012 10:00:00 +0000']):
+                offsets.append(fd.tell())
+                fd.write(b"From john  Wed Dec  1 10:00:00 2010\n"
+                         b"Message-ID: <" + str(n).encode() + b"@example.com>\n"
+                         b"Date: " + date.encode() + b"\n\n"
+                         b"Message\n\n")
+
+        read_mbox = MBox._read_mbox
+
+        # First run builds the index of the mbox
+        backend = MBox('http://example.com/', mboxes_path, state_path=state_path)
+        messages = [m for m in backend.fetch()]
+        self.assertEqual(len(messages), 3)
+
+        index = StateStore(state_path).get('mbox:http://example.com/', os.path.abspath(filepath))
+        self.assertDictEqual(index, {'size': os.path.getsize(filepath),
+                                     'mtime': os.stat(filepath).st_mtime_ns,
+                                     'offsets': [[offsets[0], 1291197600.0],
+                                                 [offsets[1], 1322733600.0],
+                                                 [offsets[2], 1354356000.0]],
+                                     'first_date': 1291197600.0,
+                                     'last_date': 1354356000.0})
+
+        # Messages sent before the date of the last one are not parsed
+        from_date = datetime.datetime(2012, 12, 1, 10, 0, 0)
+
+        with unittest.mock.patch('perceval.backends.core.mbox.MBox._read_mbox',
+                                 autospec=True) as mock_read_mbox:
+            mock_read_mbox.side_effect = read_mbox
+            backend = MBox('http://example.com/', mboxes_path, state_path=state_path)
+            messages = [m for m in backend.fetch(from_date=from_date)]
+
+            self.assertEqual(len(messages), 1)
+            self.assertEqual(messages[0]['data']['Message-ID'], '<2@example.com>')
+            self.assertEqual(mock_read_mbox.call_count, 1)
+            self.assertEqual(mock_read_mbox.call_args[0][2], offsets[2])
+
+        # The index keeps every message
+        stored = StateStore(state_path).get('mbox:http://example.com/', os.path.abspath(filepath))
+        self.assertDictEqual(stored, index)
+
+        shutil.rmtree(tmp_path_idx)
+
     def test_parse_mbox(self):
         """Test whether it parses a mbox file"""
 
@@ -365,6 +515,63 @@ class TestMBoxBackend(TestBaseMBox):
 
         self.assertDictEqual(message, expected)
 
+    def test_parse_compressed_mbox(self):
+        """Test whether it parses compressed mbox files"""
+
+        expected = [msg for msg in MBox.parse_mbox(self.files['single'])]
+
+        for ftype in ['gz', 'bz2']:
+            messages = MBox.parse_mbox(self.cfiles[ftype])
+            result = [msg for msg in messages]
+
+            self.assertEqual(len(result), 1)
+            self.assertDictEqual(dict(result[0]), dict(expected[0]))
+
+    def test_parse_mbox_boundaries(self):
+        """Test whether messages are split as mailbox module does"""
+
+        tmp_path = tempfile.mkdtemp(prefix='perceval_')
+
+        data = b"Text before the first message\n" \
+               b"From john  Wed Dec  1 08:26:40 2010\n" \
+               b"Message-ID: <1@example.com>\n\n" \
+               b"First body\n" \
+               b">From is escaped\n\n" \
+               b"From jane  Wed Dec  1 08:26:41 2010\n" \
+               b"Message-ID: <2@example.com>\n\n" \
+               b"Second body\n" \
+               b"From jsmith  Wed Dec  1 08:26:42 2010\n" \
+               b"Message-ID: <3@example.com>\n\n" \
+               b"Third body\n\n\n"
+
+        files = {
+            'plain': (open, os.path.join(tmp_path, 'plain.mbox')),
+            'gz': (gzip.open, os.path.join(tmp_path, 'mbox.gz')),
+            'bz2': (bz2.open, os.path.join(tmp_path, 'mbox.bz2')),
+            'empty': (open, os.path.join(tmp_path, 'empty.mbox'))
+        }
+
+        for ftype, (opener, filepath) in files.items():
+            with opener(filepath, 'wb') as fd:
+                if ftype != 'empty':
+                    fd.write(data)
+
+        messages = [msg for msg in MBox.parse_mbox(files['empty'][1])]
+        self.assertListEqual(messages, [])
+
+        for ftype in ['plain', 'gz', 'bz2']:
+            messages = [msg for msg in MBox.parse_mbox(files[ftype][1])]
+
+            self.assertEqual(len(messages), 3)
+            self.assertEqual(messages[0]['unixfrom'], 'john  Wed Dec  1 08:26:40 2010')
+            self.assertEqual(messages[0]['body']['plain'], 'First body\n>From is escaped\n')
+            self.assertEqual(messages[1]['unixfrom'], 'jane  Wed Dec  1 08:26:41 2010')
+            self.assertEqual(messages[1]['body']['plain'], 'Second body\n')
+            self.assertEqual(messages[2]['unixfrom'], 'jsmith  Wed Dec  1 08:26:42 2010')
+            self.assertEqual(messages[2]['body']['plain'], 'Third body\n\n')
+
+        shutil.rmtree(tmp_path)
+
     def test_parse_complex_mbox(self):
         """Test whether it parses a complex mbox file"""
 
@@ -500,6 +707,16 @@ class TestMBoxCommand(unittest.TestCase):
         self.assertEqual(parsed_args.dirpath, '/tmp/perceval/')
         self.assertEqual(parsed_args.tag, 'test')
         self.assertEqual(parsed_args.from_date, DEFAULT_DATETIME)
+        self.assertIsNone(parsed_args.state_path)
+        self.assertEqual(parsed_args.max_workers, 1)
+
+        args = ['http://example.com/', '/tmp/perceval/',
+                '--state-path', '/tmp/state',
+                '--max-workers', '4']
+
+        parsed_args = parser.parse(*args)
+        self.assertEqual(parsed_args.state_path, '/tmp/state')
+        self.assertEqual(parsed_args.max_workers, 4)
 
 
 if __name__ == "__main__":
@@ -86,6 +86,7 @@ class HTTPServer():
 
         # Pages with revisions
         mediawiki_page_476583 = read_file('data/mediawiki/mediawiki_page_476583_revisions.json')
+        mediawiki_page_476583_next = read_file('data/mediawiki/mediawiki_page_476583_revisions_next.json')
         mediawiki_page_592384 = read_file('data/mediawiki/mediawiki_page_592384_revisions.json')
 
         def request_callback(method, uri, headers):
@@ -103,7 +104,10 @@ class HTTPServer():
                     body = mediawiki_pages_allrevisions
             elif 'titles' in params:
                 if 'VisualEditor' in params['titles'][0]:
-                    body = mediawiki_page_476583
+                    if 'rvcontinue' in params:
+                        body = mediawiki_page_476583_next
+                    else:
+                        body = mediawiki_page_476583
                 elif 'Technical' in params['titles'][0]:
                     body = mediawiki_page_592384
             else:
@@ -131,7 +135,8 @@ class HTTPServer():
 
         if len(pages) > 1:
             testObj.assertEqual(pages[1]['data']['pageid'], 476583)
-            testObj.assertEqual(len(pages[1]['data']['revisions']), 500)
+            testObj.assertEqual(len(pages[1]['data']['revisions']), 502)
+            testObj.assertEqual(pages[1]['data']['revisions'][-1]['revid'], 2061998)
             testObj.assertEqual(pages[1]['origin'], MEDIAWIKI_SERVER_URL)
             testObj.assertEqual(pages[1]['uuid'], 'c627c598b1eb2a0fe8d6aef9af9968ad54038c7b')
             testObj.assertEqual(pages[1]['updated_on'], 1466616473.0)
@@ -145,11 +150,12 @@ class TestMediaWikiBackend(unittest.TestCase):
     def test_initialization(self):
         """Test whether attributes are initializated"""
 
-        mediawiki = MediaWiki(MEDIAWIKI_SERVER_URL, tag='test')
+        mediawiki = MediaWiki(MEDIAWIKI_SERVER_URL, max_workers=4, tag='test')
 
         self.assertEqual(mediawiki.url, MEDIAWIKI_SERVER_URL)
         self.assertEqual(mediawiki.origin, MEDIAWIKI_SERVER_URL)
         self.assertEqual(mediawiki.tag, 'test')
+        self.assertEqual(mediawiki.max_workers, 4)
         self.assertIsNone(mediawiki.client)
 
         # When tag is empty or None it will be set to
@@ -176,7 +182,8 @@ class TestMediaWikiBackend(unittest.TestCase):
 
     @httpretty.activate
     @unittest.mock.patch('perceval.backends.core.mediawiki.datetime_utcnow')
-    def _test_fetch_version(self, version, mock_utcnow, from_date=None, reviews_api=False):
+    def _test_fetch_version(self, version, mock_utcnow, from_date=None, reviews_api=False,
+                            max_workers=1):
         """Test whether the pages with their reviews are returned"""
 
         HTTPServer.routes(version)
@@ -185,7 +192,7 @@ class TestMediaWikiBackend(unittest.TestCase):
                                                      tzinfo=dateutil.tz.tzutc())
 
         # Test fetch pages with their reviews
-        mediawiki = MediaWiki(MEDIAWIKI_SERVER_URL)
+        mediawiki = MediaWiki(MEDIAWIKI_SERVER_URL, max_workers=max_workers)
 
         if from_date:
             # Set flag to ignore MAX_RECENT_DAYS exception
@@ -215,6 +222,9 @@ class TestMediaWikiBackend_1_23(TestMediaWikiBackend):
         self._test_fetch_version("1.23")
         self._test_fetch_version("1.23", reviews_api=True)
 
+    def test_fetch_concurrent(self):
+        self._test_fetch_version("1.23", max_workers=3)
+
     @httpretty.activate
     def test_fetch_from_date(self):
         from_date = dateutil.parser.parse("2016-06-23 15:35")
@@ -239,6 +249,10 @@ class TestMediaWikiBackend_1_28(TestMediaWikiBackend):
         self._test_fetch_version("1.28")
         self._test_fetch_version("1.28", reviews_api=True)
 
+    def test_fetch_concurrent(self):
+        self._test_fetch_version("1.28", max_workers=3)
+        self._test_fetch_version("1.28", reviews_api=True, max_workers=3)
+
     @httpretty.activate
     def test_fetch_from_date(self):
         from_date = dateutil.parser.parse("2016-06-23 15:35")
@@ -425,6 +439,14 @@ class TestMediaWikiClient(unittest.TestCase):
         }
         self.assertDictEqual(req.querystring, expected)
 
+        # Next chunk of revisions
+        body = read_file('data/mediawiki/mediawiki_page_476583_revisions_next.json')
+        response = client.get_revisions('VisualEditor', rvcontinue='20160226140047|2062172')
+        req = HTTPServer.requests_http[-1]
+        self.assertEqual(response, body)
+        expected['rvcontinue'] = ['20160226140047|2062172']
+        self.assertDictEqual(req.querystring, expected)
+
     @httpretty.activate
     def test_get_pages_from_allrevisions(self):
         HTTPServer.routes()
@@ -497,10 +519,12 @@ class TestMediaWikiCommand(unittest.TestCase):
 
         args = ['--tag', 'test',
                 '--no-archive', '--from-date', '1970-01-01',
+                '--max-workers', '4',
                 MEDIAWIKI_SERVER_URL]
 
         parsed_args = parser.parse(*args)
         self.assertEqual(parsed_args.url, MEDIAWIKI_SERVER_URL)
+        self.assertEqual(parsed_args.max_workers, 4)
         self.assertEqual(parsed_args.tag, 'test')
         self.assertEqual(parsed_args.no_archive, True)
         self.assertEqual(parsed_args.from_date, DEFAULT_DATETIME)
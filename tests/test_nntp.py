@@ -22,11 +22,13 @@
 #
 
 import collections
+import datetime
 import nntplib
 import os
 import pkg_resources
 import shutil
 import tempfile
+import threading
 import unittest
 import unittest.mock
 
@@ -100,6 +102,24 @@ class MockNNTPLib:
         pass
 
 
+class MockNNTPLibOverview(MockNNTPLib):
+    """Class for mocking nntplib, including dates on the overview"""
+
+    DATES = {
+        1: 'Tue, 15 Mar 2016 11:05:48 -0000',
+        2: 'Tue, 15 Mar 2016 21:14:56 -0000'
+    }
+
+    def over(self, message_spec):
+        _, response = super().over(message_spec)
+
+        for article_id, over in response:
+            if article_id in self.DATES:
+                over['date'] = self.DATES[article_id]
+
+        return None, response
+
+
 class TestNNTPBackend(unittest.TestCase):
     """NNTP backend tests"""
 
@@ -113,6 +133,9 @@ class TestNNTPBackend(unittest.TestCase):
         self.assertEqual(nntp.group, NNTP_GROUP)
         self.assertEqual(nntp.origin, expected_origin)
         self.assertEqual(nntp.tag, 'test')
+        self.assertEqual(nntp.max_workers, 1)
+        self.assertIsNone(nntp.skip_before)
+        self.assertEqual(nntp.overview_window, 1000)
         self.assertIsNone(nntp.client)
 
         # When tag is empty or None it will be set to
@@ -173,6 +196,73 @@ class TestNNTPBackend(unittest.TestCase):
             self.assertEqual(article['category'], 'article')
             self.assertEqual(article['tag'], expected_origin)
 
+    @unittest.mock.patch('nntplib.NNTP')
+    def test_fetch_concurrent(self, mock_nntp):
+        """Test whether articles fetched in parallel are returned in order"""
+
+        mock_nntp.side_effect = lambda host: MockNNTPLib()
+
+        nntp = NNTP(NNTP_SERVER, NNTP_GROUP, max_workers=3)
+        articles = [article for article in nntp.fetch(offset=None)]
+
+        self.assertListEqual([article['offset'] for article in articles], [1, 2])
+        self.assertListEqual([article['uuid'] for article in articles],
+                             ['d088688545d7c2f3733993e215503b367193a26d',
+                              '8a20c77405349f442dad8e3ee8e60d392cc75ae7'])
+        self.assertLessEqual(mock_nntp.call_count, 3)
+
+    @unittest.mock.patch('nntplib.NNTP')
+    def test_fetch_skip_before(self, mock_nntp):
+        """Test whether articles sent before a date are not downloaded"""
+
+        mock_nntp.return_value = MockNNTPLibOverview()
+
+        skip_before = datetime.datetime(2016, 3, 15, 12, 0, 0)
+
+        nntp = NNTP(NNTP_SERVER, NNTP_GROUP, skip_before=skip_before)
+
+        with unittest.mock.patch.object(MockNNTPLibOverview, 'article',
+                                        autospec=True,
+                                        side_effect=MockNNTPLib.article) as mock_article:
+            articles = [article for article in nntp.fetch(offset=None)]
+
+        self.assertEqual(len(articles), 1)
+        self.assertEqual(articles[0]['offset'], 2)
+
+        # Articles without date on the overview are downloaded
+        requested = [call[0][1] for call in mock_article.call_args_list]
+        self.assertListEqual(requested, [2, 3, 4])
+
+    @unittest.mock.patch('nntplib.NNTP')
+    def test_fetch_overview_windows(self, mock_nntp):
+        """Test whether the overview is requested in windows"""
+
+        mock_nntp.return_value = MockNNTPLib()
+
+        nntp = NNTP(NNTP_SERVER, NNTP_GROUP, overview_window=3)
+
+        with unittest.mock.patch.object(MockNNTPLib, 'over',
+                                        autospec=True,
+                                        side_effect=MockNNTPLib.over) as mock_over:
+            articles = [article for article in nntp.fetch(offset=None)]
+
+        self.assertListEqual([article['offset'] for article in articles], [1, 2])
+
+        requested = [call[0][1] for call in mock_over.call_args_list]
+        self.assertListEqual(requested, [(1, 3), (4, 4)])
+
+        # Articles are returned before the next window is requested
+        nntp = NNTP(NNTP_SERVER, NNTP_GROUP, overview_window=1)
+
+        with unittest.mock.patch.object(MockNNTPLib, 'over',
+                                        autospec=True,
+                                        side_effect=MockNNTPLib.over) as mock_over:
+            articles = nntp.fetch(offset=None)
+            article = next(articles)
+
+            self.assertEqual(article['offset'], 1)
+            self.assertEqual(mock_over.call_count, 1)
+
     @unittest.mock.patch('nntplib.NNTP')
     def test_fetch_from_offset(self, mock_nntp):
         """Test whether it fetches a set of articles from a given offset"""
@@ -274,6 +364,60 @@ class TestNNTPBackendArchive(TestCaseBackendArchive):
         mock_nntp.return_value = MockNNTPLib()
         self._test_fetch_from_archive(offset=3)
 
+    @unittest.mock.patch('nntplib.NNTP')
+    def test_fetch_from_archive_overview_window(self, mock_nntp):
+        """Test whether archives are read using the window they were recorded with"""
+
+        mock_nntp.return_value = MockNNTPLib()
+
+        backend = NNTP(NNTP_SERVER, NNTP_GROUP, archive=self.archive, overview_window=3)
+        items = [item for item in backend.fetch()]
+
+        self.assertDictEqual(self.archive.backend_params,
+                             {'offset': 1, 'overview_window': 3})
+
+        backend = NNTP(NNTP_SERVER, NNTP_GROUP, archive=self.archive, overview_window=1)
+        items_archived = [item for item in backend.fetch_from_archive()]
+
+        self.assertEqual(len(items_archived), 2)
+        self.assertListEqual([item['uuid'] for item in items_archived],
+                             [item['uuid'] for item in items])
+
+    def test_fetch_from_archive_without_windows(self):
+        """Test whether archives recorded with a single overview command are read"""
+
+        # Data stored as it was before windows were used
+        mock = MockNNTPLib()
+
+        self.archive.init_metadata(NNTP_SERVER + '-' + NNTP_GROUP, 'NNTP', '0.5.0',
+                                   'article', {'offset': 1})
+        self.archive.store('group', NNTP_GROUP, None, mock.group(NNTP_GROUP))
+        self.archive.store('over', (1, 4), None, mock.over((1, 4)))
+
+        for article_id in range(1, 5):
+            try:
+                _, info = mock.article(article_id)
+            except nntplib.NNTPTemporaryError as e:
+                data = e
+            else:
+                data = {
+                    'number': info.number,
+                    'message_id': info.message_id,
+                    'lines': info.lines
+                }
+            self.archive.store('article', article_id, None, data)
+
+        backend = NNTP(NNTP_SERVER, NNTP_GROUP, archive=self.archive, overview_window=2)
+        articles = [article for article in backend.fetch_from_archive()]
+
+        self.assertEqual(len(articles), 2)
+        self.assertEqual(articles[0]['offset'], 1)
+        self.assertEqual(articles[0]['data']['message_id'],
+                         '<mailman.350.1458060579.14303.dev-project-link@example.com>')
+        self.assertEqual(articles[1]['offset'], 2)
+        self.assertEqual(articles[1]['data']['message_id'],
+                         '<mailman.361.1458076505.14303.dev-project-link@example.com>')
+
 
 class TestNNTPClient(unittest.TestCase):
     """Tests for NNTPCommand client"""
@@ -374,6 +518,75 @@ class TestNNTPClient(unittest.TestCase):
 
         self.assertEqual(data, archived_data)
 
+    @unittest.mock.patch('nntplib.NNTP')
+    def test_connections_pool(self, mock_nntp):
+        """Test whether new connections are opened and select the group"""
+
+        mock_nntp.side_effect = lambda host: unittest.mock.MagicMock(wraps=MockNNTPLib())
+
+        client = NNTTPClient(NNTP_SERVER, archive=None, from_archive=False, max_connections=2)
+        client.group(NNTP_GROUP)
+
+        with client._connection() as first:
+            with client._connection() as second:
+                self.assertIsNot(first, second)
+
+                # The pool is full, so this call waits for a connection
+                thread = threading.Thread(target=client.article, args=(2,))
+                thread.start()
+
+            thread.join()
+
+        self.assertEqual(mock_nntp.call_count, 2)
+        first.group.assert_called_once_with(NNTP_GROUP)
+        second.group.assert_called_once_with(NNTP_GROUP)
+
+        data = client.article(1)
+        self.assertEqual(data['number'], 1)
+        self.assertEqual(mock_nntp.call_count, 2)
+
+    @unittest.mock.patch('nntplib.NNTP')
+    def test_connections_pool_error(self, mock_nntp):
+        """Test whether connections whose command failed are closed and not reused"""
+
+        mock_nntp.side_effect = lambda host: unittest.mock.MagicMock(wraps=MockNNTPLib())
+
+        client = NNTTPClient(NNTP_SERVER, archive=None, from_archive=False, max_connections=1)
+        client.group(NNTP_GROUP)
+
+        first = client.handler
+
+        with self.assertRaises(nntplib.NNTPTemporaryError):
+            client.article(3)
+
+        first.quit.assert_called_once_with()
+        self.assertNotIn(first, client._handlers)
+
+        data = client.article(1)
+        self.assertEqual(data['number'], 1)
+        self.assertEqual(mock_nntp.call_count, 2)
+
+        second = client._handlers[0]
+        second.group.assert_called_once_with(NNTP_GROUP)
+
+        # Threads waiting for a connection get a new one
+        # when the one in use is closed
+        with self.assertRaises(EOFError):
+            with client._connection() as handler:
+                self.assertIs(handler, second)
+
+                thread = threading.Thread(target=client.article, args=(2,))
+                thread.start()
+
+                raise EOFError
+
+        thread.join()
+
+        second.quit.assert_called_once_with()
+        self.assertEqual(mock_nntp.call_count, 3)
+        self.assertEqual(len(client._handlers), 1)
+        client._handlers[0].article.assert_called_once_with(2)
+
     @unittest.mock.patch('nntplib.NNTP')
     def test_archive_not_provided(self, mock_nntp):
         """Test whether an exception is thrown if the archive is not provided"""
@@ -463,6 +676,20 @@ class TestNNTPCommand(unittest.TestCase):
         self.assertEqual(parsed_args.tag, 'test')
         self.assertEqual(parsed_args.no_archive, True)
         self.assertEqual(parsed_args.offset, 6)
+        self.assertEqual(parsed_args.max_workers, 1)
+        self.assertIsNone(parsed_args.skip_before)
+        self.assertEqual(parsed_args.overview_window, 1000)
+
+        args = ['nntp.example.com',
+                'example.dev.project-link',
+                '--max-workers', '4',
+                '--skip-before', '2016-03-01',
+                '--overview-window', '100']
+
+        parsed_args = parser.parse(*args)
+        self.assertEqual(parsed_args.max_workers, 4)
+        self.assertEqual(parsed_args.skip_before, '2016-03-01')
+        self.assertEqual(parsed_args.overview_window, 100)
 
 
 if __name__ == "__main__":
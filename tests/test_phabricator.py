@@ -27,7 +27,10 @@ import json
 import os
 import pkg_resources
 import requests
+import shutil
+import tempfile
 import unittest
+import unittest.mock
 
 pkg_resources.declare_namespace('perceval.backends')
 
@@ -54,10 +57,8 @@ def read_file(filename, mode='r'):
     return content
 
 
-def setup_http_server():
-    """Setup a mock HTTP server"""
-
-    http_requests = []
+def route_conduit_request(uri, params):
+    """Return the body of the response for a Conduit call"""
 
     error_body = read_file('data/phabricator/phabricator_error.json', 'rb')
     tasks_body = read_file('data/phabricator/phabricator_tasks.json', 'rb')
@@ -90,40 +91,68 @@ def setup_http_server():
         'PHID-PROJ-zi2ndtoy3fh5pnbqzfdo': teamdevel_body
     }
 
-    def request_callback(method, uri, headers):
-        last_request = httpretty.last_request()
-        params = json.loads(last_request.parsed_body['params'][0])
-
-        if uri == PHABRICATOR_TASKS_URL:
-            if params['constraints']['modifiedStart'] == 1467158400:
-                body = tasks_next_body
-            elif params['constraints']['modifiedStart'] == 1483228800:
-                body = tasks_empty_body
-            elif 'after' not in params:
-                body = tasks_body
-            else:
-                body = tasks_next_body
-        elif uri == PHABRICATOR_TRANSACTIONS_URL:
-            if 69 in params['ids']:
-                body = tasks_trans_body
-            else:
-                body = tasks_trans_next_body
-        elif uri == PHABRICATOR_USERS_URL:
-            if len(params['phids']) == 4:
-                body = users_body
-            else:
-                body = phids_users[params['phids'][0]]
-        elif uri == PHABRICATOR_PHIDS_URL:
-            if len(params['phids']) == 2:
-                body = phids_body
-            else:
-                body = phids[params['phids'][0]]
-        elif uri == PHABRICATOR_API_ERROR_URL:
-            body = error_body
+    if uri == PHABRICATOR_TASKS_URL:
+        if params['constraints']['modifiedStart'] == 1467158400:
+            body = tasks_next_body
+        elif params['constraints']['modifiedStart'] == 1483228800:
+            body = tasks_empty_body
+        elif 'after' not in params:
+            body = tasks_body
+        else:
+            body = tasks_next_body
+    elif uri == PHABRICATOR_TRANSACTIONS_URL:
+        if 69 in params['ids']:
+            body = tasks_trans_body
+        else:
+            body = tasks_trans_next_body
+    elif uri == PHABRICATOR_USERS_URL:
+        if all(phid in phids_users for phid in params['phids']):
+            result = []
+            for phid in params['phids']:
+                result += json.loads(phids_users[phid])['result']
+            body = json.dumps({'error_code': None, 'error_info': None,
+                               'result': result}).encode('utf-8')
         else:
-            raise
+            body = users_body
+    elif uri == PHABRICATOR_PHIDS_URL:
+        if all(phid in phids for phid in params['phids']):
+            result = {}
+            for phid in params['phids']:
+                result.update(json.loads(phids[phid])['result'])
+            body = json.dumps({'error_code': None, 'error_info': None,
+                               'result': result}).encode('utf-8')
+        else:
+            body = phids_body
+    elif uri == PHABRICATOR_API_ERROR_URL:
+        body = error_body
+    else:
+        raise
+
+    return body
+
 
-        http_requests.append(last_request)
+def mock_conduit_fetch(self, url, payload=None, method=None, verify=True):
+    """Replace the HTTP calls of the client, which can run in threads"""
+
+    params = json.loads(payload['params'])
+
+    response = requests.Response()
+    response.status_code = 200
+    response._content = route_conduit_request(url, params)
+
+    return response
+
+
+def setup_http_server():
+    """Setup a mock HTTP server"""
+
+    http_requests = []
+
+    def request_callback(request, uri, headers):
+        params = json.loads(request.parsed_body['params'][0])
+        body = route_conduit_request(uri, params)
+
+        http_requests.append(request)
 
         return (200, headers, body)
 
@@ -167,6 +196,8 @@ class TestPhabricatorBackend(unittest.TestCase):
         self.assertEqual(phab.url, PHABRICATOR_URL)
         self.assertEqual(phab.origin, PHABRICATOR_URL)
         self.assertEqual(phab.tag, 'test')
+        self.assertEqual(phab.max_workers, 1)
+        self.assertIsNone(phab.state_path)
         self.assertIsNone(phab.client)
 
         # When tag is empty or None it will be set to
@@ -314,15 +345,8 @@ class TestPhabricatorBackend(unittest.TestCase):
                 'output': ['json'],
                 'params': {
                     '__conduit__': {'token': 'AAAA'},
-                    'phids': ['PHID-USER-2uk52xorcqb6sjvp467y']
-                }
-            },
-            {
-                '__conduit__': ['True'],
-                'output': ['json'],
-                'params': {
-                    '__conduit__': {'token': 'AAAA'},
-                    'phids': ['PHID-PROJ-zi2ndtoy3fh5pnbqzfdo']
+                    'phids': ['PHID-USER-2uk52xorcqb6sjvp467y',
+                              'PHID-USER-mjr7pnwpg6slsnjcqki7']
                 }
             },
             {
@@ -330,7 +354,8 @@ class TestPhabricatorBackend(unittest.TestCase):
                 'output': ['json'],
                 'params': {
                     '__conduit__': {'token': 'AAAA'},
-                    'phids': ['PHID-PROJ-2qnt6thbrd7qnx5bitzy']
+                    'phids': ['PHID-USER-bjxhrstz5fb5gkrojmev',
+                              'PHID-USER-ojtcpympsmwenszuef7p']
                 }
             },
             {
@@ -338,15 +363,8 @@ class TestPhabricatorBackend(unittest.TestCase):
                 'output': ['json'],
                 'params': {
                     '__conduit__': {'token': 'AAAA'},
-                    'phids': ['PHID-USER-bjxhrstz5fb5gkrojmev']
-                }
-            },
-            {
-                '__conduit__': ['True'],
-                'output': ['json'],
-                'params': {
-                    '__conduit__': {'token': 'AAAA'},
-                    'phids': ['PHID-USER-mjr7pnwpg6slsnjcqki7']
+                    'phids': ['PHID-PROJ-2qnt6thbrd7qnx5bitzy',
+                              'PHID-PROJ-zi2ndtoy3fh5pnbqzfdo']
                 }
             },
             {
@@ -376,14 +394,6 @@ class TestPhabricatorBackend(unittest.TestCase):
                     'phids': ['PHID-USER-pr5fcxy4xk5ofqsfqcfc']
                 }
             },
-            {
-                '__conduit__': ['True'],
-                'output': ['json'],
-                'params': {
-                    '__conduit__': {'token': 'AAAA'},
-                    'phids': ['PHID-USER-ojtcpympsmwenszuef7p']
-                }
-            },
             {
                 '__conduit__': ['True'],
                 'output': ['json'],
@@ -458,7 +468,8 @@ class TestPhabricatorBackend(unittest.TestCase):
                 'output': ['json'],
                 'params': {
                     '__conduit__': {'token': 'AAAA'},
-                    'phids': ['PHID-USER-2uk52xorcqb6sjvp467y']
+                    'phids': ['PHID-USER-ojtcpympsmwenszuef7p',
+                              'PHID-USER-pr5fcxy4xk5ofqsfqcfc']
                 }
             },
             {
@@ -466,7 +477,8 @@ class TestPhabricatorBackend(unittest.TestCase):
                 'output': ['json'],
                 'params': {
                     '__conduit__': {'token': 'AAAA'},
-                    'phids': ['PHID-PROJ-zi2ndtoy3fh5pnbqzfdo']
+                    'phids': ['PHID-PROJ-zi2ndtoy3fh5pnbqzfdo',
+                              'PHID-PROJ-2qnt6thbrd7qnx5bitzy']
                 }
             },
             {
@@ -474,7 +486,7 @@ class TestPhabricatorBackend(unittest.TestCase):
                 'output': ['json'],
                 'params': {
                     '__conduit__': {'token': 'AAAA'},
-                    'phids': ['PHID-USER-ojtcpympsmwenszuef7p']
+                    'phids': ['PHID-USER-2uk52xorcqb6sjvp467y']
                 }
             },
             {
@@ -484,22 +496,6 @@ class TestPhabricatorBackend(unittest.TestCase):
                     '__conduit__': {'token': 'AAAA'},
                     'phids': ['PHID-APPS-PhabricatorHeraldApplication']
                 }
-            },
-            {
-                '__conduit__': ['True'],
-                'output': ['json'],
-                'params': {
-                    '__conduit__': {'token': 'AAAA'},
-                    'phids': ['PHID-USER-pr5fcxy4xk5ofqsfqcfc']
-                }
-            },
-            {
-                '__conduit__': ['True'],
-                'output': ['json'],
-                'params': {
-                    "__conduit__": {"token": "AAAA"},
-                    "phids": ["PHID-PROJ-2qnt6thbrd7qnx5bitzy"]
-                }
             }
         ]
 
@@ -510,6 +506,66 @@ class TestPhabricatorBackend(unittest.TestCase):
             rparams['params'] = json.loads(rparams['params'][0])
             self.assertDictEqual(rparams, expected[i])
 
+    @httpretty.activate
+    def test_fetch_concurrent(self):
+        """Test whether tasks fetched concurrently are returned in order"""
+
+        setup_http_server()
+
+        phab = Phabricator(PHABRICATOR_URL, 'AAAA')
+        expected = [task for task in phab.fetch()]
+
+        # HTTPretty is not thread-safe, so the calls
+        # to the server are replaced
+        with unittest.mock.patch.object(ConduitClient, 'fetch', mock_conduit_fetch):
+            phab = Phabricator(PHABRICATOR_URL, 'AAAA', max_workers=4)
+            tasks = [task for task in phab.fetch()]
+
+        self.assertEqual(len(tasks), 4)
+
+        for x in range(len(tasks)):
+            self.assertEqual(tasks[x]['uuid'], expected[x]['uuid'])
+            self.assertDictEqual(tasks[x]['data'], expected[x]['data'])
+
+    @httpretty.activate
+    def test_fetch_phids_from_state(self):
+        """Test whether users and projects are taken from the state store"""
+
+        http_requests = setup_http_server()
+
+        test_path = tempfile.mkdtemp(prefix='perceval_')
+        state_path = os.path.join(test_path, 'state')
+
+        phab = Phabricator(PHABRICATOR_URL, 'AAAA', state_path=state_path)
+        expected = [task for task in phab.fetch()]
+
+        phids = [req for req in http_requests
+                 if req.path in ('/api/user.query', '/api/phid.query')]
+        self.assertEqual(len(phids), 5)
+
+        # Users and projects are not requested again,
+        # except those not found on the server
+        http_requests.clear()
+
+        phab = Phabricator(PHABRICATOR_URL, 'AAAA', state_path=state_path)
+        tasks = [task for task in phab.fetch()]
+
+        self.assertEqual(len(tasks), len(expected))
+
+        for x in range(len(tasks)):
+            self.assertDictEqual(tasks[x]['data'], expected[x]['data'])
+
+        phids = [req for req in http_requests
+                 if req.path in ('/api/user.query', '/api/phid.query')]
+        self.assertEqual(len(phids), 1)
+        self.assertEqual(phids[0].path, '/api/user.query')
+
+        params = json.loads(phids[0].parsed_body['params'][0])
+        self.assertListEqual(params['phids'], ['PHID-USER-bjxhrstz5fb5gkrojmev'])
+        self.assertEqual(len(http_requests), 5)
+
+        shutil.rmtree(test_path)
+
     @httpretty.activate
     def test_fetch_empty(self):
         """Test if nothing is returnerd when there are no tasks"""
@@ -617,6 +673,24 @@ class TestPhabricatorBackendArchive(TestCaseBackendArchive):
         setup_http_server()
         self._test_fetch_from_archive()
 
+    @httpretty.activate
+    def test_fetch_from_archive_with_state(self):
+        """Test whether the state store is not used when tasks are archived"""
+
+        setup_http_server()
+
+        state_path = os.path.join(self.test_path, 'state')
+
+        # Fill the state store with users and projects
+        phab = Phabricator(PHABRICATOR_URL, 'AAAA', state_path=state_path)
+        _ = [task for task in phab.fetch()]
+
+        self.backend_write_archive = Phabricator(PHABRICATOR_URL, 'AAAA', archive=self.archive,
+                                                 state_path=state_path)
+        self.backend_read_archive = Phabricator(PHABRICATOR_URL, 'BBBB', archive=self.archive,
+                                                state_path=state_path)
+        self._test_fetch_from_archive()
+
     @httpretty.activate
     def test_fetch_from_date_from_archive(self):
         """Test wether if fetches a set of tasks from the given date from archive"""
@@ -662,6 +736,16 @@ class TestPhabricatorCommand(unittest.TestCase):
         self.assertEqual(parsed_args.tag, 'test')
         self.assertEqual(parsed_args.no_archive, True)
         self.assertEqual(parsed_args.from_date, DEFAULT_DATETIME)
+        self.assertEqual(parsed_args.max_workers, 1)
+        self.assertIsNone(parsed_args.state_path)
+
+        args = ['http://example.com',
+                '--max-workers', '4',
+                '--state-path', '/tmp/state']
+
+        parsed_args = parser.parse(*args)
+        self.assertEqual(parsed_args.max_workers, 4)
+        self.assertEqual(parsed_args.state_path, '/tmp/state')
 
 
 class TestConduitClient(unittest.TestCase):
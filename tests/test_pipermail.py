@@ -52,7 +52,7 @@ def read_file(filename, mode='r'):
 class PipermailListMocked(PipermailList):
 
     @staticmethod
-    def _write_archive(r, filepath):
+    def _write_archive(r, filepath, append=False):
         raise OSError
 
 
@@ -123,6 +123,198 @@ class TestPipermailList(unittest.TestCase):
         self.assertEqual(mboxes[1].filepath, os.path.join(self.tmp_path, '2016-March.txt'))
         self.assertEqual(mboxes[2].filepath, os.path.join(self.tmp_path, '2016-April.txt'))
 
+    @httpretty.activate
+    def test_fetch_concurrent(self):
+        """Test whether archives are downloaded concurrently"""
+
+        pipermail_index = read_file('data/pipermail/pipermail_index.html')
+        mboxes = {
+            '2015-November.txt.gz': read_file('data/pipermail/pipermail_2015_november.mbox', 'rb'),
+            '2016-March.txt': read_file('data/pipermail/pipermail_2016_march.mbox', 'rb'),
+            '2016-April.txt': read_file('data/pipermail/pipermail_2016_april.mbox', 'rb')
+        }
+
+        httpretty.register_uri(httpretty.GET,
+                               PIPERMAIL_URL,
+                               body=pipermail_index)
+
+        for filename, body in mboxes.items():
+            httpretty.register_uri(httpretty.GET,
+                                   PIPERMAIL_URL + filename,
+                                   body=body)
+
+        pmls = PipermailList('http://example.com/', self.tmp_path, download_workers=3)
+        links = pmls.fetch()
+
+        self.assertListEqual([link[0] for link in links],
+                             [PIPERMAIL_URL + '2016-April.txt',
+                              PIPERMAIL_URL + '2016-March.txt',
+                              PIPERMAIL_URL + '2015-November.txt.gz'])
+
+        for filename, body in mboxes.items():
+            self.assertEqual(read_file(os.path.join(self.tmp_path, filename), 'rb'), body)
+
+    @httpretty.activate
+    def test_fetch_not_modified(self):
+        """Test whether archives are not downloaded again when they were not modified"""
+
+        pipermail_index = read_file('data/pipermail/pipermail_index.html')
+        mbox_nov = read_file('data/pipermail/pipermail_2015_november.mbox', 'rb')
+        mbox_march = read_file('data/pipermail/pipermail_2016_march.mbox')
+        mbox_april = read_file('data/pipermail/pipermail_2016_april.mbox')
+        last_modified = 'Wed, 02 Dec 2015 10:00:00 GMT'
+
+        def request_callback(request, uri, headers):
+            headers['Last-Modified'] = last_modified
+
+            if request.headers.get('If-Modified-Since') == last_modified:
+                return 304, headers, ''
+            return 200, headers, mbox_nov
+
+        httpretty.register_uri(httpretty.GET,
+                               PIPERMAIL_URL,
+                               body=pipermail_index)
+        httpretty.register_uri(httpretty.GET,
+                               PIPERMAIL_URL + '2015-November.txt.gz',
+                               body=request_callback)
+        httpretty.register_uri(httpretty.GET,
+                               PIPERMAIL_URL + '2016-March.txt',
+                               body=mbox_march)
+        httpretty.register_uri(httpretty.GET,
+                               PIPERMAIL_URL + '2016-April.txt',
+                               body=mbox_april)
+
+        pmls = PipermailList('http://example.com/', self.tmp_path)
+        links = pmls.fetch()
+
+        filepath = os.path.join(self.tmp_path, '2015-November.txt.gz')
+        self.assertEqual(len(links), 3)
+        self.assertEqual(os.path.getmtime(filepath), 1449050400)
+
+        # The archive is not modified, so it is not downloaded again
+        links = pmls.fetch()
+
+        self.assertEqual(len(links), 3)
+        self.assertEqual(links[2], (PIPERMAIL_URL + '2015-November.txt.gz', filepath))
+        self.assertEqual(read_file(filepath, 'rb'), mbox_nov)
+
+        requests_nov = [req for req in httpretty.latest_requests()
+                        if req.path.endswith('2015-November.txt.gz')]
+        self.assertEqual(len(requests_nov), 2)
+        self.assertNotIn('If-Modified-Since', requests_nov[0].headers)
+        self.assertEqual(requests_nov[1].headers['If-Modified-Since'], last_modified)
+        self.assertNotIn('Range', requests_nov[1].headers)
+
+    @httpretty.activate
+    def test_fetch_range(self):
+        """Test whether only the new bytes of plain archives are downloaded"""
+
+        pipermail_index = read_file('data/pipermail/pipermail_index.html')
+        mbox_april = read_file('data/pipermail/pipermail_2016_april.mbox', 'rb')
+
+        def request_callback(request, uri, headers):
+            offset = int(request.headers['Range'][6:-1])
+            headers['Content-Range'] = 'bytes %s-%s/%s' % (offset, len(mbox_april) - 1, len(mbox_april))
+            return 206, headers, mbox_april[offset:]
+
+        httpretty.register_uri(httpretty.GET,
+                               PIPERMAIL_URL,
+                               body=pipermail_index)
+        httpretty.register_uri(httpretty.GET,
+                               PIPERMAIL_URL + '2016-April.txt',
+                               body=request_callback)
+
+        # Store the first bytes of the archive
+        filepath = os.path.join(self.tmp_path, '2016-April.txt')
+
+        with open(filepath, 'wb') as fd:
+            fd.write(mbox_april[:5000])
+
+        pmls = PipermailList('http://example.com/', self.tmp_path)
+        links = pmls.fetch(from_date=datetime.datetime(2016, 4, 1))
+
+        # The last stored bytes are requested again to check them
+        self.assertListEqual(links, [(PIPERMAIL_URL + '2016-April.txt', filepath)])
+        self.assertEqual(len(httpretty.latest_requests()), 2)
+        self.assertEqual(httpretty.last_request().headers['Range'], 'bytes=3976-')
+        self.assertEqual(read_file(filepath, 'rb'), mbox_april)
+        self.assertListEqual(os.listdir(self.tmp_path), ['2016-April.txt'])
+
+    @httpretty.activate
+    def test_fetch_range_regenerated(self):
+        """Test whether the whole archive is downloaded when it was regenerated"""
+
+        pipermail_index = read_file('data/pipermail/pipermail_index.html')
+        mbox_april = read_file('data/pipermail/pipermail_2016_april.mbox', 'rb')
+
+        def request_callback(request, uri, headers):
+            if 'Range' not in request.headers:
+                return 200, headers, mbox_april
+
+            offset = int(request.headers['Range'][6:-1])
+            headers['Content-Range'] = 'bytes %s-%s/%s' % (offset, len(mbox_april) - 1, len(mbox_april))
+            return 206, headers, mbox_april[offset:]
+
+        httpretty.register_uri(httpretty.GET,
+                               PIPERMAIL_URL,
+                               body=pipermail_index)
+        httpretty.register_uri(httpretty.GET,
+                               PIPERMAIL_URL + '2016-April.txt',
+                               body=request_callback)
+
+        # The stored archive has the same size but different
+        # contents than the first bytes of the remote one
+        filepath = os.path.join(self.tmp_path, '2016-April.txt')
+
+        with open(filepath, 'wb') as fd:
+            fd.write(mbox_april[:4990] + b'x' * 10)
+
+        pmls = PipermailList('http://example.com/', self.tmp_path)
+        links = pmls.fetch(from_date=datetime.datetime(2016, 4, 1))
+
+        self.assertListEqual(links, [(PIPERMAIL_URL + '2016-April.txt', filepath)])
+
+        requests_april = [req for req in httpretty.latest_requests()
+                          if req.path.endswith('2016-April.txt')]
+        self.assertEqual(len(requests_april), 2)
+        self.assertEqual(requests_april[0].headers['Range'], 'bytes=3976-')
+        self.assertNotIn('Range', requests_april[1].headers)
+
+        self.assertEqual(read_file(filepath, 'rb'), mbox_april)
+        self.assertListEqual(os.listdir(self.tmp_path), ['2016-April.txt'])
+
+    @httpretty.activate
+    def test_fetch_range_not_satisfiable(self):
+        """Test whether the whole archive is downloaded when the range cannot be sent"""
+
+        pipermail_index = read_file('data/pipermail/pipermail_index.html')
+        mbox_april = read_file('data/pipermail/pipermail_2016_april.mbox', 'rb')
+
+        def request_callback(request, uri, headers):
+            if 'Range' in request.headers:
+                return 416, headers, ''
+            return 200, headers, mbox_april
+
+        httpretty.register_uri(httpretty.GET,
+                               PIPERMAIL_URL,
+                               body=pipermail_index)
+        httpretty.register_uri(httpretty.GET,
+                               PIPERMAIL_URL + '2016-April.txt',
+                               body=request_callback)
+
+        # The stored archive is bigger than the remote one
+        filepath = os.path.join(self.tmp_path, '2016-April.txt')
+
+        with open(filepath, 'wb') as fd:
+            fd.write(mbox_april + mbox_april)
+
+        pmls = PipermailList('http://example.com/', self.tmp_path)
+        links = pmls.fetch(from_date=datetime.datetime(2016, 4, 1))
+
+        self.assertListEqual(links, [(PIPERMAIL_URL + '2016-April.txt', filepath)])
+        self.assertNotIn('Range', httpretty.last_request().headers)
+        self.assertEqual(read_file(filepath, 'rb'), mbox_april)
+
     @httpretty.activate
     def test_fetch_http_403_error(self):
         """Test whether 403 HTTP errors are properly handled"""
@@ -307,6 +499,9 @@ class TestPipermailBackend(unittest.TestCase):
         self.assertEqual(backend.origin, 'http://example.com/')
         self.assertEqual(backend.tag, 'test')
         self.assertTrue(backend.verify)
+        self.assertIsNone(backend.state_path)
+        self.assertEqual(backend.max_workers, 1)
+        self.assertEqual(backend.download_workers, 1)
 
         # When tag is empty or None it will be set to
         # the value in uri
@@ -584,6 +779,17 @@ class TestPipermailCommand(unittest.TestCase):
         self.assertEqual(parsed_args.tag, 'test')
         self.assertEqual(parsed_args.from_date, DEFAULT_DATETIME)
         self.assertFalse(parsed_args.verify)
+        self.assertIsNone(parsed_args.state_path)
+        self.assertEqual(parsed_args.max_workers, 1)
+        self.assertEqual(parsed_args.download_workers, 1)
+
+        args = ['http://example.com/',
+                '--max-workers', '2',
+                '--download-workers', '4']
+
+        parsed_args = parser.parse(*args)
+        self.assertEqual(parsed_args.max_workers, 2)
+        self.assertEqual(parsed_args.download_workers, 4)
 
 
 if __name__ == "__main__":
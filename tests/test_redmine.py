@@ -25,6 +25,8 @@ import datetime
 import httpretty
 import os
 import pkg_resources
+import shutil
+import tempfile
 import unittest
 
 pkg_resources.declare_namespace('perceval.backends')
@@ -146,6 +148,8 @@ class TestRedmineBackend(unittest.TestCase):
         self.assertEqual(redmine.max_issues, 5)
         self.assertEqual(redmine.origin, REDMINE_URL)
         self.assertEqual(redmine.tag, 'test')
+        self.assertEqual(redmine.max_workers, 1)
+        self.assertIsNone(redmine.state_path)
         self.assertIsNone(redmine.client)
 
         # When tag is empty or None it will be set to
@@ -160,6 +164,10 @@ class TestRedmineBackend(unittest.TestCase):
         self.assertEqual(redmine.origin, REDMINE_URL)
         self.assertEqual(redmine.tag, REDMINE_URL)
 
+        redmine = Redmine(REDMINE_URL, max_workers=4, state_path='/tmp/state')
+        self.assertEqual(redmine.max_workers, 4)
+        self.assertEqual(redmine.state_path, '/tmp/state')
+
     def test_has_archiving(self):
         """Test if it returns True when has_archiving is called"""
 
@@ -213,9 +221,6 @@ class TestRedmineBackend(unittest.TestCase):
                 'key': ['AAAA'],
                 'include': ['attachments,changesets,children,journals,relations,watchers']
             },
-            {
-                'key': ['AAAA']
-            },
             {
                 'key': ['AAAA'],
                 'include': ['attachments,changesets,children,journals,relations,watchers']
@@ -224,6 +229,9 @@ class TestRedmineBackend(unittest.TestCase):
                 'key': ['AAAA'],
                 'include': ['attachments,changesets,children,journals,relations,watchers']
             },
+            {
+                'key': ['AAAA']
+            },
             {
                 'key': ['AAAA'],
                 'status_id': ['*'],
@@ -327,6 +335,60 @@ class TestRedmineBackend(unittest.TestCase):
         for i in range(len(expected)):
             self.assertDictEqual(http_requests[i].querystring, expected[i])
 
+    @httpretty.activate
+    def test_fetch_concurrent(self):
+        """Test whether issues and users fetched concurrently are returned in order"""
+
+        setup_http_server()
+
+        redmine = Redmine(REDMINE_URL, api_token='AAAA',
+                          max_issues=3)
+        expected = [issue for issue in redmine.fetch()]
+
+        redmine = Redmine(REDMINE_URL, api_token='AAAA',
+                          max_issues=3, max_workers=4)
+        issues = [issue for issue in redmine.fetch()]
+
+        self.assertEqual(len(issues), 4)
+
+        for x in range(len(issues)):
+            self.assertEqual(issues[x]['uuid'], expected[x]['uuid'])
+            self.assertDictEqual(issues[x]['data'], expected[x]['data'])
+
+    @httpretty.activate
+    def test_fetch_users_from_state(self):
+        """Test whether users are taken from the state store"""
+
+        http_requests = setup_http_server()
+
+        test_path = tempfile.mkdtemp(prefix='perceval_')
+        state_path = os.path.join(test_path, 'state')
+
+        redmine = Redmine(REDMINE_URL, api_token='AAAA',
+                          max_issues=3, state_path=state_path)
+        expected = [issue for issue in redmine.fetch()]
+
+        users = [req for req in http_requests if req.path.startswith('/users')]
+        self.assertEqual(len(users), 5)
+
+        # Users are not requested again
+        http_requests.clear()
+
+        redmine = Redmine(REDMINE_URL, api_token='AAAA',
+                          max_issues=3, state_path=state_path)
+        issues = [issue for issue in redmine.fetch()]
+
+        self.assertEqual(len(issues), len(expected))
+
+        for x in range(len(issues)):
+            self.assertDictEqual(issues[x]['data'], expected[x]['data'])
+
+        # Only the user not found on the server is requested again
+        users = [req.path for req in http_requests if req.path.startswith('/users')]
+        self.assertListEqual(users, ['/users/99.json?key=AAAA'])
+
+        shutil.rmtree(test_path)
+
     @httpretty.activate
     def test_not_found_user(self):
         """Test if it works when a user is not found"""
@@ -430,6 +492,25 @@ class TestRedmineBackendArchive(TestCaseBackendArchive):
         setup_http_server()
         self._test_fetch_from_archive(from_date=None)
 
+    @httpretty.activate
+    def test_fetch_from_archive_with_state(self):
+        """Test whether the state store is not used when issues are archived"""
+
+        setup_http_server()
+
+        state_path = os.path.join(self.test_path, 'state')
+
+        # Fill the state store with the users
+        redmine = Redmine(REDMINE_URL, api_token='AAAA',
+                          max_issues=3, state_path=state_path)
+        _ = [issue for issue in redmine.fetch()]
+
+        self.backend_write_archive = Redmine(REDMINE_URL, api_token='AAAA', max_issues=3,
+                                             archive=self.archive, state_path=state_path)
+        self.backend_read_archive = Redmine(REDMINE_URL, api_token='BBBB', max_issues=3,
+                                            archive=self.archive, state_path=state_path)
+        self._test_fetch_from_archive(from_date=None)
+
     @httpretty.activate
     def test_fetch_from_date_from_archive(self):
         """Test wether if fetches a set of issues from the given date from archive"""
@@ -477,6 +558,16 @@ class TestRedmineCommand(unittest.TestCase):
         self.assertEqual(parsed_args.tag, 'test')
         self.assertEqual(parsed_args.no_archive, True)
         self.assertEqual(parsed_args.from_date, DEFAULT_DATETIME)
+        self.assertEqual(parsed_args.max_workers, 1)
+        self.assertIsNone(parsed_args.state_path)
+
+        args = ['http://example.com',
+                '--max-workers', '4',
+                '--state-path', '/tmp/state']
+
+        parsed_args = parser.parse(*args)
+        self.assertEqual(parsed_args.max_workers, 4)
+        self.assertEqual(parsed_args.state_path, '/tmp/state')
 
 
 class TestRedmineClient(unittest.TestCase):
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Santiago Dueñas <sduenas@bitergia.com>
+#
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from perceval.errors import StateStoreError
+from perceval.state import StateStore
+
+
+class TestStateStore(unittest.TestCase):
+    """StateStore tests"""
+
+    def setUp(self):
+        self.test_path = tempfile.mkdtemp(prefix='perceval_')
+
+    def tearDown(self):
+        shutil.rmtree(self.test_path)
+
+    def test_init(self):
+        """Test whether a new store is created when it does not exist"""
+
+        store_path = os.path.join(self.test_path, 'states', 'mystate')
+        store = StateStore(store_path)
+
+        self.assertEqual(store.store_path, store_path)
+        self.assertTrue(os.path.exists(store_path))
+        self.assertListEqual(store.keys('ns'), [])
+
+    def test_init_invalid_store(self):
+        """Test if an exception is raised when the file is not a valid store"""
+
+        store_path = os.path.join(self.test_path, 'invalid_store')
+
+        with open(store_path, 'w') as fd:
+            fd.write("Invalid store file")
+
+        with self.assertRaisesRegex(StateStoreError, "invalid state store file"):
+            StateStore(store_path)
+
+    def test_set_get(self):
+        """Test whether values are stored and retrieved"""
+
+        store_path = os.path.join(self.test_path, 'mystate')
+        store = StateStore(store_path)
+
+        store.set('users', 1, {'name': 'john', 'roles': ['dev']})
+        store.set('users', 'jsmith', {'name': 'jane'})
+        store.set('builds', 1, 42)
+
+        self.assertDictEqual(store.get('users', 1), {'name': 'john', 'roles': ['dev']})
+        self.assertDictEqual(store.get('users', '1'), {'name': 'john', 'roles': ['dev']})
+        self.assertDictEqual(store.get('users', 'jsmith'), {'name': 'jane'})
+        self.assertEqual(store.get('builds', 1), 42)
+        self.assertEqual(store.get('builds', 2), None)
+        self.assertEqual(store.get('builds', 2, default=0), 0)
+
+        # Values are replaced
+        store.set('builds', 1, 43)
+        self.assertEqual(store.get('builds', 1), 43)
+
+        # Data persists between instances
+        store = StateStore(store_path)
+        self.assertListEqual(store.keys('users'), ['1', 'jsmith'])
+        self.assertEqual(store.get('builds', 1), 43)
+
+    def test_set_get_many(self):
+        """Test whether several values are stored and retrieved at once"""
+
+        store_path = os.path.join(self.test_path, 'mystate')
+        store = StateStore(store_path)
+
+        values = {str(i): {'id': i} for i in range(1200)}
+        store.set_many('items', values)
+
+        found = store.get_many('items', [1, 5, 1100, 2000])
+        self.assertDictEqual(found, {'1': {'id': 1}, '5': {'id': 5}, '1100': {'id': 1100}})
+
+        found = store.get_many('items', [])
+        self.assertDictEqual(found, {})
+
+    def test_delete(self):
+        """Test whether keys are removed"""
+
+        store_path = os.path.join(self.test_path, 'mystate')
+        store = StateStore(store_path)
+
+        store.set('users', 1, 'john')
+        store.set('users', 2, 'jane')
+        store.delete('users', 1)
+        store.delete('users', 3)
+
+        self.assertListEqual(store.keys('users'), ['2'])
+
+    def test_threads(self):
+        """Test whether the store can be shared among threads"""
+
+        store_path = os.path.join(self.test_path, 'mystate')
+        store = StateStore(store_path)
+
+        def write(n):
+            for i in range(20):
+                store.set('thread-%s' % n, i, i * n)
+
+        threads = [threading.Thread(target=write, args=(n,)) for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        for n in range(4):
+            self.assertEqual(len(store.keys('thread-%s' % n)), 20)
+            self.assertEqual(store.get('thread-%s' % n, 19), 19 * n)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -26,6 +26,7 @@ import pkg_resources
 import shutil
 import tempfile
 import unittest
+import unittest.mock
 
 pkg_resources.declare_namespace('perceval.backends')
 
@@ -61,6 +62,7 @@ class TestSupybotBackend(unittest.TestCase):
         self.assertEqual(backend.dirpath, self.tmp_path)
         self.assertEqual(backend.origin, 'http://example.com/')
         self.assertEqual(backend.tag, 'test')
+        self.assertEqual(backend.max_workers, 1)
 
         # When tag is empty or None it will be set to
         # the value in uri
@@ -117,6 +119,38 @@ class TestSupybotBackend(unittest.TestCase):
             self.assertEqual(message['category'], 'message')
             self.assertEqual(message['tag'], 'http://example.com/')
 
+    def test_fetch_max_workers(self):
+        """Test whether log files parsed in parallel return the same messages"""
+
+        backend = Supybot('http://example.com/', self.tmp_path)
+        expected = [m for m in backend.fetch()]
+
+        backend = Supybot('http://example.com/', self.tmp_path, max_workers=2)
+        self.assertEqual(backend.max_workers, 2)
+
+        messages = [m for m in backend.fetch()]
+
+        self.assertEqual(len(messages), 16)
+        self.assertListEqual([m['uuid'] for m in messages],
+                             [m['uuid'] for m in expected])
+        self.assertListEqual([m['data'] for m in messages],
+                             [m['data'] for m in expected])
+
+    def test_fetch_max_workers_invalid_log(self):
+        """Test whether errors parsing in parallel are raised"""
+
+        tmp_path = tempfile.mkdtemp(prefix='perceval_')
+        shutil.copy(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data/supybot/supybot_invalid_msg.log'),
+                    os.path.join(tmp_path, '#supybot_2012-10-17.log'))
+
+        backend = Supybot('http://example.com/', tmp_path, max_workers=2)
+
+        try:
+            with self.assertRaisesRegex(ParseError, "invalid message on line 9"):
+                _ = [m for m in backend.fetch()]
+        finally:
+            shutil.rmtree(tmp_path)
+
     def test_fetch_from_date(self):
         """Test whether a list of messages is returned since a given date"""
 
@@ -201,6 +235,13 @@ class TestSupybotCommand(unittest.TestCase):
         self.assertEqual(parsed_args.uri, 'http://example.com')
         self.assertEqual(parsed_args.dirpath, '/tmp/supybot')
         self.assertEqual(parsed_args.from_date, DEFAULT_DATETIME)
+        self.assertEqual(parsed_args.max_workers, 1)
+
+        args = ['--max-workers', '4',
+                'http://example.com', '/tmp/supybot']
+
+        parsed_args = parser.parse(*args)
+        self.assertEqual(parsed_args.max_workers, 4)
 
 
 class TestSupybotParser(unittest.TestCase):
@@ -276,6 +317,32 @@ class TestSupybotParser(unittest.TestCase):
                 parser = SupybotParser(f)
                 _ = [item for item in parser.parse()]
 
+    def test_parser_fast_path(self):
+        """Test whether comments parsed without patterns match the regular parser"""
+
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                               "data/supybot/supybot_valid.log"), 'r') as f:
+            lines = f.readlines()
+
+        lines += ["2016-06-27T12:00:00+0000  <nick!user@host> a > b\n",
+                  "2016-06-27T12:00:00+0000  <a>b> c\n",
+                  "2016-06-27T12:00:00+0000  <nick>  body with spaces  \n",
+                  "2016-06-27T12:00:00+0000  <nick> <b>\n",
+                  "2016-06-27T12:00:00+0000  <nick>   \n",
+                  "2016-06-27T12:00:00-0100  <> body\n",
+                  "2016-06-27T12:00:00+0000  <nick>\tbody\n"]
+
+        parser = SupybotParser(lines)
+        items = [item for item in parser.parse()]
+
+        with unittest.mock.patch.object(SupybotParser, '_parse_supybot_comment_fast',
+                                        return_value=None):
+            parser = SupybotParser(lines)
+            expected = [item for item in parser.parse()]
+
+        self.assertEqual(len(items), 102)
+        self.assertListEqual(items, expected)
+
     def test_timestamp_pattern(self):
         """Test the validation of timestamp lines"""
 
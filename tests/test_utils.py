@@ -28,13 +28,20 @@ import gzip
 import os
 import shutil
 import tempfile
+import threading
+import time
+import types
 import unittest
+import unittest.mock
 
 from perceval.errors import ParseError
 from perceval.utils import (check_compressed_file_type,
+                            concurrent_map,
+                            message_headers_to_dict,
                             message_to_dict,
                             months_range,
                             remove_invalid_xml_chars,
+                            xml_elements_to_dict,
                             xml_to_dict)
 
 
@@ -133,6 +140,71 @@ class TestMonthsRange(unittest.TestCase):
         self.assertListEqual(result, [])
 
 
+class TestConcurrentMap(unittest.TestCase):
+    """Unit tests for concurrent_map function"""
+
+    def test_sequential(self):
+        """Test whether items are processed in the current thread when there is only one worker"""
+
+        threads = set()
+
+        def func(x):
+            threads.add(threading.get_ident())
+            return x * 2
+
+        results = [r for r in concurrent_map(func, range(10))]
+        self.assertListEqual(results, [x * 2 for x in range(10)])
+        self.assertSetEqual(threads, {threading.get_ident()})
+
+    def test_concurrent(self):
+        """Test whether results are returned in order when items are processed concurrently"""
+
+        def func(x):
+            # Later items finish first
+            time.sleep((20 - x) * 0.001)
+            return x * 2
+
+        results = [r for r in concurrent_map(func, range(20), max_workers=4)]
+        self.assertListEqual(results, [x * 2 for x in range(20)])
+
+    def test_lazy(self):
+        """Test whether the iterable is not fully consumed in advance"""
+
+        read = []
+
+        def items():
+            for x in range(100):
+                read.append(x)
+                yield x
+
+        results = concurrent_map(lambda x: x, items(), max_workers=2)
+        self.assertEqual(next(results), 0)
+        self.assertLessEqual(len(read), 5)
+        results.close()
+
+    def test_exception(self):
+        """Test whether exceptions are propagated"""
+
+        def func(x):
+            if x == 5:
+                raise ValueError("invalid item")
+            return x
+
+        results = concurrent_map(func, range(10), max_workers=3)
+
+        for x in range(5):
+            self.assertEqual(next(results), x)
+
+        with self.assertRaisesRegex(ValueError, "invalid item"):
+            next(results)
+
+    def test_processes(self):
+        """Test whether items can be processed by a pool of processes"""
+
+        results = [r for r in concurrent_map(abs, range(-20, 0), max_workers=2, processes=True)]
+        self.assertListEqual(results, [x for x in range(20, 0, -1)])
+
+
 class TestMessagetoDict(unittest.TestCase):
     """Unit tests for message_to_dict"""
 
@@ -209,6 +281,39 @@ class TestMessagetoDict(unittest.TestCase):
         self.assertEqual(len(html_body), 1557)
 
 
+class TestMessageHeadersToDict(unittest.TestCase):
+    """Unit tests for message_headers_to_dict"""
+
+    def test_convert_headers(self):
+        """Test whether it converts only the given headers"""
+
+        raw_email = read_file('data/utils/email_single.txt', mode='rb')
+
+        headers = message_headers_to_dict(raw_email, ['message-id', 'Date', 'X-Not-Found'])
+        headers = {k: v for k, v in headers.items()}
+
+        expected = {
+            'Date': 'Wed, 01 Dec 2010 14:26:40 +0100',
+            'Message-ID': '<4CF64D10.9020206@domain.com>'
+        }
+
+        self.assertDictEqual(headers, expected)
+
+    def test_same_headers(self):
+        """Test whether headers are decoded the same way message_to_dict does"""
+
+        raw_email = read_file('data/utils/email_multipart_encoding.txt', mode='rb')
+        message = message_to_dict(email.message_from_bytes(raw_email))
+
+        names = [name for name in message.keys() if name not in ('unixfrom', 'body')]
+        headers = message_headers_to_dict(raw_email, names)
+
+        self.assertEqual(len(headers), len(names))
+
+        for name in names:
+            self.assertEqual(headers[name], message[name])
+
+
 class TestRemoveInvalidXMLChars(unittest.TestCase):
     """Unit tests for remove_invalid_xml_characters"""
 
@@ -219,6 +324,14 @@ class TestRemoveInvalidXMLChars(unittest.TestCase):
         self.assertNotEqual(purged_xml, raw_xml)
         self.assertEqual(len(purged_xml), len(raw_xml))
 
+    def test_replaced_chars(self):
+        """Check whether only the invalid characters are replaced by whitespaces"""
+
+        raw_xml = '<a>\x00\x08\t\n\x0b\x1f \x7e\x7f\x84\x85\x86\x9f\xa0ñ</a>'
+        purged_xml = remove_invalid_xml_chars(raw_xml)
+
+        self.assertEqual(purged_xml, '<a>  \t\n   \x7e  \x85  \xa0ñ</a>')
+
 
 class TestXMLtoDict(unittest.TestCase):
     """Unit tests for xml_to_dict"""
@@ -267,5 +380,82 @@ class TestXMLtoDict(unittest.TestCase):
         self.assertRaises(ParseError, xml_to_dict, raw_xml)
 
 
+class TestXMLElementsToDict(unittest.TestCase):
+    """Unit tests for xml_elements_to_dict"""
+
+    def test_xml_elements_to_dict(self):
+        """Check whether the elements are converted one by one"""
+
+        raw_xml = read_file('data/utils/bugzilla_bug.xml')
+        bugs = xml_elements_to_dict(raw_xml, 'bug')
+
+        self.assertIsInstance(bugs, types.GeneratorType)
+
+        bugs = [bug for bug in bugs]
+        self.assertListEqual(bugs, xml_to_dict(raw_xml)['bug'])
+
+        bug = bugs[0]
+        self.assertEqual(bug['short_desc'][0]['__text__'], 'Mock bug for testing purposes')
+        self.assertEqual(bug['reporter'][0]['name'], 'Santiago Dueñas')
+        self.assertEqual(len(bug['long_desc']), 4)
+
+    def test_remove_invalid_xml_chars(self):
+        """Check whether it removes invalid characters and parses the stream"""
+
+        raw_xml = read_file('data/utils/bugzilla_bugs_invalid_chars.xml')
+        bugs = [bug for bug in xml_elements_to_dict(raw_xml, 'bug')]
+
+        self.assertEqual(len(bugs), 1)
+
+        bug = bugs[0]
+        self.assertEqual(bug['bug_id'][0]['__text__'], '25299')
+        self.assertEqual(len(bug['cc']), 2)
+        self.assertEqual(len(bug['long_desc']), 11)
+
+    def test_tag_not_found(self):
+        """Check whether nothing is returned when there are not elements with the tag"""
+
+        raw_xml = read_file('data/utils/bugzilla_bug.xml')
+        elements = [e for e in xml_elements_to_dict(raw_xml, 'unknown')]
+
+        self.assertListEqual(elements, [])
+
+    def test_invalid_xml(self):
+        """Check whether it raises an exception when the XML is invalid"""
+
+        raw_xml = read_file('data/utils/xml_invalid.xml')
+
+        with self.assertRaises(ParseError):
+            _ = [e for e in xml_elements_to_dict(raw_xml, 'bug')]
+
+    def test_truncated_xml(self):
+        """Check whether the elements before a truncated section are returned"""
+
+        raw_xml = read_file('data/bugzilla/bugzilla_bugs_details.xml')
+        raw_xml = raw_xml[:raw_xml.find('<bug>', raw_xml.find('</bug>'))] + '<bug><bug_id>2'
+
+        elements = xml_elements_to_dict(raw_xml, 'bug')
+
+        bug = next(elements)
+        self.assertEqual(bug['bug_id'][0]['__text__'], '15')
+
+        with self.assertRaises(ParseError):
+            next(elements)
+
+    def test_direct_children(self):
+        """Check whether only the direct children of the root are converted"""
+
+        raw_xml = '<bugzilla><bug><bug_id>1</bug_id><bug><bug_id>2</bug_id></bug></bug>' \
+                  '<other><bug><bug_id>3</bug_id></bug></other>' \
+                  '<bug><bug_id>4</bug_id></bug></bugzilla>'
+
+        bugs = [bug for bug in xml_elements_to_dict(raw_xml, 'bug')]
+
+        self.assertEqual(len(bugs), 2)
+        self.assertEqual(bugs[0]['bug_id'][0]['__text__'], '1')
+        self.assertEqual(bugs[0]['bug'][0]['bug_id'][0]['__text__'], '2')
+        self.assertEqual(bugs[1]['bug_id'][0]['__text__'], '4')
+
+
 if __name__ == "__main__":
     unittest.main()